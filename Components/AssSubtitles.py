@@ -0,0 +1,254 @@
+import functools
+import os
+import shutil
+import subprocess
+import cv2
+from PIL import ImageColor
+from Components.CaptionRenderer import get_style, load_font, CAPTION_SIDE_PADDING
+from Components.FfmpegWriter import get_ffmpeg_binary, FINAL_ENCODER
+from Components.Subtitles import relevant_segments
+from Components.Resources import stage_threads
+
+
+@functools.lru_cache(maxsize=1)
+def ass_filter_available():
+    """True if the ffmpeg binary was built with libass (the `ass` filter)."""
+    try:
+        result = subprocess.run(
+            [get_ffmpeg_binary(), "-hide_banner", "-filters"],
+            capture_output=True,
+            text=True,
+        )
+    except OSError:
+        return False
+    return any(line.split()[1:2] == ["ass"] for line in result.stdout.splitlines())
+
+
+def ass_color(color, alpha=0):
+    """Color name, hex string or RGB tuple as an ASS &HAABBGGRR value."""
+    if isinstance(color, str):
+        color = ImageColor.getrgb(color)
+    r, g, b = color[:3]
+    return f"&H{alpha:02X}{b:02X}{g:02X}{r:02X}"
+
+
+def ass_time(seconds):
+    """Seconds as an ASS timestamp (H:MM:SS.cc)."""
+    centiseconds = int(round(max(0.0, seconds) * 100))
+    hours, centiseconds = divmod(centiseconds, 360000)
+    minutes, centiseconds = divmod(centiseconds, 6000)
+    secs, centiseconds = divmod(centiseconds, 100)
+    return f"{hours}:{minutes:02d}:{secs:02d}.{centiseconds:02d}"
+
+
+def ass_text(text):
+    """Escape caption text for an ASS Dialogue line."""
+    text = " ".join(text.split())
+    # Braces open override blocks and backslashes start tags
+    return text.replace("\\", "/").replace("{", "(").replace("}", ")")
+
+
+def build_ass_script(segments, style, video_width, video_height):
+    """
+    ASS script for caption segments in one of the subtitle style presets.
+
+    The script uses the video's pixel size as its coordinate space, so font
+    sizes, outlines and margins are in output pixels. Font and size match
+    CaptionRenderer: libass sizes fonts by ascent + descent, which is
+    computed from the same FreeType font. Boxed styles become an opaque box
+    (BorderStyle 3) padded by the preset's top margin; unlike the Pillow
+    renderer the box hugs each line instead of spanning the caption width.
+
+    Args:
+        segments: List of [text, start, end] in clip time (further elements,
+            such as word timings, are ignored)
+        style: Style preset name (see CaptionRenderer.SUBTITLE_STYLES)
+        video_width: Output video width
+        video_height: Output video height
+
+    Returns:
+        Script text
+    """
+    config = get_style(style)
+    font_size = int(video_height * config["fontsize_factor"])
+    font = load_font(font_size)
+    family = font.getname()[0]
+    ass_font_size = sum(font.getmetrics())
+
+    primary = ass_color(config["color"])
+    bottom_margin = int(video_height * config["bottom_margin_factor"])
+    if config["bg_color"]:
+        padding = config["margin"]["top"] if config["margin"] else 0
+        box = ass_color(config["bg_color"])
+        border_style, outline, outline_color, back_color = 3, padding, box, box
+        bottom_margin += padding
+    else:
+        border_style = 1
+        outline = config["stroke_width"] if config["stroke_color"] else 0
+        outline_color = ass_color(config["stroke_color"] or "black")
+        back_color = ass_color("black", alpha=0xFF)
+
+    side_margin = CAPTION_SIDE_PADDING // 2
+    lines = [
+        "[Script Info]",
+        "ScriptType: v4.00+",
+        f"PlayResX: {video_width}",
+        f"PlayResY: {video_height}",
+        "WrapStyle: 0",
+        "ScaledBorderAndShadow: yes",
+        "",
+        "[V4+ Styles]",
+        "Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, "
+        "OutlineColour, BackColour, Bold, Italic, Underline, StrikeOut, ScaleX, "
+        "ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, Alignment, "
+        "MarginL, MarginR, MarginV, Encoding",
+        f"Style: Caption,{family},{ass_font_size},{primary},{primary},"
+        f"{outline_color},{back_color},-1,0,0,0,100,100,0,0,{border_style},"
+        f"{outline},0,2,{side_margin},{side_margin},{bottom_margin},1",
+        "",
+        "[Events]",
+        "Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text",
+    ]
+    for text, start, end, *_ in segments:
+        text = ass_text(text)
+        if not text or end <= start:
+            continue
+        lines.append(
+            f"Dialogue: 0,{ass_time(start)},{ass_time(end)},Caption,,0,0,0,,{text}"
+        )
+    return "\n".join(lines) + "\n"
+
+
+def _filter_path(path):
+    """Escape a file path for use as an ffmpeg filter option value."""
+    path = os.path.abspath(path).replace("\\", "/")
+    return path.replace(":", "\\:").replace("'", "\\'")
+
+
+def ass_video_filter(ass_path):
+    """ffmpeg video filter that burns the ASS script at `ass_path` into the picture."""
+    return f"ass='{_filter_path(ass_path)}'"
+
+
+def write_ass_subtitles(
+    video_path, ass_path, transcriptions, video_start_time=0, style="green_box"
+):
+    """
+    Write the ASS script for a clip's captions, to be burned in by a later encode.
+
+    Args:
+        video_path: Video the captions go on (its size sets the script's coordinates)
+        ass_path: Path of the script
+        transcriptions: TranscriptIndex or list of [text, start, end] from transcribeAudio
+        video_start_time: Start time offset if video was cropped
+        style: Subtitle style - "green_box", "classic", "minimal", "bold_yellow", "tiktok"
+
+    Returns:
+        `ass_path`, or None if no captions fall inside the clip
+    """
+    cap = cv2.VideoCapture(video_path)
+    video_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    video_height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    video_duration = cap.get(cv2.CAP_PROP_FRAME_COUNT) / fps
+    cap.release()
+
+    segments = relevant_segments(transcriptions, video_start_time, video_duration)
+    if not segments:
+        print("No transcriptions found for this video segment")
+        return None
+    with open(ass_path, "w", encoding="utf-8") as f:
+        f.write(build_ass_script(segments, style, video_width, video_height))
+    print(f"Wrote {len(segments)} subtitle segments for libass -> {ass_path}")
+    return ass_path
+
+
+def burn_subtitles(video_path, output_video, ass_path, audio_path=None, encoder_options=None):
+    """
+    Encode a video with an ASS script burned in by libass inside ffmpeg.
+
+    Used as the final mux: the picture comes from `video_path` and the audio
+    from `audio_path` (default: `video_path`), so captions cost no encode of
+    their own.
+
+    Args:
+        video_path: Cropped video
+        output_video: Path of the finished video
+        ass_path: ASS script from write_ass_subtitles
+        audio_path: File whose audio track is used
+        encoder_options: libx264 preset and bitrate (default: FINAL_ENCODER)
+
+    Raises:
+        RuntimeError: If ffmpeg fails
+    """
+    settings = encoder_options or FINAL_ENCODER
+    cmd = [get_ffmpeg_binary(), "-y", "-loglevel", "error", "-i", video_path]
+    audio_input = 0
+    if audio_path and audio_path != video_path:
+        cmd += ["-i", audio_path]
+        audio_input = 1
+    cmd += [
+        "-map",
+        "0:v:0",
+        "-map",
+        f"{audio_input}:a:0?",
+        "-vf",
+        ass_video_filter(ass_path),
+        "-c:v",
+        "libx264",
+        "-preset",
+        settings["preset"],
+        "-b:v",
+        settings["bitrate"],
+        "-pix_fmt",
+        "yuv420p",
+        "-threads",
+        str(stage_threads("render")),
+        "-c:a",
+        "aac",
+        "-shortest",
+        "-movflags",
+        "+faststart",
+        output_video,
+    ]
+    result = subprocess.run(cmd, stderr=subprocess.PIPE, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(
+            f"ffmpeg subtitle burn-in failed ({result.returncode}): {result.stderr.strip()}"
+        )
+
+
+def add_subtitles_ass(
+    input_video, output_video, transcriptions, video_start_time=0, style="green_box"
+):
+    """
+    Add subtitles by burning an ASS script in during the encode.
+
+    Same interface as Subtitles.add_subtitles_to_video, for standalone use;
+    main.py instead writes the script with write_ass_subtitles and burns it
+    in during the final mux.
+
+    Args:
+        input_video: Path to input video file
+        output_video: Path to output video file
+        transcriptions: TranscriptIndex or list of [text, start, end] from transcribeAudio
+        video_start_time: Start time offset if video was cropped
+        style: Subtitle style - "green_box", "classic", "minimal", "bold_yellow", "tiktok"
+    """
+    ass_path = write_ass_subtitles(
+        input_video,
+        os.path.splitext(output_video)[0] + ".ass",
+        transcriptions,
+        video_start_time,
+        style,
+    )
+    if ass_path is None:
+        shutil.copyfile(input_video, output_video)
+        return
+
+    print("Burning subtitles into video (libass)...")
+    try:
+        burn_subtitles(input_video, output_video, ass_path)
+    finally:
+        os.remove(ass_path)
+    print(f"✓ Subtitles added successfully -> {output_video}")
@@ -0,0 +1,219 @@
+import bisect
+import numpy as np
+from Components.CaptionRenderer import get_style, render_caption, render_karaoke_caption
+from Components.TranscriptIndex import as_transcript_index
+
+
+def estimate_word_timings(text, start, end):
+    """
+    Split a segment's time span across its words in proportion to their length.
+
+    Fallback for segments without usable word timestamps. Each word gets a
+    share of the segment proportional to its characters plus one (for the
+    gap).
+
+    Returns:
+        List of (start, end) per word of text.split()
+    """
+    words = text.split()
+    if not words:
+        return []
+    weights = np.array([len(word) + 1 for word in words], dtype=np.float64)
+    bounds = start + (end - start) * np.concatenate([[0.0], np.cumsum(weights)]) / weights.sum()
+    return [(float(bounds[i]), float(bounds[i + 1])) for i in range(len(words))]
+
+
+class CaptionSprite:
+    """
+    A caption bitmap prepared for blending into BGR frames at a given position.
+
+    Fully transparent borders are trimmed so blending only touches pixels the
+    caption can change. The color is stored premultiplied by alpha (plus 0.5
+    for rounding) so a blend is one multiply-add over the ROI.
+    """
+
+    def __init__(self, rgba, x, y):
+        alpha = rgba[..., 3]
+        rows = np.flatnonzero(alpha.any(axis=1))
+        cols = np.flatnonzero(alpha.any(axis=0))
+        if len(rows) == 0:
+            self.empty = True
+            return
+        self.empty = False
+        y0, y1, x0, x1 = rows[0], rows[-1] + 1, cols[0], cols[-1] + 1
+        rgba = rgba[y0:y1, x0:x1]
+        self.x, self.y = x + x0, y + y0
+        self.height, self.width = rgba.shape[:2]
+        self.bgr = np.ascontiguousarray(rgba[..., 2::-1])
+        self.opaque = bool((rgba[..., 3] == 255).all())
+        a = rgba[..., 3:4].astype(np.float32) / 255.0
+        self.premultiplied = self.bgr.astype(np.float32) * a + 0.5
+        self.inverse_alpha = 1.0 - a
+        self._scratch = np.empty(self.bgr.shape, dtype=np.float32)
+
+    def blend(self, frame, opacity=1.0, dx=0, dy=0):
+        """
+        Alpha-blend into `frame` in place, touching only the sprite's ROI.
+
+        Args:
+            frame: BGR frame
+            opacity: Extra opacity factor (0-1) for fades
+            dx, dy: Offset from the sprite's position in pixels (for slides)
+        """
+        if self.empty or opacity <= 0:
+            return
+        frame_height, frame_width = frame.shape[:2]
+        x, y = self.x + dx, self.y + dy
+        x0, y0 = max(x, 0), max(y, 0)
+        x1 = min(x + self.width, frame_width)
+        y1 = min(y + self.height, frame_height)
+        if x1 <= x0 or y1 <= y0:
+            return
+        sx, sy = x0 - x, y0 - y
+        sprite_rows = slice(sy, sy + y1 - y0)
+        sprite_cols = slice(sx, sx + x1 - x0)
+        roi = frame[y0:y1, x0:x1]
+        if self.opaque and opacity >= 1:
+            np.copyto(roi, self.bgr[sprite_rows, sprite_cols])
+            return
+        scratch = self._scratch[sprite_rows, sprite_cols]
+        if opacity >= 1:
+            np.multiply(roi, self.inverse_alpha[sprite_rows, sprite_cols], out=scratch)
+            scratch += self.premultiplied[sprite_rows, sprite_cols]
+        else:
+            # Scale coverage by the opacity: roi * (1 - a*o) + color * a*o
+            inverse = 1.0 - (1.0 - self.inverse_alpha[sprite_rows, sprite_cols]) * opacity
+            np.multiply(roi, inverse, out=scratch)
+            scratch += (self.premultiplied[sprite_rows, sprite_cols] - 0.5) * opacity + 0.5
+        np.copyto(roi, scratch, casting="unsafe")
+
+
+class CaptionCompositor:
+    """
+    Draws captions straight into frames inside a frame loop.
+
+    Each caption is rendered once (CaptionRenderer caches the bitmap) and
+    alpha-blended into its bounding box only, so the per-frame cost scales
+    with the caption's area instead of the frame's. With `karaoke`, the base
+    caption is prepared once per segment plus a small highlighted sprite per
+    word box; a frame blends the base, puts back the pixels under the active
+    word's box and blends that word's sprite there, so nothing is rendered
+    or premultiplied in between.
+
+    Frames are sized on the first apply() call, so the compositor can be
+    built before the output resolution is known.
+    """
+
+    def __init__(self, segments, style="green_box", karaoke=False):
+        """
+        Args:
+            segments: List of [text, start, end] in clip time, optionally with a
+                fourth element of per-word (start, end) timings
+            style: Subtitle style preset (see CaptionRenderer.SUBTITLE_STYLES)
+            karaoke: Highlight words one by one as they are spoken
+        """
+        self.segments = sorted(
+            (segment for segment in segments if segment[0].strip()),
+            key=lambda segment: segment[1],
+        )
+        self.starts = [segment[1] for segment in self.segments]
+        self.style = style
+        self.karaoke = karaoke
+        self.frame_size = None
+        # Segment on screen: its caption sprite and, with karaoke, the word
+        # sprites, their boxes in frame coordinates and their start times
+        self._active_segment = None
+        self._active_sprite = None
+        self._active_words = None
+        self._active_word_starts = None
+        self._saved = None
+
+    @classmethod
+    def from_transcript(cls, transcriptions, clip_start, clip_end, **kwargs):
+        """Compositor for the captions of one clip of a longer transcript."""
+        index = as_transcript_index(transcriptions)
+        return cls(index.segments_between(clip_start, clip_end), **kwargs)
+
+    def segment_at(self, t):
+        """Index of the segment on screen at time t, or None."""
+        i = bisect.bisect_right(self.starts, t) - 1
+        if i >= 0 and t < self.segments[i][2]:
+            return i
+        return None
+
+    def _word_starts(self, segment_index):
+        segment = self.segments[segment_index]
+        timings = segment[3] if len(segment) > 3 else None
+        # Transcribed words only map onto the caption if they split the same way
+        if not timings or len(timings) != len(segment[0].split()):
+            timings = estimate_word_timings(*segment[:3])
+        return [start for start, _ in timings]
+
+    def _position(self, bitmap):
+        width, height = self.frame_size
+        bottom_margin = int(height * get_style(self.style)["bottom_margin_factor"])
+        return (width - bitmap.shape[1]) // 2, height - bitmap.shape[0] - bottom_margin
+
+    def _start_segment(self, segment_index):
+        """Prepare the sprites of the segment coming on screen."""
+        text = self.segments[segment_index][0].strip()
+        width, height = self.frame_size
+        self._active_segment = segment_index
+        if not self.karaoke:
+            bitmap = render_caption(text, self.style, width, height)
+            self._active_sprite = CaptionSprite(bitmap, *self._position(bitmap))
+            return
+        base, highlighted, word_boxes = render_karaoke_caption(text, self.style, width, height)
+        x, y = self._position(base)
+        self._active_sprite = CaptionSprite(base, x, y)
+        words = []
+        bitmap_height, bitmap_width = base.shape[:2]
+        for x0, y0, x1, y1 in word_boxes:
+            # Glyph bearings can put a box edge just outside the bitmap
+            x0, x1 = max(x0, 0), min(x1, bitmap_width)
+            y0, y1 = max(y0, 0), min(y1, bitmap_height)
+            # The box in frame coordinates, clipped to the frame
+            box = (
+                min(max(x + x0, 0), width),
+                min(max(y + y0, 0), height),
+                min(max(x + x1, 0), width),
+                min(max(y + y1, 0), height),
+            )
+            sprite = CaptionSprite(highlighted[y0:y1, x0:x1], x + x0, y + y0)
+            words.append((sprite, box))
+        self._active_words = words
+        self._active_word_starts = self._word_starts(segment_index)
+        # Scratch for the frame pixels under the active word's box
+        box_height = max((box[3] - box[1] for _, box in words), default=0)
+        box_width = max((box[2] - box[0] for _, box in words), default=0)
+        self._saved = np.empty((box_height, box_width, 3), dtype=np.uint8)
+
+    def apply(self, frame, t):
+        """
+        Draw the caption for time `t` (clip seconds) onto a BGR frame in place.
+
+        Returns:
+            The same frame
+        """
+        if self.frame_size is None:
+            self.frame_size = (frame.shape[1], frame.shape[0])
+        segment_index = self.segment_at(t)
+        if segment_index is None:
+            return frame
+        if segment_index != self._active_segment:
+            self._start_segment(segment_index)
+        if not self.karaoke or not self._active_words:
+            self._active_sprite.blend(frame)
+            return frame
+
+        word_index = max(0, bisect.bisect_right(self._active_word_starts, t) - 1)
+        word_index = min(word_index, len(self._active_words) - 1)
+        sprite, (x0, y0, x1, y1) = self._active_words[word_index]
+        roi = frame[y0:y1, x0:x1]
+        saved = self._saved[: y1 - y0, : x1 - x0]
+        np.copyto(saved, roi)
+        self._active_sprite.blend(frame)
+        # The highlighted word replaces the base caption inside its box
+        np.copyto(roi, saved)
+        sprite.blend(frame)
+        return frame
@@ -0,0 +1,317 @@
+import functools
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+# Subtitle style presets. Font size and bottom margin scale with video height;
+# "margin" pads the background box (only used by boxed styles) and
+# "highlight_color" marks the spoken word in karaoke captions.
+SUBTITLE_STYLES = {
+    "green_box": {
+        "fontsize_factor": 0.043,
+        "color": "black",
+        "bg_color": "#52b788",
+        "stroke_color": None,
+        "stroke_width": 0,
+        "margin": {
+            "left": 40,
+            "right": 40,
+            "top": 20,
+            "bottom": 20,
+            "color": (82, 183, 136),
+        },
+        "bottom_margin_factor": 0.12,
+        "highlight_color": "white",
+    },
+    "classic": {
+        "fontsize_factor": 0.043,
+        "color": "white",
+        "bg_color": None,
+        "stroke_color": "black",
+        "stroke_width": 3,
+        "margin": None,
+        "bottom_margin_factor": 0.15,
+        "highlight_color": "yellow",
+    },
+    "minimal": {
+        "fontsize_factor": 0.038,
+        "color": "white",
+        "bg_color": None,
+        "stroke_color": "black",
+        "stroke_width": 2,
+        "margin": None,
+        "bottom_margin_factor": 0.10,
+        "highlight_color": "yellow",
+    },
+    "bold_yellow": {
+        "fontsize_factor": 0.050,
+        "color": "yellow",
+        "bg_color": None,
+        "stroke_color": "black",
+        "stroke_width": 4,
+        "margin": None,
+        "bottom_margin_factor": 0.15,
+        "highlight_color": "white",
+    },
+    "tiktok": {
+        "fontsize_factor": 0.055,
+        "color": "white",
+        "bg_color": None,
+        "stroke_color": "black",
+        "stroke_width": 5,
+        "margin": None,
+        "bottom_margin_factor": 0.20,
+        "highlight_color": "yellow",
+    },
+}
+
+# Bold sans fonts tried in order; bare names are looked up in the system font
+# directories by FreeType. Falls back to Pillow's built-in font.
+FONT_CANDIDATES = (
+    "Arial Bold.ttf",
+    "arialbd.ttf",
+    "DejaVuSans-Bold.ttf",
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
+    "LiberationSans-Bold.ttf",
+    "/usr/share/fonts/truetype/liberation/LiberationSans-Bold.ttf",
+)
+
+# Horizontal space left free around captions (matches the old TextClip size)
+CAPTION_SIDE_PADDING = 160
+
+
+def get_style(style):
+    """Style preset by name, falling back to green_box."""
+    return SUBTITLE_STYLES.get(style, SUBTITLE_STYLES["green_box"])
+
+
+@functools.lru_cache(maxsize=64)
+def load_font(size, font_path=None):
+    """FreeType font at `size` pixels, loaded once per (size, path)."""
+    candidates = (font_path,) if font_path else FONT_CANDIDATES
+    for candidate in candidates:
+        try:
+            return ImageFont.truetype(candidate, size)
+        except OSError:
+            continue
+    print(f"⚠ No caption font found ({', '.join(candidates)}), using Pillow's default")
+    return ImageFont.load_default(size)
+
+
+def wrap_text(text, font, max_width, stroke_width=0):
+    """
+    Greedy word wrap using the font's advance widths.
+
+    Explicit newlines in `text` are kept as line breaks.
+
+    Returns:
+        List of lines no wider than `max_width` pixels (a single word wider
+        than that gets a line of its own)
+    """
+    lines = []
+    for paragraph in text.split("\n"):
+        current = ""
+        for word in paragraph.split():
+            candidate = f"{current} {word}" if current else word
+            if not current or font.getlength(candidate) + 2 * stroke_width <= max_width:
+                current = candidate
+            else:
+                lines.append(current)
+                current = word
+        if current:
+            lines.append(current)
+    return lines
+
+
+def _render(
+    text,
+    font_size,
+    color,
+    max_width,
+    stroke_color=None,
+    stroke_width=0,
+    bg_color=None,
+    padding=None,
+    line_spacing=1.15,
+    font_path=None,
+    word_color=None,
+):
+    """
+    Draw a caption; with `word_color`, draw it word by word in that color.
+
+    Word-by-word drawing places every word at the same position whatever its
+    color, so two renders with different word colors line up exactly.
+
+    Returns:
+        (image, word_boxes) - PIL RGBA image, and a list of (x0, y0, x1, y1)
+        per word (None unless drawn word by word)
+    """
+    font = load_font(int(font_size), font_path)
+    stroke_width = int(stroke_width) if stroke_color else 0
+    lines = wrap_text(text, font, max_width, stroke_width) or [""]
+
+    ascent, descent = font.getmetrics()
+    line_height = max(int(round(font_size * line_spacing)), ascent + descent)
+    text_height = line_height * (len(lines) - 1) + ascent + descent + 2 * stroke_width
+
+    # Boxed captions span the wrap width like a caption block; bare text is
+    # cropped to its widest line
+    if bg_color:
+        block_width = int(max_width)
+    else:
+        block_width = int(max(font.getlength(line) for line in lines)) + 2 * stroke_width
+    pad = padding or {"left": 0, "right": 0, "top": 0, "bottom": 0}
+    width = block_width + pad["left"] + pad["right"]
+    height = text_height + pad["top"] + pad["bottom"]
+
+    image = Image.new("RGBA", (max(1, width), max(1, height)), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(image)
+    if padding:
+        draw.rectangle([0, 0, width, height], fill=tuple(padding["color"]))
+    if bg_color:
+        draw.rectangle(
+            [pad["left"], pad["top"], pad["left"] + block_width - 1, pad["top"] + text_height - 1],
+            fill=bg_color,
+        )
+
+    center_x = pad["left"] + block_width / 2
+    y = pad["top"] + stroke_width
+    word_boxes = None if word_color is None else []
+    space_width = font.getlength(" ")
+    for line in lines:
+        if word_color is None:
+            draw.text(
+                (center_x, y),
+                line,
+                font=font,
+                fill=color,
+                anchor="ma",
+                stroke_width=stroke_width,
+                stroke_fill=stroke_color,
+            )
+        else:
+            words = line.split(" ")
+            widths = [font.getlength(word) for word in words]
+            x = center_x - (sum(widths) + space_width * (len(words) - 1)) / 2
+            for word, word_width in zip(words, widths):
+                box = draw.textbbox(
+                    (x, y), word, font=font, anchor="la", stroke_width=stroke_width
+                )
+                word_boxes.append(tuple(int(round(v)) for v in box))
+                draw.text(
+                    (x, y),
+                    word,
+                    font=font,
+                    fill=word_color,
+                    anchor="la",
+                    stroke_width=stroke_width,
+                    stroke_fill=stroke_color,
+                )
+                x += word_width + space_width
+        y += line_height
+    return image, word_boxes
+
+
+def rasterize_text(
+    text,
+    font_size,
+    color,
+    max_width,
+    stroke_color=None,
+    stroke_width=0,
+    bg_color=None,
+    padding=None,
+    line_spacing=1.15,
+    font_path=None,
+):
+    """
+    Render centered, word-wrapped text into an RGBA bitmap.
+
+    Args:
+        text: Caption text
+        font_size: Font size in pixels
+        color: Text color (name, hex string or RGB tuple)
+        max_width: Wrap width in pixels
+        stroke_color: Outline color, or None
+        stroke_width: Outline width in pixels
+        bg_color: Box color behind the text block (opaque), or None for transparent
+        padding: Optional dict with "left", "right", "top", "bottom" and "color" around the box
+        line_spacing: Line height as a multiple of the font size
+        font_path: Font file; defaults to the first of FONT_CANDIDATES found
+
+    Returns:
+        uint8 array of shape (height, width, 4)
+    """
+    image, _ = _render(
+        text,
+        font_size,
+        color,
+        max_width,
+        stroke_color,
+        stroke_width,
+        bg_color,
+        padding,
+        line_spacing,
+        font_path,
+    )
+    return np.asarray(image)
+
+
+def _style_render_args(style, video_width, video_height):
+    config = get_style(style)
+    return config, dict(
+        font_size=int(video_height * config["fontsize_factor"]),
+        max_width=max(1, video_width - CAPTION_SIDE_PADDING),
+        stroke_color=config["stroke_color"],
+        stroke_width=config["stroke_width"],
+        bg_color=config["bg_color"],
+        padding=config["margin"],
+    )
+
+
+@functools.lru_cache(maxsize=512)
+def render_caption(text, style, video_width, video_height):
+    """
+    Caption bitmap for a subtitle style preset, cached by (text, style, size).
+
+    Repeated captions (and re-renders of the same short) reuse the bitmap
+    instead of rasterizing again. The returned array is shared and read-only.
+
+    Args:
+        text: Caption text
+        style: Style preset name (see SUBTITLE_STYLES)
+        video_width: Width of the video the caption goes on
+        video_height: Height of the video (scales the font size)
+
+    Returns:
+        Read-only uint8 RGBA array of shape (height, width, 4)
+    """
+    config, args = _style_render_args(style, video_width, video_height)
+    bitmap = rasterize_text(text, color=config["color"], **args)
+    bitmap.flags.writeable = False
+    return bitmap
+
+
+@functools.lru_cache(maxsize=128)
+def render_karaoke_caption(text, style, video_width, video_height):
+    """
+    Caption bitmaps for word-by-word highlighting.
+
+    Renders the caption twice with an identical layout: once in the style's
+    text color and once with every word in its highlight color. Pasting a
+    word's box from the highlighted bitmap onto the base one highlights that
+    word without rasterizing again.
+
+    Returns:
+        (base, highlighted, word_boxes) - two read-only uint8 RGBA arrays of the
+        same shape, and one (x0, y0, x1, y1) box per word of `text`
+    """
+    config, args = _style_render_args(style, video_width, video_height)
+    base, word_boxes = _render(text, color=config["color"], word_color=config["color"], **args)
+    highlighted, _ = _render(
+        text, color=config["color"], word_color=config["highlight_color"], **args
+    )
+    base = np.asarray(base)
+    highlighted = np.asarray(highlighted)
+    base.flags.writeable = False
+    highlighted.flags.writeable = False
+    return base, highlighted, word_boxes
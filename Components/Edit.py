@@ -1,6 +1,7 @@
 from moviepy.video.io.VideoFileClip import VideoFileClip
 from moviepy.editor import VideoFileClip
 import subprocess
+from Components.Resources import stage_threads
 
 def extractAudio(video_path, audio_path="audio.wav"):
     try:
@@ -14,7 +15,7 @@ def extractAudio(video_path, audio_path="audio.wav"):
         return None
 
 
-def crop_video(input_file, output_file, start_time, end_time):
+def crop_video(input_file, output_file, start_time, end_time, preset="medium"):
     with VideoFileClip(input_file) as video:
         # Ensure end_time doesn't exceed video duration
         max_time = video.duration - 0.1  # Small buffer to avoid edge cases
@@ -23,7 +24,9 @@ def crop_video(input_file, output_file, start_time, end_time):
             end_time = max_time
         
         cropped_video = video.subclip(start_time, end_time)
-        cropped_video.write_videofile(output_file, codec='libx264')
+        cropped_video.write_videofile(
+            output_file, codec='libx264', preset=preset, threads=stage_threads("render")
+        )
 
 # Example usage:
 if __name__ == "__main__":
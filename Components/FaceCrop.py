@@ -1,127 +1,75 @@
 import cv2
 import numpy as np
 from moviepy.editor import *
-from Components.Speaker import detect_faces_and_speakers, Frames
+from Components.Speaker import detect_faces_and_speakers, analyze_speakers
+from Components.FaceDetectors import get_analysis_detector
+from Components.FramePipeline import run_frame_pipeline
+from Components.Motion import motion_thumbnail, motion_center, thumbnail_shape
+from Components.FfmpegWriter import (
+    FfmpegWriter,
+    INTERMEDIATE_ENCODER,
+    DRAFT_ENCODER,
+    FINAL_ENCODER,
+)
+from Components.Resources import stage_threads
+from Components.Profiling import frame_timer
+from Components.SceneDetection import (
+    detect_shots,
+    source_hash,
+    cache_path,
+    load_cached_json,
+    save_cached_json,
+)
+
+# Draft renders: fraction of the source height and target frame rate
+DRAFT_SCALE = 0.5
+DRAFT_FPS = 15
+
+# Bumped when plan_crop's decisions change, so cached shot plans are redone
+SHOT_PLAN_VERSION = 2
 
 global Fps
 
 
-def crop_to_vertical(input_video_path, output_video_path, zoom_mode="auto"):
+def plan_crop(
+    face_positions, face_widths, original_width, original_height, zoom_mode="auto"
+):
     """
-    Crop video to vertical 9:16 format with intelligent zoom adjustment
+    Decide zoom, crop position and crop mode for one shot.
+
+    Face shots are a full-height crop (zoom 1.0) unless `zoom_mode` is "fit"
+    or the source is narrower than 9:16, the only cases that letterbox them.
+    "auto" zooms out screen recordings only.
 
     Args:
-        input_video_path: Path to input video
-        output_video_path: Path to output video
-        zoom_mode: "auto" (intelligent zoom), "fit" (zoom out to fit all), "fill" (zoom in to fill), "none" (no zoom)
+        face_positions: Horizontal centers of the largest face in sampled frames (source pixels)
+        face_widths: Widths of those faces (source pixels)
+        original_width: Source frame width
+        original_height: Source frame height
+        zoom_mode: "auto", "fit", "fill" or "none"
+
+    Returns:
+        Dict with "zoom_scale", "x_start" (in scaled coordinates) and "use_motion_tracking"
     """
-    face_cascade = cv2.CascadeClassifier(
-        cv2.data.haarcascades + "haarcascade_frontalface_default.xml"
-    )
-
-    cap = cv2.VideoCapture(input_video_path, cv2.CAP_FFMPEG)
-    if not cap.isOpened():
-        print("Error: Could not open video.")
-        return
-
-    original_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-    original_height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-    fps = cap.get(cv2.CAP_PROP_FPS)
-    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-
-    vertical_height = int(original_height)
-    vertical_width = int(vertical_height * 9 / 16)
-    print(f"Output dimensions: {vertical_width}x{vertical_height}")
-
+    vertical_width = int(original_height * 9 / 16)
     if original_width < vertical_width:
-        print(
-            "⚠ Original video width is less than desired vertical width. Zooming out to fit."
-        )
         zoom_mode = "fit"  # Force zoom out mode
 
-    # Detect face position in first 30 frames to determine static crop position
-    print("Detecting face position for static crop...")
-    face_positions = []
-    face_widths = []
-    for i in range(min(30, total_frames)):
-        ret, frame = cap.read()
-        if not ret:
-            break
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        faces = face_cascade.detectMultiScale(
-            gray, scaleFactor=1.1, minNeighbors=8, minSize=(30, 30)
-        )
-        if len(faces) > 0:
-            # Get largest face
-            best_face = max(faces, key=lambda f: f[2] * f[3])
-            x, y, w, h = best_face
-            face_center_x = x + w // 2
-            face_positions.append(face_center_x)
-            face_widths.append(w)
-
     # Determine zoom scale based on content
     zoom_scale = 1.0  # Default: no zoom
 
     if zoom_mode == "fit":
         # Zoom out to ensure full width fits
         zoom_scale = vertical_width / original_width
-        print(f"📏 Zoom mode: FIT - Scaling to {zoom_scale:.2f}x to fit full width")
-    elif zoom_mode == "fill":
-        # Zoom in to fill frame (no black bars)
-        zoom_scale = 1.0
-        print(f"📏 Zoom mode: FILL - No zoom adjustment (1.0x)")
-    elif zoom_mode == "auto":
-        # Intelligent zoom based on content
-        if face_positions:
-            # Calculate if faces are too close to edges
-            avg_face_x = int(sorted(face_positions)[len(face_positions) // 2])
-            avg_face_width = int(np.mean(face_widths))
-
-            # Check if face would be clipped with current crop
-            potential_x_start = max(
-                0,
-                min(avg_face_x - vertical_width // 2, original_width - vertical_width),
-            )
-            face_left_edge = avg_face_x - avg_face_width // 2
-            face_right_edge = avg_face_x + avg_face_width // 2
-
-            # If face is too close to edges or content is wide, zoom out slightly
-            margin_needed = avg_face_width * 0.3  # 30% margin on each side
-            if (
-                face_left_edge < potential_x_start + margin_needed
-                or face_right_edge > potential_x_start + vertical_width - margin_needed
-            ):
-                zoom_scale = 0.85  # Zoom out 15%
-                print(
-                    f"📏 Zoom mode: AUTO - Face near edge, zooming out to {zoom_scale:.2f}x"
-                )
-            else:
-                zoom_scale = 1.0
-                print(f"📏 Zoom mode: AUTO - Face centered well, keeping 1.0x zoom")
+    elif zoom_mode == "auto" and not face_positions:
+        # Screen recording: check if we need to zoom out for better visibility
+        aspect_ratio = original_width / original_height
+        if aspect_ratio > 2.0:  # Very wide content
+            zoom_scale = 0.75  # Zoom out 25% for wide screens
         else:
-            # Screen recording: check if we need to zoom out for better visibility
-            aspect_ratio = original_width / original_height
-            if aspect_ratio > 2.0:  # Very wide content
-                zoom_scale = 0.75  # Zoom out 25% for wide screens
-                print(
-                    f"📏 Zoom mode: AUTO - Wide screen detected ({aspect_ratio:.2f}:1), zooming out to {zoom_scale:.2f}x"
-                )
-            else:
-                zoom_scale = 0.85  # Slight zoom out for screen recordings
-                print(
-                    f"📏 Zoom mode: AUTO - Screen recording, zooming out to {zoom_scale:.2f}x"
-                )
+            zoom_scale = 0.85  # Slight zoom out for screen recordings
 
-    # Apply zoom scaling
-    if zoom_scale != 1.0:
-        scaled_width = int(original_width * zoom_scale)
-        scaled_height = int(original_height * zoom_scale)
-        print(
-            f"Scaling video from {original_width}x{original_height} to {scaled_width}x{scaled_height}"
-        )
-    else:
-        scaled_width = original_width
-        scaled_height = original_height
+    scaled_width = int(original_width * zoom_scale)
 
     # Calculate static crop position
     if face_positions:
@@ -135,130 +83,602 @@ def crop_to_vertical(input_video_path, output_video_path, zoom_mode="auto"):
         x_start = max(
             0, min(avg_face_x - vertical_width // 2, scaled_width - vertical_width)
         )
-        print(f"✓ Face detected. Using face-centered crop at x={x_start}")
         use_motion_tracking = False
     else:
         # No face detected - likely a screen recording
-        print(
-            f"✗ No face detected. Using half-width with motion tracking for screen recording"
-        )
         use_motion_tracking = True
         x_start = 0  # Initial position, will be updated by tracking
 
-    # Reset video to beginning
-    cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+    return {
+        "zoom_scale": zoom_scale,
+        "x_start": int(x_start),
+        "use_motion_tracking": use_motion_tracking,
+    }
+
+
+def _largest_faces(face_batches, scale=1.0):
+    """Center x and width (scaled to source pixels) of the largest face in each frame."""
+    face_positions = []
+    face_widths = []
+    for faces in face_batches:
+        if len(faces) > 0:
+            # Get largest face
+            best_face = max(faces, key=lambda f: f[2] * f[3])
+            x, y, w, h = best_face[:4] * scale
+            face_positions.append(int(x + w // 2))
+            face_widths.append(int(w))
+    return face_positions, face_widths
+
+
+def analyze_shots(
+    input_video_path,
+    original_width,
+    original_height,
+    zoom_mode="auto",
+    detector_backend="haar",
+):
+    """
+    Split a clip into shots and decide the crop for each one.
+
+    Results are cached in .cache/shots by source hash, so re-rendering the
+    same clip skips the analysis pass.
+
+    Returns:
+        List of per-shot plans: plan_crop() dicts plus "start" and "end" frames
+    """
+    key = (
+        f"{source_hash(input_video_path)}_{zoom_mode}_{detector_backend}"
+        f"_v{SHOT_PLAN_VERSION}"
+    )
+    plan_path = cache_path("shots", key)
+    shot_plan = load_cached_json(plan_path)
+    if shot_plan is not None:
+        print(f"Loaded cached shot plan ({len(shot_plan)} shot(s))")
+        return shot_plan
+
+    print("Detecting shots and face positions...")
+    shots, samples = detect_shots(input_video_path)
+    analysis_width = next((s[0].shape[1] for s in samples if s), original_width)
+    scale = original_width / analysis_width
+
+    detector = get_analysis_detector(detector_backend, scale)
+
+    # One batched detection pass over the samples of every shot
+    all_samples = [frame for shot_samples in samples for frame in shot_samples]
+    detections = []
+    for i in range(0, len(all_samples), 32):
+        detections.extend(detector.detect_batch(all_samples[i : i + 32]))
+
+    shot_plan = []
+    offset = 0
+    for (start, end), shot_samples in zip(shots, samples):
+        shot_faces = detections[offset : offset + len(shot_samples)]
+        offset += len(shot_samples)
+        face_positions, face_widths = _largest_faces(shot_faces, scale)
+        decision = plan_crop(
+            face_positions, face_widths, original_width, original_height, zoom_mode
+        )
+        decision["start"] = start
+        decision["end"] = end
+        shot_plan.append(decision)
+
+    save_cached_json(plan_path, shot_plan)
+    return shot_plan
+
+
+def plan_from_analysis(analysis, clip_start, clip_end, fps, zoom_mode="auto"):
+    """
+    Build a clip's shot plan from a whole-source analysis timeline.
+
+    Args:
+        analysis: SourceAnalysis of the source the clip was cut from
+        clip_start: Clip start time in the source (seconds)
+        clip_end: Clip end time in the source (seconds)
+        fps: Frame rate of the clip
+        zoom_mode: "auto", "fit", "fill" or "none"
+
+    Returns:
+        List of per-shot plans in clip frame numbers (like analyze_shots), or
+        None if the timeline has no samples in the range
+    """
+    rows = analysis.between(clip_start, clip_end)
+    if len(rows) == 0:
+        return None
+
+    shot_plan = []
+    shot_ids, first_rows = np.unique(rows["shot"], return_index=True)
+    bounds = list(first_rows) + [len(rows)]
+    for i in range(len(shot_ids)):
+        shot_rows = rows[bounds[i] : bounds[i + 1]]
+        has_face = shot_rows["face_count"] > 0
+        decision = plan_crop(
+            [int(x) for x in shot_rows["face_x"][has_face]],
+            [int(w) for w in shot_rows["face_w"][has_face]],
+            analysis.width,
+            analysis.height,
+            zoom_mode,
+        )
+        if decision["use_motion_tracking"]:
+            # Start tracking where the shot's motion is instead of the left edge
+            motion = shot_rows["motion_x"][np.isfinite(shot_rows["motion_x"])]
+            if len(motion):
+                vertical_width = int(analysis.height * 9 / 16)
+                scaled_width = int(analysis.width * decision["zoom_scale"])
+                motion_x = int(np.median(motion) * scaled_width)
+                decision["x_start"] = max(
+                    0,
+                    min(motion_x - vertical_width // 2, scaled_width - vertical_width),
+                )
+        # Shot starts are frame-accurate, unlike the sample times
+        start_time = 0.0 if i == 0 else max(0.0, analysis.shot_start(shot_ids[i]) - clip_start)
+        decision["start"] = int(round(start_time * fps))
+        shot_plan.append(decision)
+
+    for shot, next_shot in zip(shot_plan, shot_plan[1:]):
+        shot["end"] = next_shot["start"]
+    shot_plan[-1]["end"] = int(round((clip_end - clip_start) * fps))
+    return shot_plan
+
+
+def plan_speaker_path(tracks, frame_count, shot_plan, fps, hold=1.0, smoothing=0.5):
+    """
+    Per-frame horizontal crop center that follows the active speaker.
+
+    The followed track only changes once another speaker has been active for
+    `hold` seconds, so short interjections don't make the crop ping-pong.
+    Between detections the center is interpolated, then smoothed with a
+    `smoothing`-second moving average inside each shot (never across a cut).
+
+    Args:
+        tracks: TrackStore from analyze_speakers()
+        frame_count: Number of frames in the clip
+        shot_plan: Shot plan of the clip (for the cut positions)
+        fps: Clip frame rate
+
+    Returns:
+        float32 array of crop centers in source pixels, one per frame, or
+        None if no one was ever detected speaking
+    """
+    records = tracks.records
+    if len(tracks.speakers()) == 0 or frame_count == 0:
+        return None
+
+    sample_frames, first_rows = np.unique(records["frame"], return_index=True)
+    bounds = list(first_rows) + [len(records)]
+    centers = np.full(len(sample_frames), np.nan, dtype=np.float32)
+    last_center = {}
+    current = candidate = None
+    candidate_since = 0.0
+    for i, frame in enumerate(sample_frames):
+        rows = records[bounds[i] : bounds[i + 1]]
+        for row in rows:
+            last_center[int(row["track_id"])] = row["box"][0] + row["box"][2] / 2
+        time = float(rows["time"][0])
+        speaking = rows["track_id"][rows["speaker"]]
+        if len(speaking):
+            speaker = int(speaking[0])
+            if current is None:
+                current = speaker
+            elif speaker == current:
+                candidate = None
+            elif speaker != candidate:
+                candidate, candidate_since = speaker, time
+            elif time - candidate_since >= hold:
+                current, candidate = speaker, None
+        if current is not None:
+            centers[i] = last_center[current]
+
+    # Before anyone speaks, frame the first speaker
+    known = np.isfinite(centers)
+    centers[: np.argmax(known)] = centers[known][0]
+    path = np.interp(np.arange(frame_count), sample_frames, centers).astype(np.float32)
+
+    window = max(1, int(round(smoothing * fps)))
+    if window > 1:
+        kernel = np.ones(window, dtype=np.float32) / window
+        for shot in shot_plan:
+            start = min(shot["start"], frame_count)
+            end = frame_count if shot is shot_plan[-1] else min(shot["end"], frame_count)
+            segment = path[start:end]
+            if len(segment) > 1:
+                padded = np.pad(segment, window // 2, mode="edge")
+                path[start:end] = np.convolve(padded, kernel, mode="valid")[: len(segment)]
+    return path
+
+
+def crop_to_vertical(
+    input_video_path,
+    output_video_path,
+    zoom_mode="auto",
+    detector_backend="haar",
+    queue_size=8,
+    audio_path=None,
+    encoder_options=None,
+    analysis=None,
+    clip_start=0.0,
+    active_speaker=False,
+    speaker_stride=5,
+    captions=None,
+    plan=None,
+    draft=False,
+):
+    """
+    Crop video to vertical 9:16 format with intelligent zoom adjustment
+
+    The clip is split into shots at scene cuts, and crop mode, zoom and face
+    position are decided separately for every shot. When a whole-source
+    `analysis` is given, the clip's time range is sliced from it and no
+    per-clip analysis pass runs. With `active_speaker`, face shots follow
+    whoever is talking instead of holding a static crop.
+
+    The crop decisions are returned as a plan; passing that `plan` back
+    renders the same crops without analysing again. A `draft` render uses
+    the same decisions at DRAFT_SCALE of the source height and about
+    DRAFT_FPS frames per second with an ultrafast encode, and skips active
+    speaker tracking.
+
+    Args:
+        input_video_path: Path to input video
+        output_video_path: Path to output video
+        zoom_mode: "auto" (intelligent zoom), "fit" (zoom out to fit all), "fill" (zoom in to fill), "none" (no zoom)
+        detector_backend: Face detector backend - "haar" or "dnn" (see FaceDetectors.py)
+        queue_size: Frames buffered between the decode, crop and encode threads
+        audio_path: Optional file whose audio is muxed into the output in the same encode
+        encoder_options: libx264 settings for FfmpegWriter (preset, crf, threads)
+        analysis: Optional SourceAnalysis of the source this clip was cut from
+        clip_start: Start time of this clip in the analysed source (seconds)
+        active_speaker: Follow the active speaker (face detection fused with voice activity)
+        speaker_stride: Run speaker face detection on every Nth frame
+        captions: Optional CaptionCompositor drawn onto each cropped frame (clip time)
+        plan: Plan returned by an earlier call for this clip (skips shot analysis;
+            with `active_speaker`, speakers are tracked if the plan has no path)
+        draft: Render a fast low-resolution, low-frame-rate preview
+
+    Returns:
+        Plan dict with "shot_plan" and "center_path" (None if the video can't be opened)
+    """
+    cap = cv2.VideoCapture(input_video_path, cv2.CAP_FFMPEG)
+    if not cap.isOpened():
+        print("Error: Could not open video.")
+        return
+
+    original_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    original_height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+
+    output_scale = DRAFT_SCALE if draft else 1.0
+    frame_step = max(1, int(round(fps / DRAFT_FPS))) if draft else 1
+    vertical_height = int(original_height * output_scale)
+    vertical_width = int(int(original_height) * 9 / 16 * output_scale)
+    print(f"Output dimensions: {vertical_width}x{vertical_height}")
 
-    # For screen recordings, use the already calculated scaled dimensions
-    if use_motion_tracking:
-        # Scale factor already calculated above
-        target_display_width = scaled_width * 0.67
+    if original_width < vertical_width:
         print(
-            f"Half-width display: showing {int(target_display_width)}px wide section from {scaled_width}px scaled frame"
+            "⚠ Original video width is less than desired vertical width. Zooming out to fit."
+        )
+        zoom_mode = "fit"  # Force zoom out mode
+
+    shot_plan = None
+    center_path = None
+    if plan is not None:
+        shot_plan = plan["shot_plan"]
+        center_path = plan["center_path"]
+        print(f"Using saved crop plan ({len(shot_plan)} shots)")
+    elif analysis is not None:
+        clip_end = clip_start + total_frames / fps
+        shot_plan = plan_from_analysis(analysis, clip_start, clip_end, fps, zoom_mode)
+        if shot_plan is not None:
+            print(f"Using source analysis for {clip_start:.1f}s - {clip_end:.1f}s")
+    if shot_plan is None:
+        shot_plan = analyze_shots(
+            input_video_path,
+            original_width,
+            original_height,
+            zoom_mode=zoom_mode,
+            detector_backend=detector_backend,
+        )
+    for idx, shot in enumerate(shot_plan, 1):
+        if shot["use_motion_tracking"]:
+            mode = "no face, motion tracking"
+        else:
+            mode = f"face-centered crop at x={shot['x_start']}"
+        print(
+            f"  Shot {idx}: frames {shot['start']}-{shot['end']} - {mode}, "
+            f"zoom {shot['zoom_scale']:.2f}x"
         )
 
-    # Write output
-    fourcc = cv2.VideoWriter_fourcc(*"mp4v")
-    out = cv2.VideoWriter(
-        output_video_path, fourcc, fps, (vertical_width, vertical_height)
+    if active_speaker and draft:
+        print("Draft render: skipping active speaker tracking")
+    elif active_speaker and center_path is None:
+        # Also when replaying a draft plan: drafts skip speaker tracking
+        # Haar misses turned heads in interviews; use the SSD unless another
+        # network backend was chosen
+        speaker_backend = "dnn" if detector_backend == "haar" else detector_backend
+        try:
+            tracks = analyze_speakers(
+                input_video_path, detector_backend=speaker_backend, stride=speaker_stride
+            )
+            center_path = plan_speaker_path(tracks, total_frames, shot_plan, fps)
+            if center_path is None:
+                print("⚠ No active speaker found, using static crops")
+            else:
+                print("✓ Following the active speaker in face shots")
+        except Exception as e:
+            print(f"⚠ Active speaker tracking failed, using static crops: {e}")
+
+    # Write output straight into an x264 encoder
+    out = FfmpegWriter(
+        output_video_path,
+        fps / frame_step,
+        (vertical_width, vertical_height),
+        audio_path=audio_path,
+        **(encoder_options or (DRAFT_ENCODER if draft else INTERMEDIATE_ENCODER)),
     )
     global Fps
-    Fps = fps
+    Fps = fps / frame_step
+
+    # Motion tracking updates about once per second, counted in rendered
+    # frames (drafts render only every `frame_step`-th source frame)
+    update_interval = max(1, int(fps) // frame_step)
+    cropper = ShotCropper(
+        shot_plan,
+        original_width,
+        original_height,
+        update_interval,
+        center_path,
+        output_scale,
+    )
 
-    frame_count = 0
-    smoothed_x = 0  # Smoothed horizontal position in scaled coordinates
-    prev_gray = None
+    # Burn captions into the cropped frame while it is still in memory
+    def captioned(frame, frame_index, dst=None):
+        cropped = cropper(frame, frame_index, dst)
+        if cropped is not None:
+            captions.apply(cropped, frame_index / fps)
+        return cropped
 
-    # Calculate update interval for motion tracking (max 1 shift per second)
-    if use_motion_tracking:
-        update_interval = int(fps)  # Update once per second
-        print(
-            f"Motion tracking: updating every {update_interval} frames (~1 shift/second)"
+    transform = captioned if captions is not None else cropper
+
+    # Per-frame crop (and caption) time when profiling
+    timer = frame_timer("crop")
+    if timer is not None:
+        transform = timer.wrap(transform)
+
+    # Decode, crop and encode on overlapping threads, reusing pooled buffers
+    try:
+        frame_count = run_frame_pipeline(
+            cap,
+            transform,
+            out,
+            queue_size=queue_size,
+            total_frames=total_frames,
+            frame_shape=(original_height, original_width, 3),
+            output_shape=(vertical_height, vertical_width, 3),
+            frame_step=frame_step,
         )
+    except BaseException:
+        # Keep the pipeline's error rather than the encoder's broken pipe
+        out.abort()
+        raise
+    finally:
+        cap.release()
+    out.release()
+    print(f"Cropping complete. Processed {frame_count} frames -> {output_video_path}")
+    return {"shot_plan": shot_plan, "center_path": center_path}
 
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
 
-        if use_motion_tracking:
-            # Resize frame first
-            resized_frame = cv2.resize(
-                frame, (scaled_width, scaled_height), interpolation=cv2.INTER_LANCZOS4
+class ShotCropper:
+    """
+    Frame transform that applies each shot's own crop decision.
+
+    Wraps one VerticalCropper per shot, created when the shot starts, so
+    motion tracking restarts at every cut. An optional `center_path` (crop
+    center in source pixels per frame) moves the crop of face shots.
+    `output_scale` renders the same crops at a fraction of the source height.
+    """
+
+    def __init__(
+        self,
+        shot_plan,
+        original_width,
+        original_height,
+        update_interval,
+        center_path=None,
+        output_scale=1.0,
+    ):
+        self.shot_plan = shot_plan
+        self.original_width = original_width
+        self.original_height = original_height
+        self.update_interval = update_interval
+        self.center_path = center_path
+        self.output_scale = output_scale
+        self.shot_index = -1
+        self.cropper = None
+
+    def _cropper_for(self, shot):
+        scale = self.output_scale
+        vertical_height = int(self.original_height * scale)
+        vertical_width = int(int(self.original_height) * 9 / 16 * scale)
+        zoom_scale = shot["zoom_scale"] * scale
+        return VerticalCropper(
+            vertical_width,
+            vertical_height,
+            int(self.original_width * zoom_scale),
+            int(self.original_height * zoom_scale),
+            int(shot["x_start"] * scale),
+            shot["use_motion_tracking"],
+            self.update_interval,
+        )
+
+    def _start_shot(self, shot_index):
+        self.shot_index = shot_index
+        self.cropper = self._cropper_for(self.shot_plan[shot_index])
+
+    def __call__(self, frame, frame_index, dst=None):
+        if self.cropper is None:
+            self._start_shot(0)
+        # Frames past the last analysed shot keep using the last decision
+        while (
+            self.shot_index + 1 < len(self.shot_plan)
+            and frame_index >= self.shot_plan[self.shot_index + 1]["start"]
+        ):
+            self._start_shot(self.shot_index + 1)
+        shot = self.shot_plan[self.shot_index]
+        cropper = self.cropper
+        if self.center_path is not None and not shot["use_motion_tracking"]:
+            center = self.center_path[min(frame_index, len(self.center_path) - 1)]
+            cropper.x_start = max(
+                0,
+                min(
+                    int(center * shot["zoom_scale"] * self.output_scale)
+                    - cropper.vertical_width // 2,
+                    cropper.scaled_width - cropper.vertical_width,
+                ),
             )
+        return cropper(frame, frame_index - shot["start"], dst)
 
+
+class VerticalCropper:
+    """
+    Per-frame transform that turns a source frame into a vertical crop.
+
+    Frames are scaled by the zoom factor (only the cropped region is
+    resized) and letterboxed if that leaves them shorter than the output;
+    at zoom 1.0 the crop is full height. Face videos get a static crop at `x_start`; screen recordings
+    follow motion, re-estimated once per `update_interval` rendered frames
+    (counted by the cropper, so skipped frames and shots starting anywhere
+    don't shift the updates). Frames must be passed in order, because motion
+    tracking carries state from one frame to the next.
+
+    Pass a preallocated `dst` of shape (vertical_height, vertical_width, 3)
+    to render without allocating; motion thumbnails reuse scratch buffers.
+    """
+
+    def __init__(
+        self,
+        vertical_width,
+        vertical_height,
+        scaled_width,
+        scaled_height,
+        x_start,
+        use_motion_tracking,
+        update_interval,
+    ):
+        self.vertical_width = vertical_width
+        self.vertical_height = vertical_height
+        self.scaled_width = scaled_width
+        self.scaled_height = scaled_height
+        self.x_start = x_start
+        self.use_motion_tracking = use_motion_tracking
+        self.update_interval = update_interval
+        # Smoothed horizontal position in scaled coordinates
+        self.smoothed_x = x_start if use_motion_tracking else 0
+        self.prev_thumb = None
+        self.frames_rendered = 0
+        # Motion scratch buffers, allocated on the first motion update
+        self._thumbs = None
+        self._thumb_scratch = None
+        self._diff_scratch = None
+
+    def _update_motion(self, frame):
+        vertical_width = self.vertical_width
+        scaled_width = self.scaled_width
+
+        if self._thumbs is None:
+            height, width = thumbnail_shape(frame.shape)
+            self._thumbs = [np.empty((height, width), dtype=np.uint8) for _ in range(2)]
+            self._thumb_scratch = np.empty((height, width, 3), dtype=np.uint8)
+            self._diff_scratch = np.empty((height, width), dtype=np.uint8)
+
+        # Frame differencing on a small thumbnail instead of dense optical flow;
+        # the two thumbnail buffers alternate between "previous" and "current"
+        curr_thumb = self._thumbs[1] if self.prev_thumb is self._thumbs[0] else self._thumbs[0]
+        motion_thumbnail(frame, dst=curr_thumb, scratch=self._thumb_scratch)
+
+        if self.prev_thumb is not None:
+            center = motion_center(
+                self.prev_thumb, curr_thumb, scratch=self._diff_scratch
+            )
+            if center is not None:
+                motion_x = int(center * scaled_width)
+                # Target x position to center motion in the crop
+                target_x = max(
+                    0,
+                    min(
+                        motion_x - vertical_width // 2,
+                        scaled_width - vertical_width,
+                    ),
+                )
+
+                # Smooth tracking (90% previous, 10% new)
+                self.smoothed_x = int(0.90 * self.smoothed_x + 0.10 * target_x)
+
+        self.prev_thumb = curr_thumb
+
+    def __call__(self, frame, frame_index, dst=None):
+        vertical_width = self.vertical_width
+        vertical_height = self.vertical_height
+        scaled_width = self.scaled_width
+        scaled_height = self.scaled_height
+
+        if self.use_motion_tracking:
             # Update motion tracking once per second
-            if frame_count % update_interval == 0:
-                curr_gray = cv2.cvtColor(resized_frame, cv2.COLOR_BGR2GRAY)
-
-                if prev_gray is not None:
-                    # Calculate optical flow
-                    flow = cv2.calcOpticalFlowFarneback(
-                        prev_gray, curr_gray, None, 0.5, 3, 15, 3, 5, 1.2, 0
-                    )
-                    magnitude, _ = cv2.cartToPolar(flow[..., 0], flow[..., 1])
-
-                    # Focus on significant motion
-                    motion_threshold = 2.0
-                    significant_motion = magnitude > motion_threshold
-
-                    if np.any(significant_motion):
-                        # Weight columns by motion
-                        col_motion = np.sum(magnitude * significant_motion, axis=0)
-
-                        if np.sum(col_motion) > 0:
-                            motion_x = int(
-                                np.average(np.arange(scaled_width), weights=col_motion)
-                            )
-                            # Target x position to center motion in the crop
-                            target_x = max(
-                                0,
-                                min(
-                                    motion_x - vertical_width // 2,
-                                    scaled_width - vertical_width,
-                                ),
-                            )
-
-                            # Smooth tracking (90% previous, 10% new)
-                            smoothed_x = int(0.90 * smoothed_x + 0.10 * target_x)
-
-                prev_gray = curr_gray
-
-            # Crop from scaled frame
-            crop_x_start = int(smoothed_x)
-            crop_x_end = min(crop_x_start + vertical_width, scaled_width)
-
-            # Ensure we get full width
-            if crop_x_end - crop_x_start < vertical_width:
-                crop_x_start = max(0, crop_x_end - vertical_width)
-
-            cropped_frame = resized_frame[:, crop_x_start:crop_x_end]
-
-            # If scaled height is less than vertical height, add letterboxing
-            if scaled_height < vertical_height:
-                canvas = np.zeros((vertical_height, vertical_width, 3), dtype=np.uint8)
-                offset_y = (vertical_height - scaled_height) // 2
-                canvas[offset_y : offset_y + scaled_height, :] = cropped_frame
-                cropped_frame = canvas
-            elif scaled_height > vertical_height:
-                # Crop height from top
-                cropped_frame = cropped_frame[:vertical_height, :]
+            if self.frames_rendered % self.update_interval == 0:
+                self._update_motion(frame)
+            self.frames_rendered += 1
+            crop_x_start = int(self.smoothed_x)
         else:
             # Face-detected videos: static crop
-            cropped_frame = frame[:, x_start : x_start + vertical_width]
+            crop_x_start = self.x_start
 
-        if cropped_frame.shape[1] == 0:
-            print(f"Warning: Empty crop at frame {frame_count}")
-            break
+        # Crop window in scaled coordinates
+        crop_x_end = min(crop_x_start + vertical_width, scaled_width)
 
-        out.write(cropped_frame)
-        frame_count += 1
+        # Ensure we get full width
+        if crop_x_end - crop_x_start < vertical_width:
+            crop_x_start = max(0, crop_x_end - vertical_width)
 
-        if frame_count % 100 == 0:
-            print(f"Processed {frame_count}/{total_frames} frames")
+        if crop_x_end <= crop_x_start:
+            print(f"Warning: Empty crop at frame {frame_index}")
+            return None
 
-    cap.release()
-    out.release()
-    print(f"Cropping complete. Processed {frame_count} frames -> {output_video_path}")
+        if dst is None:
+            dst = np.empty((vertical_height, vertical_width, 3), dtype=np.uint8)
+
+        # Where the crop lands in the output; anything around it is letterboxing
+        crop_width = crop_x_end - crop_x_start
+        crop_height = min(scaled_height, vertical_height)
+        offset_y = (vertical_height - crop_height) // 2
+        offset_x = (vertical_width - crop_width) // 2
+        target = dst[offset_y : offset_y + crop_height, offset_x : offset_x + crop_width]
+
+        frame_height, frame_width = frame.shape[:2]
+        if scaled_width == frame_width and scaled_height == frame_height:
+            # No zoom: plain copy of the source region
+            np.copyto(target, frame[:crop_height, crop_x_start:crop_x_end])
+        else:
+            # Cut the matching source region first and resize only that ROI
+            scale_x = frame_width / scaled_width
+            scale_y = frame_height / scaled_height
+            src_x_start = int(round(crop_x_start * scale_x))
+            src_x_end = max(src_x_start + 1, int(round(crop_x_end * scale_x)))
+            src_y_end = max(1, int(round(crop_height * scale_y)))
+            cv2.resize(
+                frame[:src_y_end, src_x_start:src_x_end],
+                (crop_width, crop_height),
+                dst=target,
+                interpolation=cv2.INTER_AREA if scale_x > 1 else cv2.INTER_LANCZOS4,
+            )
+
+        # Clear only the letterbox bars instead of the whole canvas
+        if offset_y > 0 or crop_height < vertical_height:
+            dst[:offset_y] = 0
+            dst[offset_y + crop_height :] = 0
+        if offset_x > 0 or crop_width < vertical_width:
+            dst[:, :offset_x] = 0
+            dst[:, offset_x + crop_width :] = 0
+
+        return dst
 
 
 def combine_videos(video_with_audio, video_without_audio, output_filename):
@@ -277,8 +697,9 @@ def combine_videos(video_with_audio, video_without_audio, output_filename):
             codec="libx264",
             audio_codec="aac",
             fps=Fps,
-            preset="medium",
-            bitrate="3000k",
+            preset=FINAL_ENCODER["preset"],
+            bitrate=FINAL_ENCODER["bitrate"],
+            threads=stage_threads("render"),
         )
         print(f"Combined video saved successfully as {output_filename}")
 
@@ -290,6 +711,6 @@ if __name__ == "__main__":
     input_video_path = r"Out.mp4"
     output_video_path = "Croped_output_video.mp4"
     final_video_path = "final_video_with_audio.mp4"
-    detect_faces_and_speakers(input_video_path, "DecOut.mp4")
+    detect_faces_and_speakers(input_video_path, "DecOut.mp4")  # Debug video
     crop_to_vertical(input_video_path, output_video_path)
     combine_videos(input_video_path, output_video_path, final_video_path)
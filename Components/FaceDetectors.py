@@ -0,0 +1,312 @@
+import os
+import threading
+import cv2
+import numpy as np
+from Components.Resources import stage_threads
+
+# Default model locations (same files Speaker.py has always used)
+DNN_PROTOTXT_PATH = "models/deploy.prototxt"
+DNN_MODEL_PATH = "models/res10_300x300_ssd_iter_140000_fp16.caffemodel"
+ONNX_MODEL_PATH = "models/res10_300x300_ssd_iter_140000.onnx"
+
+# Backends offered on the command line. The ONNX backends need an ONNX
+# export of the SSD at ONNX_MODEL_PATH, which is not shipped with the repo
+CLI_BACKENDS = ("haar", "dnn")
+
+# Mean values the ResNet-SSD face model was trained with (BGR)
+SSD_MEAN = (104.0, 177.0, 123.0)
+SSD_INPUT_SIZE = (300, 300)
+
+# Loaded models are shared by every detector in the process
+_model_cache = {}
+_detector_cache = {}
+_cache_lock = threading.Lock()
+
+
+def _require_model(path, backend, hint):
+    """Raise a readable error for a missing model file instead of a loader exception."""
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Model for the '{backend}' face detector not found at {path}: {hint}")
+
+
+def _cached(key, loader):
+    """Load a model once per process and return the shared instance."""
+    with _cache_lock:
+        if key not in _model_cache:
+            _model_cache[key] = loader()
+        return _model_cache[key]
+
+
+def _empty_boxes():
+    return np.zeros((0, 5), dtype=np.float32)
+
+
+def _ssd_to_boxes(detections, sizes, confidence):
+    """
+    Convert SSD DetectionOutput rows into per-frame box arrays.
+
+    Args:
+        detections: Array of rows [image_id, label, score, x1, y1, x2, y2] (normalized coords)
+        sizes: List of (width, height) for each frame in the batch
+        confidence: Minimum score to keep a detection
+
+    Returns:
+        List with one (K, 5) float32 array [x, y, w, h, score] per frame
+    """
+    rows = detections.reshape(-1, 7)
+    rows = rows[rows[:, 2] > confidence]
+    results = []
+    for image_id, (w, h) in enumerate(sizes):
+        frame_rows = rows[rows[:, 0] == image_id]
+        if len(frame_rows) == 0:
+            results.append(_empty_boxes())
+            continue
+        corners = np.clip(frame_rows[:, 3:7], 0.0, 1.0) * np.array(
+            [w, h, w, h], dtype=np.float32
+        )
+        boxes = np.empty((len(frame_rows), 5), dtype=np.float32)
+        boxes[:, 0] = corners[:, 0]
+        boxes[:, 1] = corners[:, 1]
+        boxes[:, 2] = corners[:, 2] - corners[:, 0]
+        boxes[:, 3] = corners[:, 3] - corners[:, 1]
+        boxes[:, 4] = frame_rows[:, 2]
+        boxes = boxes[(boxes[:, 2] > 0) & (boxes[:, 3] > 0)]
+        results.append(boxes[np.argsort(-boxes[:, 4])])
+    return results
+
+
+class FaceDetector:
+    """
+    Common interface for all face detection backends.
+
+    Every backend returns, per frame, a float32 array of shape (K, 5) with
+    columns [x, y, w, h, score] in source pixel coordinates, sorted by score.
+    """
+
+    name = "base"
+
+    def detect(self, frame):
+        """Detect faces in a single BGR frame."""
+        return self.detect_batch([frame])[0]
+
+    def detect_batch(self, frames):
+        """Detect faces in a list of BGR frames, returning one box array per frame."""
+        raise NotImplementedError
+
+
+class HaarFaceDetector(FaceDetector):
+    """OpenCV Haar cascade (fast on CPU, no model download required)."""
+
+    name = "haar"
+
+    def __init__(
+        self, scale_factor=1.1, min_neighbors=8, min_size=(30, 30), cascade_path=None
+    ):
+        if cascade_path is None:
+            cascade_path = cv2.data.haarcascades + "haarcascade_frontalface_default.xml"
+        self.cascade = _cached(
+            ("haar", cascade_path), lambda: cv2.CascadeClassifier(cascade_path)
+        )
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.min_size = tuple(min_size)
+
+    def detect_batch(self, frames):
+        # Cascades have no batch mode; frames are scanned one after another
+        results = []
+        for frame in frames:
+            gray = frame if frame.ndim == 2 else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            faces = self.cascade.detectMultiScale(
+                gray,
+                scaleFactor=self.scale_factor,
+                minNeighbors=self.min_neighbors,
+                minSize=self.min_size,
+            )
+            if len(faces) == 0:
+                results.append(_empty_boxes())
+                continue
+            boxes = np.ones((len(faces), 5), dtype=np.float32)
+            boxes[:, :4] = faces
+            # Cascades have no score, rank by area so the largest face comes first
+            order = np.argsort(-(boxes[:, 2] * boxes[:, 3]))
+            results.append(boxes[order])
+        return results
+
+
+class DnnFaceDetector(FaceDetector):
+    """ResNet-10 SSD Caffe model run through OpenCV's DNN module."""
+
+    name = "dnn"
+
+    def __init__(
+        self,
+        confidence=0.5,
+        prototxt_path=DNN_PROTOTXT_PATH,
+        model_path=DNN_MODEL_PATH,
+        input_size=SSD_INPUT_SIZE,
+    ):
+        for path in (prototxt_path, model_path):
+            _require_model(
+                path,
+                "dnn",
+                "download the OpenCV ResNet-10 SSD face model into models/",
+            )
+        self.net = _cached(
+            ("dnn", prototxt_path, model_path),
+            lambda: cv2.dnn.readNetFromCaffe(prototxt_path, model_path),
+        )
+        self.confidence = confidence
+        self.input_size = tuple(input_size)
+        # cv2.dnn.Net keeps its input as state, so shared nets need a lock
+        self._lock = _cached(("dnn-lock", prototxt_path, model_path), threading.Lock)
+
+    def detect_batch(self, frames):
+        if not frames:
+            return []
+        sizes = [(f.shape[1], f.shape[0]) for f in frames]
+        blob = cv2.dnn.blobFromImages(frames, 1.0, self.input_size, SSD_MEAN)
+        with self._lock:
+            self.net.setInput(blob)
+            detections = self.net.forward()
+        return _ssd_to_boxes(detections, sizes, self.confidence)
+
+
+def _quantized_model_path(model_path):
+    """Create (once) and return an int8 dynamically-quantized copy of an ONNX model."""
+    root, ext = os.path.splitext(model_path)
+    quantized_path = f"{root}.int8{ext}"
+    if not os.path.exists(quantized_path):
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+
+        print(f"Quantizing {model_path} to int8 -> {quantized_path}")
+        quantize_dynamic(model_path, quantized_path, weight_type=QuantType.QInt8)
+    return quantized_path
+
+
+def _load_onnx_session(model_path, threads=None):
+    import onnxruntime as ort
+
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    # Detection runs inside the render stage, alongside decode and encode
+    options.intra_op_num_threads = threads or stage_threads("render")
+    options.inter_op_num_threads = 1
+    return ort.InferenceSession(
+        model_path, sess_options=options, providers=["CPUExecutionProvider"]
+    )
+
+
+class OnnxFaceDetector(FaceDetector):
+    """
+    ResNet-10 SSD exported to ONNX and run with ONNX Runtime on the CPU.
+
+    The exported model is expected to keep the Caffe model's input (NCHW, BGR,
+    mean-subtracted) and DetectionOutput layout ([image_id, label, score, box]).
+    """
+
+    name = "onnx"
+
+    def __init__(
+        self,
+        confidence=0.5,
+        model_path=ONNX_MODEL_PATH,
+        quantize=False,
+        input_size=SSD_INPUT_SIZE,
+        threads=None,
+    ):
+        _require_model(
+            model_path,
+            "onnx",
+            "ONNX models are not shipped, export the ResNet-10 SSD to ONNX "
+            "(keeping its DetectionOutput layout) or use --detector=dnn",
+        )
+        if quantize:
+            model_path = _cached(
+                ("onnx-int8", model_path), lambda: _quantized_model_path(model_path)
+            )
+            self.name = "onnx-int8"
+        self.session = _cached(
+            ("onnx", model_path, threads), lambda: _load_onnx_session(model_path, threads)
+        )
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        # Models exported with a fixed batch of 1 are fed frame by frame
+        self.supports_batch = not isinstance(model_input.shape[0], int)
+        self.confidence = confidence
+        self.input_size = tuple(input_size)
+
+    def _run(self, frames):
+        blob = cv2.dnn.blobFromImages(frames, 1.0, self.input_size, SSD_MEAN)
+        return self.session.run(None, {self.input_name: blob})[0]
+
+    def detect_batch(self, frames):
+        if not frames:
+            return []
+        sizes = [(f.shape[1], f.shape[0]) for f in frames]
+        if self.supports_batch:
+            return _ssd_to_boxes(self._run(frames), sizes, self.confidence)
+        results = []
+        for frame, size in zip(frames, sizes):
+            results.extend(_ssd_to_boxes(self._run([frame]), [size], self.confidence))
+        return results
+
+
+BACKENDS = {
+    "haar": HaarFaceDetector,
+    "dnn": DnnFaceDetector,
+    "onnx": OnnxFaceDetector,
+    "onnx-int8": lambda **kwargs: OnnxFaceDetector(quantize=True, **kwargs),
+}
+
+
+def get_face_detector(backend="haar", **kwargs):
+    """
+    Return a shared detector for the given backend.
+
+    Args:
+        backend: "haar", "dnn", "onnx" or "onnx-int8"
+        **kwargs: Backend options (thresholds, model paths, input size)
+
+    Returns:
+        FaceDetector instance, created once per (backend, options) in this process
+    """
+    if backend not in BACKENDS:
+        raise ValueError(
+            f"Unknown face detector backend '{backend}'. Choose from: {', '.join(BACKENDS)}"
+        )
+    key = (backend, tuple(sorted(kwargs.items())))
+    with _cache_lock:
+        detector = _detector_cache.get(key)
+    if detector is None:
+        detector = BACKENDS[backend](**kwargs)
+        with _cache_lock:
+            detector = _detector_cache.setdefault(key, detector)
+    return detector
+
+
+def get_analysis_detector(backend="haar", scale=1.0):
+    """
+    Detector for frames downscaled by `scale` (source width / analysis width).
+
+    Faces shrink with the analysis frames, so the Haar minimum face size is
+    reduced to match the 30px it uses at source resolution.
+    """
+    if backend == "haar":
+        min_face = max(12, int(30 / scale))
+        return get_face_detector("haar", min_neighbors=8, min_size=(min_face, min_face))
+    return get_face_detector(backend)
+
+
+def box_iou(a, b):
+    """Pairwise IoU between two (K, >=4) [x, y, w, h] arrays."""
+    if len(a) == 0 or len(b) == 0:
+        return np.zeros((len(a), len(b)), dtype=np.float32)
+    ax1, ay1 = a[:, 0:1], a[:, 1:2]
+    ax2, ay2 = ax1 + a[:, 2:3], ay1 + a[:, 3:4]
+    bx1, by1 = b[:, 0], b[:, 1]
+    bx2, by2 = bx1 + b[:, 2], by1 + b[:, 3]
+    inter_w = np.clip(np.minimum(ax2, bx2) - np.maximum(ax1, bx1), 0, None)
+    inter_h = np.clip(np.minimum(ay2, by2) - np.maximum(ay1, by1), 0, None)
+    inter = inter_w * inter_h
+    union = a[:, 2:3] * a[:, 3:4] + b[:, 2] * b[:, 3] - inter
+    return inter / np.maximum(union, 1e-6)
@@ -0,0 +1,152 @@
+import subprocess
+import numpy as np
+from Components.Resources import stage_threads
+
+# Encoder settings for intermediate files that get processed again later:
+# fast to write and visually lossless, so the next step starts from clean frames
+INTERMEDIATE_ENCODER = {"preset": "veryfast", "crf": 18}
+
+# Encoder settings for review drafts: as fast as possible, quality only has
+# to be good enough to judge the cut
+DRAFT_ENCODER = {"preset": "ultrafast", "crf": 30}
+
+# Encoder settings for the finished short (the final mux)
+FINAL_ENCODER = {"preset": "medium", "bitrate": "3000k"}
+
+
+def get_ffmpeg_binary():
+    """Path to the ffmpeg executable (the one bundled with imageio-ffmpeg if available)."""
+    try:
+        import imageio_ffmpeg
+
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except Exception:
+        return "ffmpeg"
+
+
+class FfmpegWriter:
+    """
+    Frame sink that streams raw BGR frames into an ffmpeg libx264 encoder.
+
+    Drop-in replacement for cv2.VideoWriter in the frame loops: call write()
+    for every frame and release() at the end. Odd frame sizes are trimmed to
+    even dimensions, which yuv420p requires.
+    """
+
+    def __init__(
+        self,
+        output_path,
+        fps,
+        frame_size,
+        preset="medium",
+        crf=20,
+        threads=None,
+        audio_path=None,
+        audio_start=0,
+        audio_codec="aac",
+        audio_bitrate="192k",
+    ):
+        """
+        Args:
+            output_path: Path of the encoded video
+            fps: Frame rate of the incoming frames
+            frame_size: (width, height) of the incoming frames
+            preset: libx264 preset ("ultrafast" ... "veryslow")
+            crf: libx264 constant rate factor (lower = better quality)
+            threads: Encoder threads (default: the render stage's thread budget)
+            audio_path: Optional file whose audio track is muxed into the output
+            audio_start: Offset in seconds into audio_path where the audio starts
+            audio_codec: Codec for the muxed audio
+            audio_bitrate: Bitrate for the muxed audio
+        """
+        self.output_path = output_path
+        self.frame_size = (int(frame_size[0]), int(frame_size[1]))
+        width, height = self.frame_size
+
+        cmd = [
+            get_ffmpeg_binary(),
+            "-y",
+            "-loglevel",
+            "error",
+            "-f",
+            "rawvideo",
+            "-pix_fmt",
+            "bgr24",
+            "-s",
+            f"{width}x{height}",
+            "-r",
+            f"{fps}",
+            "-i",
+            "-",
+        ]
+        if audio_path:
+            if audio_start:
+                cmd += ["-ss", f"{audio_start}"]
+            cmd += ["-i", audio_path]
+        cmd += ["-map", "0:v:0"]
+        if audio_path:
+            cmd += ["-map", "1:a:0?"]
+        cmd += [
+            "-vf",
+            "crop=trunc(iw/2)*2:trunc(ih/2)*2",
+            "-c:v",
+            "libx264",
+            "-preset",
+            preset,
+            "-crf",
+            str(crf),
+            "-pix_fmt",
+            "yuv420p",
+            "-threads",
+            str(threads or stage_threads("render")),
+        ]
+        if audio_path:
+            cmd += ["-c:a", audio_codec, "-b:a", audio_bitrate, "-shortest"]
+        cmd += ["-movflags", "+faststart", output_path]
+
+        self.process = subprocess.Popen(cmd, stdin=subprocess.PIPE)
+
+    def isOpened(self):
+        return self.process.poll() is None
+
+    def write(self, frame):
+        if frame.shape[1] != self.frame_size[0] or frame.shape[0] != self.frame_size[1]:
+            raise ValueError(
+                f"Frame size {frame.shape[1]}x{frame.shape[0]} does not match "
+                f"writer size {self.frame_size[0]}x{self.frame_size[1]}"
+            )
+        try:
+            self.process.stdin.write(np.ascontiguousarray(frame).data)
+        except BrokenPipeError:
+            raise IOError(
+                f"ffmpeg encoder for {self.output_path} exited early "
+                f"(exit code {self.process.poll()})"
+            )
+
+    def release(self):
+        if self.process.stdin and not self.process.stdin.closed:
+            try:
+                self.process.stdin.close()
+            except BrokenPipeError:
+                pass
+        returncode = self.process.wait()
+        if returncode != 0:
+            raise RuntimeError(
+                f"ffmpeg failed to encode {self.output_path} (exit code {returncode})"
+            )
+
+    def abort(self):
+        """
+        Stop the encoder without raising, for error paths.
+
+        Unlike release(), this doesn't wait for ffmpeg to finish the file or
+        check its exit code, so it can't mask the exception being handled.
+        """
+        try:
+            if self.process.stdin and not self.process.stdin.closed:
+                self.process.stdin.close()
+        except OSError:
+            pass
+        if self.process.poll() is None:
+            self.process.kill()
+        self.process.wait()
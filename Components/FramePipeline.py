@@ -0,0 +1,216 @@
+import queue
+import threading
+import numpy as np
+
+# Marks the end of the frame stream in the stage queues
+_END = object()
+
+
+class BufferPool:
+    """
+    Fixed set of preallocated frame buffers shared between pipeline stages.
+
+    A stage acquires a buffer, fills it in place and hands it downstream; the
+    last stage to use it releases it back. Acquiring blocks while every
+    buffer is in flight, so the pool size also bounds memory use.
+    """
+
+    def __init__(self, shape, count, dtype=np.uint8):
+        self.shape = tuple(shape)
+        self._free = queue.Queue()
+        for _ in range(count):
+            self._free.put(np.zeros(self.shape, dtype=dtype))
+
+    def acquire(self, cancel=None):
+        """Take a free buffer, or return None if `cancel` is set while waiting."""
+        while not (cancel and cancel.is_set()):
+            try:
+                return self._free.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return None
+
+    def release(self, buffer):
+        self._free.put(buffer)
+
+
+def run_frame_pipeline(
+    cap,
+    transform,
+    writer,
+    queue_size=8,
+    total_frames=None,
+    progress_every=100,
+    frame_shape=None,
+    output_shape=None,
+    frame_step=1,
+):
+    """
+    Run a decode -> transform -> encode frame loop on overlapping threads.
+
+    A reader thread decodes frames from `cap`, the calling thread applies
+    `transform`, and a writer thread encodes the results. The stages are
+    connected by bounded queues, so a slow stage applies backpressure instead
+    of buffering the whole video. Frame order is preserved, so the output is
+    identical to a single-threaded read/transform/write loop.
+
+    With `output_shape` set, the loop is allocation-free: frames are decoded
+    into a pool of preallocated input buffers (`cap.read(buffer)`), and the
+    transform is called as transform(frame, frame_index, dst) with a pooled
+    output buffer it must fill and return. Buffers go back to their pool as
+    soon as the next stage is done with them.
+
+    With `frame_step` > 1 only every Nth frame is decoded and transformed
+    (the others are skipped with cap.grab()), which lowers the frame rate;
+    frame indices passed to the transform stay those of the source.
+
+    Args:
+        cap: Opened cv2.VideoCapture (anything with read())
+        transform: Callable (frame, frame_index[, dst]) -> output frame, or None to stop early
+        writer: Frame sink with write(frame), e.g. cv2.VideoWriter
+        queue_size: Maximum number of frames buffered between two stages
+        total_frames: Total frame count, only used for progress messages
+        progress_every: Print progress every N written frames (0 disables)
+        frame_shape: Shape of decoded frames (enables the input buffer pool)
+        output_shape: Shape of transformed frames (enables the output buffer pool)
+        frame_step: Keep one frame out of every `frame_step`
+
+    Returns:
+        Number of frames written
+
+    Raises:
+        The first exception raised by any stage, after all threads have stopped
+    """
+    decoded = queue.Queue(maxsize=queue_size)
+    processed = queue.Queue(maxsize=queue_size)
+    abort = threading.Event()  # Set when any stage fails
+    stop_reading = threading.Event()  # Set when the transform stage ends early
+    errors = []
+    written = [0]
+
+    # Each pool covers a full queue plus the frames held by the two adjacent stages
+    output_pool = None
+    input_pool = None
+    if output_shape is not None:
+        output_pool = BufferPool(output_shape, queue_size + 2)
+        if frame_shape is not None:
+            input_pool = BufferPool(frame_shape, queue_size + 2)
+
+    def put(q, item, cancel=None):
+        # Blocking put that gives up once the pipeline is being torn down
+        while not abort.is_set() and not (cancel and cancel.is_set()):
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def get(q):
+        while not abort.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _END
+
+    def fail(error):
+        errors.append(error)
+        abort.set()
+
+    def read_frames():
+        try:
+            frame_index = 0
+            while not abort.is_set() and not stop_reading.is_set():
+                if frame_step > 1 and frame_index % frame_step:
+                    # Dropped frame: advance the decoder without converting it
+                    if not cap.grab():
+                        break
+                    frame_index += 1
+                    continue
+                buffer = None
+                if input_pool is not None:
+                    buffer = input_pool.acquire(abort)
+                    if buffer is None:
+                        return
+                    ret, frame = cap.read(buffer)
+                    if frame is not buffer:
+                        # Decoder produced a different size; fall back to its array
+                        input_pool.release(buffer)
+                        buffer = None
+                else:
+                    ret, frame = cap.read()
+                if not ret:
+                    break
+                if not put(decoded, (frame_index, frame, buffer), stop_reading):
+                    return
+                frame_index += 1
+            put(decoded, _END, stop_reading)
+        except BaseException as e:
+            fail(e)
+
+    def write_frames():
+        try:
+            while True:
+                item = get(processed)
+                if item is _END:
+                    break
+                frame, buffer = item
+                writer.write(frame)
+                if buffer is not None:
+                    output_pool.release(buffer)
+                written[0] += 1
+                if progress_every and written[0] % progress_every == 0:
+                    if total_frames:
+                        print(f"Processed {written[0]}/{total_frames} frames")
+                    else:
+                        print(f"Processed {written[0]} frames")
+        except BaseException as e:
+            fail(e)
+
+    reader = threading.Thread(target=read_frames, name="frame-reader", daemon=True)
+    writer_thread = threading.Thread(
+        target=write_frames, name="frame-writer", daemon=True
+    )
+    reader.start()
+    writer_thread.start()
+
+    try:
+        while True:
+            item = get(decoded)
+            if item is _END:
+                break
+            frame_index, frame, in_buffer = item
+            if output_pool is not None:
+                out_buffer = output_pool.acquire(abort)
+                if out_buffer is None:
+                    break
+                result = transform(frame, frame_index, out_buffer)
+                if result is not out_buffer:
+                    output_pool.release(out_buffer)
+                    out_buffer = None
+                    if in_buffer is not None and result is not None:
+                        if np.shares_memory(result, in_buffer):
+                            # The input buffer is about to be reused
+                            result = result.copy()
+            else:
+                out_buffer = None
+                result = transform(frame, frame_index)
+            if in_buffer is not None:
+                input_pool.release(in_buffer)
+            if result is None:
+                stop_reading.set()
+                break
+            if not put(processed, (result, out_buffer)):
+                break
+        put(processed, _END)
+    except BaseException as e:
+        fail(e)
+    finally:
+        stop_reading.set()
+        reader.join()
+        writer_thread.join()
+
+    if errors:
+        raise errors[0]
+    return written[0]
@@ -0,0 +1,62 @@
+import cv2
+import numpy as np
+
+# Width of the grayscale thumbnails used for motion estimation
+MOTION_GRID_WIDTH = 160
+
+
+def thumbnail_shape(frame_shape, width=MOTION_GRID_WIDTH):
+    """(height, width) of the motion thumbnail for frames of `frame_shape`."""
+    h, w = frame_shape[:2]
+    return max(1, int(round(h * width / w))), width
+
+
+def motion_thumbnail(frame, width=MOTION_GRID_WIDTH, dst=None, scratch=None):
+    """
+    Downsample a BGR frame into a small grayscale thumbnail for motion analysis.
+
+    Args:
+        frame: BGR frame at any resolution
+        width: Thumbnail width in pixels (height keeps the aspect ratio)
+        dst: Optional preallocated uint8 (height, width) array to fill
+        scratch: Optional preallocated uint8 (height, width, 3) array for the colour thumbnail
+
+    Returns:
+        uint8 grayscale thumbnail
+    """
+    height, width = thumbnail_shape(frame.shape, width)
+    small = cv2.resize(
+        frame, (width, height), dst=scratch, interpolation=cv2.INTER_AREA
+    )
+    return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY, dst=dst)
+
+
+def column_motion(prev_thumb, curr_thumb, threshold=15, scratch=None):
+    """
+    Per-column motion energy from the difference of two thumbnails.
+
+    Pixels that changed by less than `threshold` grey levels are treated as
+    noise (compression artefacts, cursor blink) and ignored. `scratch` is an
+    optional preallocated array of the thumbnail shape for the difference.
+
+    Returns:
+        float32 array with one motion weight per thumbnail column
+    """
+    diff = cv2.absdiff(prev_thumb, curr_thumb, dst=scratch)
+    _, diff = cv2.threshold(diff, threshold - 1, 0, cv2.THRESH_TOZERO, dst=diff)
+    return diff.sum(axis=0, dtype=np.float32)
+
+
+def motion_center(prev_thumb, curr_thumb, threshold=15, scratch=None):
+    """
+    Horizontal center of motion between two thumbnails.
+
+    Returns:
+        Motion center as a fraction of the frame width (0.0-1.0), or None if nothing moved
+    """
+    weights = column_motion(prev_thumb, curr_thumb, threshold, scratch)
+    total = weights.sum()
+    if total <= 0:
+        return None
+    centers = (np.arange(len(weights), dtype=np.float32) + 0.5) / len(weights)
+    return float(np.dot(weights, centers) / total)
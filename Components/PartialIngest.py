@@ -0,0 +1,333 @@
+import os
+import shutil
+import struct
+import subprocess
+from pytubefix import YouTube
+from Components.FfmpegWriter import get_ffmpeg_binary
+from Components.Resources import stage_threads
+from Components.YoutubeDownloader import select_video_stream, DEFAULT_TARGET_HEIGHT
+from Components.RangedDownload import (
+    RangedDownload,
+    BandwidthLimiter,
+    create_session,
+    DEFAULT_CONNECTIONS,
+)
+
+# Extra source time fetched around each highlight; the cut needs the keyframe
+# before the start, which is at most one fragment earlier
+DEFAULT_PADDING = 2.0
+
+
+def parse_sidx(data, box_offset):
+    """
+    Parse an ISO BMFF segment index (sidx) box.
+
+    Args:
+        data: Bytes of the box, starting at its size field
+        box_offset: Byte offset of the box in the file
+
+    Returns:
+        List of (offset, size, start, duration) per fragment - byte offset and
+        size in the file, start and duration in seconds
+    """
+    size, box_type = struct.unpack(">I4s", data[:8])
+    if box_type != b"sidx":
+        raise ValueError(f"expected a sidx box, found {box_type!r}")
+    version = data[8]
+    timescale = struct.unpack(">I", data[16:20])[0]
+    if version == 0:
+        earliest, first_offset = struct.unpack(">II", data[20:28])
+        pos = 28
+    else:
+        earliest, first_offset = struct.unpack(">QQ", data[20:36])
+        pos = 36
+    reference_count = struct.unpack(">H", data[pos + 2 : pos + 4])[0]
+    pos += 4
+
+    fragments = []
+    offset = box_offset + size + first_offset
+    time = earliest
+    for _ in range(reference_count):
+        reference, duration, _ = struct.unpack(">III", data[pos : pos + 12])
+        pos += 12
+        if reference >> 31:
+            raise ValueError("hierarchical sidx indexes are not supported")
+        fragment_size = reference & 0x7FFFFFFF
+        fragments.append((offset, fragment_size, time / timescale, duration / timescale))
+        offset += fragment_size
+        time += duration
+    return fragments
+
+
+def fragments_between(fragments, start, end):
+    """Index range [first, last] of the fragments overlapping [start, end) seconds."""
+    first = 0
+    for i, (_, _, fragment_start, _) in enumerate(fragments):
+        if fragment_start <= start:
+            first = i
+    last = first
+    while last + 1 < len(fragments) and fragments[last + 1][2] < end:
+        last += 1
+    return first, last
+
+
+def fetch_bytes(session, url, start, end):
+    """Bytes [start, end] of `url` in one range request."""
+    response = session.get(url, headers={"Range": f"bytes={start}-{end}"}, timeout=30)
+    response.raise_for_status()
+    if response.status_code != 206:
+        raise IOError(f"expected 206 Partial Content, got {response.status_code}")
+    return response.content
+
+
+def _format_range(fmt, key):
+    byte_range = fmt.get(key)
+    if not byte_range:
+        return None
+    return int(byte_range["start"]), int(byte_range["end"])
+
+
+class PartialSource:
+    """
+    A YouTube source ingested transcript-first.
+
+    Only the audio stream is downloaded up front, for transcription and
+    highlight selection. Video is fetched later, per highlight: the video
+    stream's segment index (sidx, found through the format's indexRange)
+    maps time to byte ranges, so only the fragments covering a highlight
+    plus padding are downloaded and prefixed with the stream's init segment
+    (initRange) to form a small playable MP4. For a few two-minute shorts
+    from a long source this is a small fraction of the full download.
+    """
+
+    def __init__(
+        self,
+        url,
+        output_dir="videos",
+        connections=DEFAULT_CONNECTIONS,
+        max_bandwidth=None,
+        padding=DEFAULT_PADDING,
+        target_height=DEFAULT_TARGET_HEIGHT,
+    ):
+        """
+        Args:
+            url: YouTube video URL
+            output_dir: Folder for the audio and the partial video files
+            connections: Parallel range requests per download
+            max_bandwidth: Optional download cap in bytes per second
+            padding: Seconds fetched before and after each highlight
+            target_height: Output height for the video resolution policy
+                (see YoutubeDownloader.select_video_stream)
+        """
+        self.url = url
+        self.output_dir = output_dir
+        self.connections = connections
+        self.padding = padding
+        self.target_height = target_height
+        self.session = create_session(connections * 2)
+        self.limiter = BandwidthLimiter(max_bandwidth) if max_bandwidth else None
+        self.fetched_bytes = 0
+        self.files = []
+
+        self.yt = YouTube(url)
+        self.title = self.yt.title
+        self.video_stream, self.audio_stream = self._select_streams()
+        self.fmt = self._adaptive_format(self.video_stream.itag)
+        self.init_range = _format_range(self.fmt, "initRange")
+        self.index_range = _format_range(self.fmt, "indexRange")
+        if self.init_range is None or self.index_range is None:
+            raise ValueError(f"stream {self.video_stream.itag} has no segment index")
+        self.video_url = self.video_stream.url
+        self.video_size = self.video_stream.filesize
+        self.audio_path = None
+        self._init_segment = None
+        self._fragments = None
+
+    def _select_streams(self):
+        """MP4 video with a segment index picked for the target height, and the best MP4 audio."""
+        adaptive = {
+            fmt["itag"]: fmt
+            for fmt in self.yt.streaming_data.get("adaptiveFormats", [])
+            if "indexRange" in fmt and "initRange" in fmt
+        }
+        videos = [
+            stream
+            for stream in self.yt.streams.filter(adaptive=True, only_video=True, mime_type="video/mp4")
+            if stream.itag in adaptive
+        ]
+        video = select_video_stream(videos, self.target_height) if videos else None
+        audio = (
+            self.yt.streams.filter(only_audio=True, mime_type="audio/mp4")
+            .order_by("abr")
+            .desc()
+            .first()
+        )
+        if video is None or audio is None:
+            raise ValueError("no indexed MP4 video and audio streams available")
+        return video, audio
+
+    def _adaptive_format(self, itag):
+        for fmt in self.yt.streaming_data["adaptiveFormats"]:
+            if fmt["itag"] == itag:
+                return fmt
+        raise ValueError(f"format {itag} not found")
+
+    def _download(self, url, path, size, offset=0):
+        RangedDownload(
+            url,
+            path,
+            size,
+            self.connections,
+            session=self.session,
+            limiter=self.limiter,
+            offset=offset,
+        ).run()
+        self.fetched_bytes += size
+
+    def fetch_audio(self):
+        """
+        Download the audio-only stream.
+
+        Returns:
+            Path of the audio file
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        self.audio_path = os.path.join(
+            self.output_dir, "audio_" + self.audio_stream.default_filename
+        )
+        if not os.path.exists(self.audio_path):
+            print(f"Downloading audio only ({self.audio_stream.filesize / (1024 * 1024):.1f} MB)...")
+            self._download(self.audio_stream.url, self.audio_path, self.audio_stream.filesize)
+        self.files.append(self.audio_path)
+        return self.audio_path
+
+    def extract_audio(self, audio_path):
+        """
+        Decode the downloaded audio stream to WAV for transcription.
+
+        Returns:
+            audio_path, or None on error
+        """
+        if self.audio_path is None:
+            self.fetch_audio()
+        result = subprocess.run(
+            [get_ffmpeg_binary(), "-y", "-loglevel", "error", "-i", self.audio_path, "-vn", audio_path],
+            stderr=subprocess.PIPE,
+            text=True,
+        )
+        if result.returncode != 0:
+            print(f"An error occurred while extracting audio: {result.stderr.strip()}")
+            return None
+        print(f"Extracted audio to: {audio_path}")
+        return audio_path
+
+    def _load_index(self):
+        """Fetch the init segment and the segment index of the video stream (once)."""
+        if self._fragments is not None:
+            return
+        init_start, init_end = self.init_range
+        index_start, index_end = self.index_range
+        self._init_segment = fetch_bytes(self.session, self.video_url, init_start, init_end)
+        index = fetch_bytes(self.session, self.video_url, index_start, index_end)
+        self.fetched_bytes += len(self._init_segment) + len(index)
+        self._fragments = parse_sidx(index, index_start)
+        print(
+            f"Video index: {len(self._fragments)} fragments, "
+            f"{self.video_size / (1024 * 1024):.1f} MB at {self.video_stream.resolution}"
+        )
+
+    def fetch_video(self, start, end, path):
+        """
+        Download just the video fragments covering [start, end] seconds.
+
+        Args:
+            start: Start time in the source (seconds)
+            end: End time in the source (seconds)
+            path: Where to write the partial MP4 (init segment + fragments)
+
+        Returns:
+            Source time (seconds) at which the partial video starts
+        """
+        self._load_index()
+        first, last = fragments_between(
+            self._fragments, max(0.0, start - self.padding), end + self.padding
+        )
+        offset = self._fragments[first][0]
+        size = self._fragments[last][0] + self._fragments[last][1] - offset
+        fragments_path = path + ".fragments"
+        self._download(self.video_url, fragments_path, size, offset=offset)
+
+        with open(path, "wb") as out:
+            out.write(self._init_segment)
+            with open(fragments_path, "rb") as fragments:
+                shutil.copyfileobj(fragments, out)
+        os.remove(fragments_path)
+        self.files.append(path)
+        return self._fragments[first][2]
+
+    def cut(self, output_file, start, end, preset="medium"):
+        """
+        Write the clip [start, end] (source seconds) with audio, like Edit.crop_video.
+
+        Only the video fragments the clip needs are downloaded; the audio
+        comes from the already downloaded audio stream.
+
+        Args:
+            output_file: Path of the clip
+            start: Clip start in source seconds
+            end: Clip end in source seconds
+            preset: libx264 preset for the clip encode
+        """
+        partial_path = os.path.splitext(output_file)[0] + "_source.mp4"
+        partial_start = self.fetch_video(start, end, partial_path)
+        cmd = [
+            get_ffmpeg_binary(),
+            "-y",
+            "-loglevel",
+            "error",
+            "-ss",
+            f"{start - partial_start:.3f}",
+            "-i",
+            partial_path,
+            "-ss",
+            f"{start:.3f}",
+            "-i",
+            self.audio_path,
+            "-t",
+            f"{end - start:.3f}",
+            "-map",
+            "0:v:0",
+            "-map",
+            "1:a:0",
+            "-c:v",
+            "libx264",
+            "-preset",
+            preset,
+            "-threads",
+            str(stage_threads("render")),
+            "-c:a",
+            "aac",
+            output_file,
+        ]
+        try:
+            result = subprocess.run(cmd, stderr=subprocess.PIPE, text=True)
+        finally:
+            os.remove(partial_path)
+            self.files.remove(partial_path)
+        if result.returncode != 0:
+            raise RuntimeError(f"ffmpeg failed to cut {output_file}: {result.stderr.strip()}")
+
+    def report(self):
+        """Print how much was downloaded compared to the full video + audio."""
+        full = self.video_size + self.audio_stream.filesize
+        print(
+            f"Partial ingest fetched {self.fetched_bytes / (1024 * 1024):.1f} MB "
+            f"of {full / (1024 * 1024):.1f} MB ({100 * self.fetched_bytes / full:.1f}%)"
+        )
+
+    def cleanup(self):
+        """Remove the downloaded audio and any partial video files."""
+        for path in self.files:
+            if os.path.exists(path):
+                os.remove(path)
+        self.files = []
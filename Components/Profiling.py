@@ -0,0 +1,218 @@
+import atexit
+import contextlib
+import cProfile
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+import numpy as np
+
+PROFILES_FOLDER = "profiles"
+
+# Sampling rate of the stack sampler; every sample costs one pass over the
+# thread stacks, so 100 Hz keeps the overhead around a percent
+DEFAULT_SAMPLE_INTERVAL = 0.01
+
+# Upper bucket edges (milliseconds) of the per-frame timing histograms
+HISTOGRAM_EDGES_MS = [0.5, 1, 2, 4, 8, 16, 33, 66, 133, 266, 533]
+
+
+def _frame_label(code):
+    name = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+    # ';' separates frames in the collapsed-stack format
+    return name.replace(";", ":")
+
+
+class FrameTimer:
+    """
+    Per-frame durations of one hot loop, summarized as a histogram.
+
+    Loops call add() with each frame's duration, or wrap their per-frame
+    function with wrap().
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.durations = []
+
+    def add(self, seconds):
+        self.durations.append(seconds)
+
+    def wrap(self, function):
+        """`function` with every call timed."""
+
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.durations.append(time.perf_counter() - started)
+
+        return timed
+
+    def summary(self):
+        """Count, mean, percentiles and histogram of the frame times (milliseconds)."""
+        if not self.durations:
+            return {"frames": 0}
+        ms = np.asarray(self.durations) * 1000
+        counts = np.histogram(ms, bins=[0] + HISTOGRAM_EDGES_MS + [np.inf])[0]
+        labels = [f"<{edge}ms" for edge in HISTOGRAM_EDGES_MS] + [f">={HISTOGRAM_EDGES_MS[-1]}ms"]
+        p50, p90, p99 = np.percentile(ms, [50, 90, 99])
+        return {
+            "frames": len(ms),
+            "total_s": round(float(ms.sum()) / 1000, 3),
+            "mean_ms": round(float(ms.mean()), 3),
+            "p50_ms": round(float(p50), 3),
+            "p90_ms": round(float(p90), 3),
+            "p99_ms": round(float(p99), 3),
+            "max_ms": round(float(ms.max()), 3),
+            "histogram": dict(zip(labels, counts.tolist())),
+        }
+
+
+class PipelineProfiler:
+    """
+    Profiles a pipeline run stage by stage.
+
+    Each stage runs under its own cProfile profiler (deterministic, calling
+    thread only; repeated stages such as per-short crops accumulate into one
+    profile). A background thread samples the stacks of every thread, so
+    work in the frame pipeline's reader and writer threads and in native
+    calls is visible too. The samples are written in the collapsed-stack
+    format (`stage;thread;frame;... count`) read by flamegraph.pl and
+    speedscope.
+
+    Written to `run_dir` by save():
+        <stage>.prof     cProfile stats (python -m pstats, snakeviz)
+        <stage>.txt      Top functions by cumulative time
+        stacks.folded    Collapsed stacks of all threads, rooted at the stage
+        summary.json     Wall time per stage and per-frame timing histograms
+    """
+
+    def __init__(self, run_dir, sample_interval=DEFAULT_SAMPLE_INTERVAL):
+        self.run_dir = run_dir
+        self.sample_interval = sample_interval
+        self.profiles = {}
+        self.wall_times = {}
+        self.timers = {}
+        self.samples = Counter()
+        self.current_stage = None
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._sample, name="profiler", daemon=True)
+
+    def start(self):
+        os.makedirs(self.run_dir, exist_ok=True)
+        self._sampler.start()
+        print(f"Profiling enabled, results in {self.run_dir}")
+
+    def _sample(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.sample_interval):
+            stage = self.current_stage or "other"
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                stack.append(stage)
+                self.samples[";".join(reversed(stack))] += 1
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        profile = self.profiles.setdefault(name, cProfile.Profile())
+        self.current_stage = name
+        started = time.perf_counter()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            self.wall_times[name] = self.wall_times.get(name, 0.0) + time.perf_counter() - started
+            self.current_stage = None
+
+    def frame_timer(self, name):
+        return self.timers.setdefault(name, FrameTimer(name))
+
+    def save(self):
+        """Stop sampling and write the profiles (see the class docstring)."""
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        self._sampler.join()
+
+        for name, profile in self.profiles.items():
+            profile.dump_stats(os.path.join(self.run_dir, f"{name}.prof"))
+            text = io.StringIO()
+            stats = pstats.Stats(profile, stream=text)
+            stats.sort_stats("cumulative").print_stats(30)
+            with open(os.path.join(self.run_dir, f"{name}.txt"), "w", encoding="utf-8") as f:
+                f.write(text.getvalue())
+
+        with open(os.path.join(self.run_dir, "stacks.folded"), "w", encoding="utf-8") as f:
+            for stack, count in sorted(self.samples.items()):
+                f.write(f"{stack} {count}\n")
+
+        frame_times = {name: timer.summary() for name, timer in self.timers.items()}
+        summary = {
+            "stages": {name: round(seconds, 3) for name, seconds in self.wall_times.items()},
+            "samples": sum(self.samples.values()),
+            "sample_interval": self.sample_interval,
+            "frame_times": frame_times,
+        }
+        with open(os.path.join(self.run_dir, "summary.json"), "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+
+        print(f"\n{'='*60}")
+        print("PROFILE")
+        print(f"{'='*60}")
+        for name, seconds in self.wall_times.items():
+            print(f"  {name:<12} {seconds:8.2f}s")
+        for name, times in frame_times.items():
+            if times["frames"]:
+                print(
+                    f"  {name} per frame: p50 {times['p50_ms']:.1f}ms, "
+                    f"p90 {times['p90_ms']:.1f}ms, p99 {times['p99_ms']:.1f}ms "
+                    f"({times['frames']} frames)"
+                )
+        print(f"Profiles: {self.run_dir} (stacks.folded for flamegraphs)")
+        print(f"{'='*60}\n")
+
+
+_profiler = None
+
+
+def start_profiling(run_dir, sample_interval=DEFAULT_SAMPLE_INTERVAL):
+    """
+    Enable profiling for the rest of the process.
+
+    The results are written when the process exits, including early exits
+    through sys.exit().
+    """
+    global _profiler
+    if _profiler is None:
+        _profiler = PipelineProfiler(run_dir, sample_interval)
+        _profiler.start()
+        atexit.register(_profiler.save)
+    return _profiler
+
+
+def profile_stage(name):
+    """Context manager profiling one pipeline stage (a no-op unless profiling)."""
+    if _profiler is None:
+        return contextlib.nullcontext()
+    return _profiler.stage(name)
+
+
+def frame_timer(name):
+    """FrameTimer for a hot frame loop, or None unless profiling."""
+    if _profiler is None:
+        return None
+    return _profiler.frame_timer(name)
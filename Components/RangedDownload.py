@@ -0,0 +1,353 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+DEFAULT_CONNECTIONS = 4  # Parallel range requests per file
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024  # Bytes per range request
+READ_SIZE = 256 * 1024  # Bytes read from the socket at a time
+CHUNK_RETRIES = 3
+
+
+def create_session(pool_size=DEFAULT_CONNECTIONS * 2):
+    """
+    requests.Session with a connection pool big enough for parallel ranges.
+
+    Connections are kept alive and reused between range requests, and
+    transient connection errors and 5xx responses are retried.
+    """
+    session = requests.Session()
+    retry = Retry(
+        total=3,
+        backoff_factor=0.5,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=("HEAD", "GET"),
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class BandwidthLimiter:
+    """
+    Token bucket shared by every connection of one or more downloads.
+
+    consume(n) blocks until n more bytes fit in the configured rate, so the
+    combined throughput stays under `bytes_per_second`.
+    """
+
+    def __init__(self, bytes_per_second):
+        self.rate = float(bytes_per_second)
+        self.allowance = self.rate
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+
+    def consume(self, size):
+        with self.lock:
+            now = time.monotonic()
+            self.allowance = min(self.rate, self.allowance + (now - self.last) * self.rate)
+            self.last = now
+            self.allowance -= size
+            wait = -self.allowance / self.rate if self.allowance < 0 else 0
+        if wait > 0:
+            time.sleep(wait)
+
+
+def probe_size(session, url):
+    """
+    Size of the resource at `url` and whether the server honours Range requests.
+
+    Returns:
+        (size, ranges) - size in bytes (None if unknown) and True if byte
+        ranges are supported
+    """
+    response = session.get(url, headers={"Range": "bytes=0-0"}, stream=True, timeout=30)
+    try:
+        response.raise_for_status()
+        content_range = response.headers.get("Content-Range", "")
+        if response.status_code == 206 and "/" in content_range:
+            total = content_range.rsplit("/", 1)[1]
+            return (int(total) if total.isdigit() else None), True
+        length = response.headers.get("Content-Length")
+        return (int(length) if length and length.isdigit() else None), False
+    finally:
+        response.close()
+
+
+class RangedDownload:
+    """
+    Download one file over several parallel HTTP range requests.
+
+    The file is split into fixed-size chunks that a thread pool fetches on a
+    shared pooled session and writes at their offsets in `<path>.part`. Each
+    finished chunk is recorded in the `<path>.part.json` manifest, so an
+    interrupted download resumes with only the missing chunks. When every
+    chunk is in, the .part file is renamed to `path` and the manifest removed.
+
+    Servers without Range support get a single streamed request instead.
+    """
+
+    def __init__(
+        self,
+        url,
+        path,
+        size=None,
+        connections=DEFAULT_CONNECTIONS,
+        chunk_size=DEFAULT_CHUNK_SIZE,
+        session=None,
+        limiter=None,
+        label=None,
+        offset=0,
+    ):
+        """
+        Args:
+            url: URL to fetch
+            path: Destination file
+            size: Size in bytes if already known (skips the probe request);
+                with `offset`, the number of bytes to fetch from there
+            connections: Number of range requests in flight at once
+            chunk_size: Bytes per range request
+            session: requests.Session to reuse (one is created if None)
+            limiter: Optional BandwidthLimiter, may be shared between downloads
+            label: Name used in progress messages (defaults to the file name)
+            offset: First byte to fetch, to download only a window of the
+                resource (requires `size`)
+        """
+        self.url = url
+        self.path = path
+        self.size = size
+        self.connections = max(1, int(connections))
+        self.chunk_size = max(1, int(chunk_size))
+        self.session = session or create_session(self.connections)
+        self.limiter = limiter
+        self.label = label or os.path.basename(path)
+        self.offset = int(offset)
+        self.part_path = path + ".part"
+        self.manifest_path = path + ".part.json"
+        self._lock = threading.Lock()
+        self._done = set()
+        self._received = 0
+        self._reported = 0
+
+    def _load_manifest(self):
+        """Chunks finished by a previous attempt (empty if the manifest doesn't match)."""
+        if not (os.path.exists(self.manifest_path) and os.path.exists(self.part_path)):
+            return set()
+        try:
+            with open(self.manifest_path) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return set()
+        if (
+            manifest.get("size") != self.size
+            or manifest.get("chunk_size") != self.chunk_size
+            or manifest.get("offset", 0) != self.offset
+        ):
+            print(f"⚠ {self.label}: partial download doesn't match the source, restarting")
+            return set()
+        if os.path.getsize(self.part_path) != self.size:
+            return set()
+        return set(manifest.get("done", []))
+
+    def _save_manifest(self):
+        # Written to a temp file and renamed so a crash never leaves it half written
+        temp_path = self.manifest_path + ".tmp"
+        with open(temp_path, "w") as f:
+            json.dump(
+                {
+                    "size": self.size,
+                    "chunk_size": self.chunk_size,
+                    "offset": self.offset,
+                    "done": sorted(self._done),
+                },
+                f,
+            )
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.manifest_path)
+
+    def _progress(self, size):
+        with self._lock:
+            self._received += size
+            if not self.size:
+                return
+            percent = int(self._received * 100 / self.size)
+            if percent >= self._reported + 10:
+                self._reported = percent - percent % 10
+                print(f"  {self.label}: {self._reported}%")
+
+    def _read_into(self, response, f, offset, written):
+        """
+        Stream a response body into `f` at `offset`.
+
+        `written` is a one-element list counting the bytes written (and
+        reported as progress) so far, kept up to date block by block so a
+        caller can roll the progress back when the read fails partway.
+        """
+        for block in response.iter_content(READ_SIZE):
+            if self.limiter:
+                self.limiter.consume(len(block))
+            with self._lock:
+                f.seek(offset + written[0])
+                f.write(block)
+            written[0] += len(block)
+            self._progress(len(block))
+
+    def _fetch_chunk(self, f, index):
+        start = index * self.chunk_size
+        end = min(start + self.chunk_size, self.size) - 1
+        byte_range = f"bytes={self.offset + start}-{self.offset + end}"
+        for attempt in range(CHUNK_RETRIES):
+            written = [0]
+            try:
+                with self.session.get(
+                    self.url,
+                    headers={"Range": byte_range},
+                    stream=True,
+                    timeout=30,
+                ) as response:
+                    if response.status_code != 206:
+                        raise IOError(f"expected 206 Partial Content, got {response.status_code}")
+                    self._read_into(response, f, start, written)
+                if written[0] != end - start + 1:
+                    raise IOError(f"short read ({written[0]} of {end - start + 1} bytes)")
+                break
+            except (requests.RequestException, IOError) as e:
+                self._progress(-written[0])
+                if attempt == CHUNK_RETRIES - 1:
+                    raise
+                print(f"⚠ {self.label}: chunk {index} failed ({e}), retrying")
+                time.sleep(2**attempt)
+        with self._lock:
+            # The chunk's data must be on disk before the manifest says so,
+            # or a crash could resume over a hole
+            f.flush()
+            os.fsync(f.fileno())
+            self._done.add(index)
+            self._save_manifest()
+
+    def _download_single(self):
+        """Plain streamed download for servers that ignore Range."""
+        with self.session.get(self.url, stream=True, timeout=30) as response:
+            response.raise_for_status()
+            with open(self.part_path, "wb") as f:
+                self._read_into(response, f, 0, [0])
+        os.replace(self.part_path, self.path)
+
+    def run(self):
+        """
+        Download the file.
+
+        Returns:
+            Path of the downloaded file
+
+        Raises:
+            requests.RequestException or IOError: If a chunk keeps failing (the
+                .part file and manifest are kept for resuming)
+        """
+        ranges = True
+        if self.offset and self.size is None:
+            raise ValueError("A download starting at an offset needs its size")
+        if self.size is None:
+            self.size, ranges = probe_size(self.session, self.url)
+        if not ranges or not self.size:
+            print(f"{self.label}: server doesn't support ranges, downloading in one request")
+            self._download_single()
+            return self.path
+
+        chunk_count = (self.size + self.chunk_size - 1) // self.chunk_size
+        self._done = self._load_manifest()
+        if self._done:
+            print(f"Resuming {self.label}: {len(self._done)}/{chunk_count} chunks already downloaded")
+        else:
+            with open(self.part_path, "wb") as f:
+                f.truncate(self.size)
+            self._save_manifest()
+        self._received = sum(
+            min(self.chunk_size, self.size - index * self.chunk_size) for index in self._done
+        )
+
+        pending = [index for index in range(chunk_count) if index not in self._done]
+        with open(self.part_path, "r+b") as f:
+            with ThreadPoolExecutor(max_workers=self.connections) as pool:
+                futures = [pool.submit(self._fetch_chunk, f, index) for index in pending]
+                for future in futures:
+                    future.result()
+
+        os.replace(self.part_path, self.path)
+        os.remove(self.manifest_path)
+        return self.path
+
+
+def download_file(
+    url,
+    path,
+    size=None,
+    connections=DEFAULT_CONNECTIONS,
+    chunk_size=DEFAULT_CHUNK_SIZE,
+    max_bandwidth=None,
+    session=None,
+):
+    """
+    Download `url` to `path` with parallel range requests, resuming if possible.
+
+    Args:
+        url: URL to fetch
+        path: Destination file
+        size: Size in bytes if known
+        connections: Number of parallel range requests
+        chunk_size: Bytes per range request
+        max_bandwidth: Optional cap in bytes per second
+        session: requests.Session to reuse
+
+    Returns:
+        Path of the downloaded file
+    """
+    limiter = BandwidthLimiter(max_bandwidth) if max_bandwidth else None
+    return RangedDownload(
+        url, path, size, connections, chunk_size, session=session, limiter=limiter
+    ).run()
+
+
+def download_files(jobs, connections=DEFAULT_CONNECTIONS, max_bandwidth=None):
+    """
+    Download several files at the same time on one pooled session.
+
+    Each file gets `connections` range requests in flight, and `max_bandwidth`
+    (bytes per second) is shared by all of them.
+
+    Args:
+        jobs: List of (url, path, size) tuples; size may be None
+        connections: Parallel range requests per file
+        max_bandwidth: Optional combined cap in bytes per second
+
+    Returns:
+        List of downloaded paths, in the order of `jobs`
+    """
+    session = create_session(connections * max(1, len(jobs)))
+    limiter = BandwidthLimiter(max_bandwidth) if max_bandwidth else None
+    downloads = [
+        RangedDownload(url, path, size, connections, session=session, limiter=limiter)
+        for url, path, size in jobs
+    ]
+    with ThreadPoolExecutor(max_workers=max(1, len(downloads))) as pool:
+        futures = [pool.submit(download.run) for download in downloads]
+        return [future.result() for future in futures]
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) < 3:
+        print("Usage: python -m Components.RangedDownload <url> <output> [connections]")
+        sys.exit(1)
+    started = time.time()
+    output = download_file(
+        sys.argv[1], sys.argv[2], connections=int(sys.argv[3]) if len(sys.argv) > 3 else DEFAULT_CONNECTIONS
+    )
+    print(f"✓ Downloaded {output} in {time.time() - started:.1f}s")
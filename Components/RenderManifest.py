@@ -0,0 +1,97 @@
+import json
+import os
+import numpy as np
+
+# Drafts and their manifests live here, next to the final shorts
+DRAFTS_FOLDER = os.path.join("output_shorts", "drafts")
+
+
+def _plain(value):
+    """Convert NumPy scalars and arrays inside a plan to JSON types."""
+    if isinstance(value, dict):
+        return {key: _plain(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_plain(item) for item in value]
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def plan_to_json(plan):
+    """A crop plan from crop_to_vertical as JSON-serializable data."""
+    if plan is None:
+        return None
+    center_path = plan.get("center_path")
+    return {
+        "shot_plan": _plain(plan["shot_plan"]),
+        # One crop center per frame; a tenth of a pixel is plenty
+        "center_path": None
+        if center_path is None
+        else [round(float(x), 1) for x in center_path],
+    }
+
+
+def plan_from_json(data):
+    """Inverse of plan_to_json: a plan that can be passed back to crop_to_vertical."""
+    if data is None:
+        return None
+    center_path = data.get("center_path")
+    return {
+        "shot_plan": data["shot_plan"],
+        "center_path": None
+        if center_path is None
+        else np.asarray(center_path, dtype=np.float32),
+    }
+
+
+class RenderManifest:
+    """
+    Record of a draft render, enough to promote it to a final render.
+
+    Holds the source, the render settings and, per short, its time range,
+    draft file and crop plan. Promoting replays exactly these decisions, so
+    the approved draft and the final render match without running analysis
+    or highlight selection again.
+    """
+
+    def __init__(self, path, data=None):
+        self.path = path
+        self.data = data or {"shorts": []}
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(path, json.load(f))
+
+    @property
+    def shorts(self):
+        return self.data["shorts"]
+
+    def add_short(self, number, start, stop, draft_path, plan):
+        """Record one rendered draft (replacing an earlier one with the same number)."""
+        self.data["shorts"] = [short for short in self.shorts if short["number"] != number]
+        self.shorts.append(
+            {
+                "number": number,
+                "start": start,
+                "stop": stop,
+                "draft": draft_path,
+                "plan": plan_to_json(plan),
+            }
+        )
+        self.shorts.sort(key=lambda short: short["number"])
+
+    def select(self, numbers=None):
+        """Shorts to promote: the given short numbers, or all of them."""
+        if not numbers:
+            return list(self.shorts)
+        return [short for short in self.shorts if short["number"] in numbers]
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(self.data, f, indent=2)
+        os.replace(temp_path, self.path)
@@ -0,0 +1,186 @@
+import json
+import os
+import subprocess
+from Components.FfmpegWriter import get_ffmpeg_binary
+from Components.Resources import stage_threads
+
+# Rendition ladder: output size and encoder settings per platform target.
+# Every rendition is 9:16; the short is scaled to fit and padded if needed.
+RENDITIONS = {
+    "high": {
+        "width": 1080,
+        "height": 1920,
+        "video_bitrate": "6000k",
+        "audio_bitrate": "192k",
+        "preset": "medium",
+    },
+    "mid": {
+        "width": 720,
+        "height": 1280,
+        "video_bitrate": "3000k",
+        "audio_bitrate": "128k",
+        "preset": "medium",
+    },
+    "preview": {
+        "width": 360,
+        "height": 640,
+        "video_bitrate": "600k",
+        "audio_bitrate": "96k",
+        "preset": "veryfast",
+    },
+}
+
+
+def parse_renditions(value):
+    """
+    Rendition names from a comma-separated list ("all" for the whole ladder).
+
+    Unknown names are reported and skipped.
+    """
+    if value.strip() == "all":
+        return list(RENDITIONS)
+    names = []
+    for name in value.split(","):
+        name = name.strip()
+        if name in RENDITIONS:
+            names.append(name)
+        elif name:
+            print(f"⚠ Unknown rendition '{name}' (available: {', '.join(RENDITIONS)})")
+    return names
+
+
+def rendition_path(output_path, name):
+    """File name of one rendition: `<output>_<name>.mp4`."""
+    base, extension = os.path.splitext(output_path)
+    return f"{base}_{name}{extension or '.mp4'}"
+
+
+def build_rendition_command(video_path, audio_path, outputs, video_filter=None):
+    """
+    ffmpeg command encoding every rendition from a single decode.
+
+    The video is decoded once and fanned out by a split filter; each branch
+    is scaled to its rendition size and has its own encoder and output file.
+
+    Args:
+        video_path: Finished (cropped, subtitled) video
+        audio_path: File whose audio track goes into every rendition
+        outputs: List of (path, settings) pairs, settings as in RENDITIONS
+        video_filter: Optional filter applied before the split (e.g. ASS captions)
+
+    Returns:
+        Argument list for subprocess
+    """
+    count = len(outputs)
+    prefix = f"{video_filter}," if video_filter else ""
+    graph = [f"[0:v]{prefix}split={count}" + "".join(f"[v{i}]" for i in range(count))]
+    for i, (_, settings) in enumerate(outputs):
+        width, height = settings["width"], settings["height"]
+        graph.append(
+            f"[v{i}]scale={width}:{height}:force_original_aspect_ratio=decrease,"
+            f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,setsar=1[out{i}]"
+        )
+
+    cmd = [
+        get_ffmpeg_binary(),
+        "-y",
+        "-loglevel",
+        "error",
+        "-i",
+        video_path,
+        "-i",
+        audio_path,
+        "-filter_complex",
+        ";".join(graph),
+    ]
+    # The encoders run side by side and share the render budget
+    threads = max(1, stage_threads("render") // count)
+    for i, (path, settings) in enumerate(outputs):
+        bitrate = settings["video_bitrate"]
+        cmd += [
+            "-map",
+            f"[out{i}]",
+            "-map",
+            "1:a:0?",
+            "-c:v",
+            "libx264",
+            "-preset",
+            settings["preset"],
+            "-b:v",
+            bitrate,
+            "-maxrate",
+            bitrate,
+            "-bufsize",
+            f"{2 * int(bitrate.rstrip('k'))}k",
+            "-pix_fmt",
+            "yuv420p",
+            "-threads",
+            str(threads),
+            "-c:a",
+            "aac",
+            "-b:a",
+            settings["audio_bitrate"],
+            "-shortest",
+            "-movflags",
+            "+faststart",
+            path,
+        ]
+    return cmd
+
+
+def render_renditions(
+    video_with_audio, video_without_audio, output_path, names=None, video_filter=None
+):
+    """
+    Encode a finished short into every rendition of the ladder in one pass.
+
+    Takes the place of FaceCrop.combine_videos: the audio comes from
+    `video_with_audio` and the picture from `video_without_audio`. The
+    renditions are written next to `output_path` as `<output>_<name>.mp4`,
+    with a `<output>.renditions.json` manifest describing them.
+
+    Args:
+        video_with_audio: Clip whose audio track is used
+        video_without_audio: Cropped and subtitled video
+        output_path: Base path of the short
+        names: Rendition names from RENDITIONS (default: all)
+        video_filter: Optional ffmpeg filter applied once before the ladder
+            (e.g. AssSubtitles.ass_video_filter to burn captions in)
+
+    Returns:
+        List of manifest entries (dicts with name, path, size and bitrates)
+
+    Raises:
+        RuntimeError: If ffmpeg fails
+    """
+    names = names or list(RENDITIONS)
+    outputs = [(rendition_path(output_path, name), RENDITIONS[name]) for name in names]
+    print(f"Encoding {len(outputs)} rendition(s) from one decode: {', '.join(names)}")
+    result = subprocess.run(
+        build_rendition_command(video_without_audio, video_with_audio, outputs, video_filter),
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg rendition encode failed: {result.stderr.strip()}")
+
+    entries = []
+    for name, (path, settings) in zip(names, outputs):
+        entries.append(
+            {
+                "name": name,
+                "path": path,
+                "width": settings["width"],
+                "height": settings["height"],
+                "video_bitrate": settings["video_bitrate"],
+                "audio_bitrate": settings["audio_bitrate"],
+                "bytes": os.path.getsize(path),
+            }
+        )
+        print(f"  ✓ {name}: {settings['width']}x{settings['height']} -> {path}")
+
+    manifest_path = os.path.splitext(output_path)[0] + ".renditions.json"
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump({"source": output_path, "renditions": entries}, f, indent=2)
+    print(f"Rendition manifest: {manifest_path}")
+    return entries
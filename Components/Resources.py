@@ -0,0 +1,206 @@
+import os
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: stage slots are not enforced
+    fcntl = None
+
+LOCK_DIR = os.path.join(".cache", "locks")
+
+# Resource profile of each pipeline stage. CPU-bound stages get a share of
+# the cores and a number of threads per job; network-bound ones only a
+# fixed number of concurrent jobs.
+STAGE_PROFILES = {
+    "download": {"bound": "network", "slots": 3},
+    "transcribe": {"bound": "cpu", "threads": 4, "share": 1 / 3},
+    "render": {"bound": "cpu", "threads": 4},
+}
+
+
+def available_cores():
+    """Cores this process may run on (respects CPU affinity and container limits)."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def _parse_overrides(value):
+    overrides = {}
+    for item in (value or "").split(","):
+        if "=" in item:
+            stage, count = item.split("=", 1)
+            if count.strip().isdigit():
+                overrides[stage.strip()] = max(1, int(count))
+    return overrides
+
+
+def stage_slots(cores=None):
+    """
+    How many jobs may be in each stage at once on this machine.
+
+    Transcription gets about a third of the cores and rendering the rest,
+    each divided by the stage's threads per job, so a full house uses every
+    core without oversubscribing. Downloads are network-bound and have a
+    fixed limit. SHORTS_STAGE_SLOTS (e.g. "download=2,render=6") overrides
+    the computed counts.
+
+    Returns:
+        Dict of stage name -> number of slots
+    """
+    cores = cores or available_cores()
+    transcribe = STAGE_PROFILES["transcribe"]
+    render = STAGE_PROFILES["render"]
+    transcribe_slots = max(1, round(cores * transcribe["share"] / transcribe["threads"]))
+    render_slots = max(1, (cores - transcribe_slots * transcribe["threads"]) // render["threads"])
+    slots = {
+        "download": STAGE_PROFILES["download"]["slots"],
+        "transcribe": transcribe_slots,
+        "render": render_slots,
+    }
+    slots.update(_parse_overrides(os.environ.get("SHORTS_STAGE_SLOTS")))
+    return slots
+
+
+def concurrent_jobs():
+    """Jobs sharing this machine, as announced by batch.py (1 for a standalone run)."""
+    value = os.environ.get("SHORTS_CONCURRENT_JOBS", "")
+    return max(1, int(value)) if value.isdigit() else 1
+
+
+def thread_budget(cores=None, jobs=None):
+    """
+    Threads each CPU-bound stage of one job may use.
+
+    A standalone run has the machine to itself, and its stages run one after
+    the other, so each stage gets every core. With concurrent jobs, a stage's
+    share of the cores (as in stage_slots) is split between the jobs that can
+    be in it at once. SHORTS_STAGE_THREADS (e.g. "transcribe=2,render=6")
+    overrides the computed counts.
+
+    Args:
+        cores: Cores available (default: available_cores())
+        jobs: Concurrent jobs (default: concurrent_jobs())
+
+    Returns:
+        Dict of stage name -> threads per job
+    """
+    cores = cores or available_cores()
+    jobs = jobs or concurrent_jobs()
+    budget = {}
+    if jobs == 1:
+        budget = {
+            stage: cores for stage, profile in STAGE_PROFILES.items() if profile["bound"] == "cpu"
+        }
+    else:
+        slots = stage_slots(cores)
+        transcribe = STAGE_PROFILES["transcribe"]
+        transcribe_cores = max(
+            1, min(slots["transcribe"] * transcribe["threads"], round(cores * transcribe["share"]))
+        )
+        stage_cores = {
+            "transcribe": transcribe_cores,
+            "render": max(1, cores - transcribe_cores),
+        }
+        for stage, pool in stage_cores.items():
+            budget[stage] = max(1, pool // min(slots[stage], jobs))
+    budget.update(_parse_overrides(os.environ.get("SHORTS_STAGE_THREADS")))
+    return budget
+
+
+_budget = None
+
+
+def stage_threads(stage):
+    """Threads the given CPU-bound stage may use in this process."""
+    global _budget
+    if _budget is None:
+        _budget = thread_budget()
+    return _budget[stage]
+
+
+def apply_thread_budget():
+    """
+    Apply the thread budget to the libraries that size their own pools and
+    report the allocation.
+
+    OpenCV's pool is process-wide, so it is set to the render budget (the
+    only stage using it). Whisper, x264 and ONNX Runtime read their budget
+    through stage_threads() when they are created.
+
+    Returns:
+        Dict of stage name -> threads per job
+    """
+    import cv2
+
+    budget = {stage: stage_threads(stage) for stage in ("transcribe", "render")}
+    cv2.setNumThreads(budget["render"])
+    jobs = concurrent_jobs()
+    print(
+        f"Thread budget ({available_cores()} cores, {jobs} concurrent job{'s' if jobs > 1 else ''}): "
+        f"transcribe={budget['transcribe']} (Whisper), "
+        f"render={budget['render']} (OpenCV, x264, ONNX Runtime)"
+    )
+    return budget
+
+
+class StageSlot:
+    """
+    One of a stage's slots, held across processes with a file lock.
+
+    Every process running the pipeline (batch jobs or separate sessions)
+    takes a slot before entering a stage, so no more than the stage's slot
+    count run it at once. Slots are lock files in .cache/locks held with
+    flock, which the OS releases if the process dies.
+    """
+
+    def __init__(self, stage, slots=None, poll_interval=1.0):
+        self.stage = stage
+        self.slots = slots or stage_slots()[stage]
+        self.poll_interval = poll_interval
+        self._file = None
+
+    def _try_lock(self, index):
+        path = os.path.join(LOCK_DIR, f"{self.stage}-{index}.lock")
+        f = open(path, "w")
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            f.close()
+            return None
+        return f
+
+    def acquire(self):
+        if fcntl is None or self._file is not None:
+            return self
+        os.makedirs(LOCK_DIR, exist_ok=True)
+        waited = False
+        while True:
+            for index in range(self.slots):
+                self._file = self._try_lock(index)
+                if self._file is not None:
+                    if waited:
+                        print(f"✓ Got a {self.stage} slot")
+                    return self
+            if not waited:
+                print(f"Waiting for a free {self.stage} slot ({self.slots} in use)...")
+                waited = True
+            time.sleep(self.poll_interval)
+
+    def release(self):
+        if self._file is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self.acquire()
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+def stage_slot(stage):
+    """A StageSlot for `stage`, to be used as a context manager."""
+    return StageSlot(stage)
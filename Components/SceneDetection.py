@@ -0,0 +1,279 @@
+import hashlib
+import json
+import math
+import os
+import subprocess
+import cv2
+import numpy as np
+from Components.FfmpegWriter import get_ffmpeg_binary
+
+# Per-source analysis results live here, keyed by source_hash()
+CACHE_DIR = ".cache"
+
+# Thumbnail size used for shot-boundary features
+SHOT_THUMB_SIZE = (64, 36)
+HISTOGRAM_BINS = 32
+
+
+def source_hash(path, sample_bytes=1 << 20):
+    """
+    Cheap content hash of a media file: its size plus the first and last MiB.
+
+    Good enough to tell sources apart for caching without reading
+    multi-gigabyte files end to end.
+    """
+    size = os.path.getsize(path)
+    digest = hashlib.sha1(str(size).encode())
+    with open(path, "rb") as f:
+        digest.update(f.read(sample_bytes))
+        if size > sample_bytes:
+            f.seek(max(sample_bytes, size - sample_bytes))
+            digest.update(f.read(sample_bytes))
+    return digest.hexdigest()[:16]
+
+
+def cache_path(kind, key, extension=".json"):
+    """Path of a cache file for `kind` (e.g. "shots") and a key built from source_hash()."""
+    directory = os.path.join(CACHE_DIR, kind)
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, f"{key}{extension}")
+
+
+def load_cached_json(path):
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"Warning: Could not read cache file {path}: {e}")
+        return None
+
+
+def save_cached_json(path, data):
+    try:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+    except Exception as e:
+        print(f"Warning: Could not write cache file {path}: {e}")
+
+
+def iter_analysis_frames(video_path, width, fps=None, chunk_size=64, start=None, duration=None):
+    """
+    Decode a video with ffmpeg at reduced resolution, in chunks.
+
+    Scaling happens inside ffmpeg's multithreaded decoder, so Python only
+    ever touches small frames.
+
+    Args:
+        video_path: Source video
+        width: Analysis width in pixels (height keeps the aspect ratio)
+        fps: Optional sampling rate; None keeps every frame
+        chunk_size: Frames per yielded chunk
+        start: Optional start time in seconds (frame-accurate seek)
+        duration: Optional length in seconds to decode from `start`
+
+    Yields:
+        uint8 arrays of shape (N, height, width, 3) in BGR order
+    """
+    cap = cv2.VideoCapture(video_path)
+    source_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    source_height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    cap.release()
+    if source_width == 0 or source_height == 0:
+        raise IOError(f"Could not read video dimensions from {video_path}")
+
+    width = min(width, source_width) // 2 * 2
+    height = max(2, int(round(source_height * width / source_width / 2)) * 2)
+    filters = f"scale={width}:{height}:flags=area"
+    if fps:
+        filters = f"fps={fps}," + filters
+
+    cmd = [get_ffmpeg_binary(), "-loglevel", "error"]
+    if start:
+        cmd += ["-ss", f"{start:.6f}"]
+    cmd += ["-i", video_path]
+    if duration is not None:
+        cmd += ["-t", f"{duration:.6f}"]
+    cmd += [
+        "-an",
+        "-vf",
+        filters,
+        "-f",
+        "rawvideo",
+        "-pix_fmt",
+        "bgr24",
+        "-",
+    ]
+    frame_bytes = width * height * 3
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE)
+    try:
+        while True:
+            data = process.stdout.read(frame_bytes * chunk_size)
+            count = len(data) // frame_bytes
+            if count == 0:
+                break
+            yield np.frombuffer(data[: count * frame_bytes], dtype=np.uint8).reshape(
+                count, height, width, 3
+            )
+    finally:
+        process.stdout.close()
+        process.kill()
+        process.wait()
+
+
+def _shot_features(frames):
+    """64x36 grayscale thumbnails and their normalized histograms."""
+    thumbs = np.stack(
+        [
+            cv2.cvtColor(
+                cv2.resize(f, SHOT_THUMB_SIZE, interpolation=cv2.INTER_AREA),
+                cv2.COLOR_BGR2GRAY,
+            )
+            for f in frames
+        ]
+    )
+    n = len(thumbs)
+    pixels = thumbs.shape[1] * thumbs.shape[2]
+
+    # Histograms of every thumbnail in one bincount
+    bins = (thumbs // (256 // HISTOGRAM_BINS)).astype(np.int64)
+    bins += (np.arange(n, dtype=np.int64) * HISTOGRAM_BINS)[:, None, None]
+    hists = np.bincount(bins.ravel(), minlength=n * HISTOGRAM_BINS)
+    hists = hists.reshape(n, HISTOGRAM_BINS).astype(np.float32) / pixels
+    return thumbs, hists
+
+
+def _cut_scores(thumbs, hists, prev_thumbs, prev_hists):
+    """Cut score (0-1) of each frame against the frame before it."""
+    hist_diff = 0.5 * np.abs(hists - prev_hists).sum(axis=1)
+    pixel_diff = np.abs(thumbs.astype(np.int16) - prev_thumbs).mean(axis=(1, 2)) / 255.0
+    return np.maximum(hist_diff, pixel_diff)
+
+
+def refine_cut(video_path, t0, t1, fps, analysis_width=160):
+    """
+    Exact frame of a hard cut known to lie between two sampled times.
+
+    Sampled detection (SourceAnalysis at a few samples per second) only
+    knows a cut happened between two samples. This decodes the frames in
+    between at low resolution and picks the one that differs most from its
+    predecessor.
+
+    Args:
+        video_path: Source video
+        t0: Time of the last sample before the cut (seconds)
+        t1: Time of the first sample after the cut (seconds)
+        fps: Source frame rate
+        analysis_width: Width of the decoded frames
+
+    Returns:
+        Source frame index where the new shot starts
+    """
+    # A frame of margin on each side: samples only land near the sampling grid
+    first = max(0, int(math.ceil(t0 * fps - 1e-6)) - 1)
+    frames = [
+        frame
+        for chunk in iter_analysis_frames(
+            video_path, analysis_width, start=first / fps, duration=t1 - first / fps + 2 / fps
+        )
+        for frame in chunk
+    ]
+    if len(frames) < 2:
+        return int(round(t1 * fps))
+    thumbs, hists = _shot_features(frames)
+    scores = _cut_scores(thumbs[1:], hists[1:], thumbs[:-1], hists[:-1])
+    return first + 1 + int(np.argmax(scores))
+
+
+class ShotDetector:
+    """
+    Streaming hard-cut detector over downsampled frames.
+
+    Each frame is reduced to a 64x36 grayscale thumbnail. For a whole chunk
+    at once it computes the histogram distance and mean absolute thumbnail
+    difference to the previous frame; a cut is reported where either
+    exceeds `threshold` and the current shot is at least `min_shot_frames` long.
+    """
+
+    def __init__(self, threshold=0.3, min_shot_frames=15):
+        self.threshold = threshold
+        self.min_shot_frames = min_shot_frames
+        self.frames_seen = 0
+        self.last_cut = 0
+        self.prev_thumb = None
+        self.prev_hist = None
+
+    def feed(self, frames):
+        """
+        Process the next chunk of frames.
+
+        Returns:
+            List of global frame indices where a new shot starts
+        """
+        thumbs, hists = _shot_features(frames)
+        n = len(thumbs)
+
+        if self.prev_thumb is None:
+            prev_thumbs = np.concatenate([thumbs[:1], thumbs[:-1]])
+            prev_hists = np.concatenate([hists[:1], hists[:-1]])
+        else:
+            prev_thumbs = np.concatenate([self.prev_thumb[None], thumbs[:-1]])
+            prev_hists = np.concatenate([self.prev_hist[None], hists[:-1]])
+
+        scores = _cut_scores(thumbs, hists, prev_thumbs, prev_hists)
+
+        cuts = []
+        for offset in np.flatnonzero(scores > self.threshold):
+            frame_index = self.frames_seen + int(offset)
+            if frame_index - self.last_cut >= self.min_shot_frames:
+                cuts.append(frame_index)
+                self.last_cut = frame_index
+
+        self.prev_thumb = thumbs[-1]
+        self.prev_hist = hists[-1]
+        self.frames_seen += n
+        return cuts
+
+
+def detect_shots(
+    video_path,
+    analysis_width=640,
+    samples_per_shot=10,
+    sample_stride=3,
+    threshold=0.3,
+    min_shot_frames=15,
+):
+    """
+    Split a video into shots and keep a few low-resolution frames from each.
+
+    Args:
+        video_path: Source video
+        analysis_width: Width of the decoded analysis frames
+        samples_per_shot: Frames kept from the start of every shot (for face detection)
+        sample_stride: Keep every Nth frame when sampling a shot
+        threshold: Cut score threshold (0-1)
+        min_shot_frames: Minimum shot length in frames
+
+    Returns:
+        (shots, samples) - shots is a list of [start_frame, end_frame) pairs,
+        samples is a list (one entry per shot) of analysis frames
+    """
+    detector = ShotDetector(threshold=threshold, min_shot_frames=min_shot_frames)
+    starts = [0]
+    samples = [[]]
+    frame_index = 0
+    for chunk in iter_analysis_frames(video_path, analysis_width):
+        cuts = set(detector.feed(chunk))
+        for frame in chunk:
+            if frame_index in cuts:
+                starts.append(frame_index)
+                samples.append([])
+            offset = frame_index - starts[-1]
+            if offset % sample_stride == 0 and len(samples[-1]) < samples_per_shot:
+                samples[-1].append(frame.copy())
+            frame_index += 1
+
+    ends = starts[1:] + [frame_index]
+    shots = [[start, end] for start, end in zip(starts, ends)]
+    return shots, samples
@@ -0,0 +1,178 @@
+import os
+import cv2
+import numpy as np
+from Components.FaceDetectors import get_analysis_detector
+from Components.Motion import motion_thumbnail, motion_center
+from Components.SceneDetection import (
+    ShotDetector,
+    iter_analysis_frames,
+    refine_cut,
+    source_hash,
+    cache_path,
+)
+
+# Bumped when the cached analysis format changes
+ANALYSIS_VERSION = 2
+
+# One row per analysis sample. Face columns describe the largest face and are
+# NaN when no face was found; motion_x is a fraction of the frame width.
+TIMELINE_DTYPE = np.dtype(
+    [
+        ("time", np.float32),
+        ("shot", np.int32),
+        ("face_count", np.uint8),
+        ("face_x", np.float32),
+        ("face_w", np.float32),
+        ("motion_x", np.float32),
+    ]
+)
+
+
+class SourceAnalysis:
+    """
+    Low-resolution timeline of a whole source video.
+
+    Built once per source by analyze_source(); every short then slices its
+    own time range out of it instead of re-analysing its clip. Samples are
+    sparse, but `shot_starts` holds each shot's start refined to the exact
+    source frame (in seconds), so crop plans switch on the cut itself.
+    """
+
+    def __init__(self, timeline, width, height, fps, sample_fps, shot_starts=None):
+        self.timeline = timeline
+        self.width = int(width)
+        self.height = int(height)
+        self.fps = float(fps)
+        self.sample_fps = float(sample_fps)
+        self.shot_starts = shot_starts
+
+    def save(self, path):
+        np.savez_compressed(
+            path,
+            timeline=self.timeline,
+            meta=np.array([self.width, self.height, self.fps, self.sample_fps]),
+            shot_starts=self.shot_starts,
+        )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            width, height, fps, sample_fps = data["meta"]
+            return cls(
+                data["timeline"], width, height, fps, sample_fps, data["shot_starts"]
+            )
+
+    def shot_start(self, shot):
+        """Start time of a shot in the source (seconds), frame-accurate."""
+        if self.shot_starts is not None and shot < len(self.shot_starts):
+            return float(self.shot_starts[shot])
+        rows = self.timeline[self.timeline["shot"] == shot]
+        return float(rows["time"][0]) if len(rows) else 0.0
+
+    def between(self, t0, t1):
+        """Timeline rows with t0 <= time < t1 (rows are sorted by time)."""
+        times = self.timeline["time"]
+        lo = np.searchsorted(times, t0, side="left")
+        hi = np.searchsorted(times, t1, side="left")
+        return self.timeline[lo:hi]
+
+
+def analyze_source(
+    video_path, detector_backend="haar", sample_fps=2, analysis_width=480
+):
+    """
+    Analyse a whole source video once: shots, faces and motion over time.
+
+    Frames are sampled at `sample_fps` and decoded at `analysis_width` by
+    ffmpeg, so the pass costs a fraction of a full-resolution decode. The
+    result is cached in .cache/analysis by source hash.
+
+    Args:
+        video_path: Source video
+        detector_backend: Face detector backend (see FaceDetectors.py)
+        sample_fps: Analysis samples per second
+        analysis_width: Width of the analysis frames
+
+    Returns:
+        SourceAnalysis
+    """
+    key = (
+        f"{source_hash(video_path)}_{detector_backend}_{sample_fps}_{analysis_width}"
+        f"_v{ANALYSIS_VERSION}"
+    )
+    path = cache_path("analysis", key, ".npz")
+    if os.path.exists(path):
+        try:
+            analysis = SourceAnalysis.load(path)
+            print(f"Loaded cached source analysis ({len(analysis.timeline)} samples)")
+            return analysis
+        except Exception as e:
+            print(f"Warning: Could not load cached analysis: {e}")
+
+    cap = cv2.VideoCapture(video_path)
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    cap.release()
+
+    print(f"Analysing source at {sample_fps} samples/s...")
+    shot_detector = ShotDetector(threshold=0.3, min_shot_frames=2)
+    detector = None
+    rows = []
+    shot = 0
+    cut_samples = []
+    prev_thumb = None
+    index = 0
+    for chunk in iter_analysis_frames(video_path, analysis_width, fps=sample_fps):
+        if detector is None:
+            scale = width / chunk.shape[2]
+            detector = get_analysis_detector(detector_backend, scale)
+        cuts = set(shot_detector.feed(chunk))
+        detections = detector.detect_batch(list(chunk))
+        for frame, faces in zip(chunk, detections):
+            if index in cuts:
+                shot += 1
+                cut_samples.append(index)
+                prev_thumb = None
+            thumb = motion_thumbnail(frame)
+            motion = None
+            if prev_thumb is not None:
+                motion = motion_center(prev_thumb, thumb)
+            prev_thumb = thumb
+
+            face_x = face_w = np.nan
+            if len(faces) > 0:
+                best_face = max(faces, key=lambda f: f[2] * f[3])
+                face_x = (best_face[0] + best_face[2] / 2) * scale
+                face_w = best_face[2] * scale
+            rows.append(
+                (
+                    index / sample_fps,
+                    shot,
+                    min(len(faces), 255),
+                    face_x,
+                    face_w,
+                    np.nan if motion is None else motion,
+                )
+            )
+            index += 1
+
+    # Cuts are only known to the sampling interval; find their exact frames.
+    # The fps filter keeps the frame nearest each sample time, so sample k
+    # holds a source frame from up to half an interval either side of k.
+    shot_starts = [0.0]
+    for index in cut_samples:
+        t0 = max(0.0, (index - 1.5) / sample_fps)
+        frame = refine_cut(video_path, t0, (index + 0.5) / sample_fps, fps)
+        shot_starts.append(frame / fps)
+
+    timeline = np.array(rows, dtype=TIMELINE_DTYPE)
+    analysis = SourceAnalysis(
+        timeline, width, height, fps, sample_fps, np.array(shot_starts, dtype=np.float64)
+    )
+    analysis.save(path)
+    print(
+        f"✓ Source analysis: {len(timeline)} samples, {shot + 1} shot(s) "
+        f"({timeline.nbytes / 1024:.0f} KB)"
+    )
+    return analysis
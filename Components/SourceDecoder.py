@@ -0,0 +1,190 @@
+import math
+import cv2
+import numpy as np
+from Components.FfmpegWriter import FfmpegWriter, INTERMEDIATE_ENCODER
+
+# Gaps between highlights shorter than this are decoded through (grab())
+# rather than seeked over, so nearby ranges cost no extra seek
+DEFAULT_SEEK_THRESHOLD = 10.0
+
+# Seeks land this far (seconds) before their target and decode forward to it
+SEEK_PREROLL = 1.0
+
+
+def frame_span(start, stop, fps):
+    """Frames [first, last) whose timestamps fall in [start, stop) seconds."""
+    return int(math.ceil(start * fps - 1e-6)), int(math.ceil(stop * fps - 1e-6))
+
+
+def _decoded_index(cap, fps, expected):
+    """
+    Source frame index of the frame last grabbed, from its timestamp.
+
+    Falls back to `expected` when the container has no usable timestamps.
+    """
+    msec = cap.get(cv2.CAP_PROP_POS_MSEC)
+    if msec <= 0 and expected > 0:
+        return expected
+    return int(round(msec * fps / 1000))
+
+
+def seek_to_frame(cap, target, fps, preroll=SEEK_PREROLL):
+    """
+    Position a capture so that its next read() returns frame `target`.
+
+    Seeking with CAP_PROP_POS_FRAMES is only approximate on many containers,
+    so this seeks `preroll` seconds early, checks where it landed from the
+    decoded frame's timestamp (seeking further back if it overshot) and
+    grabs forward to the frame before the target.
+
+    Args:
+        cap: Opened cv2.VideoCapture
+        target: Frame index to seek to
+        fps: Source frame rate
+        preroll: Seconds to land before the target
+
+    Returns:
+        False if the source ended before the target
+    """
+    if target <= 0:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+        return True
+    while True:
+        start = max(0, target - int(math.ceil(preroll * fps)))
+        cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+        if not cap.grab():
+            return False
+        index = _decoded_index(cap, fps, start)
+        if index < target or start == 0:
+            break
+        preroll *= 2
+    while index < target - 1:
+        if not cap.grab():
+            return False
+        index = max(index + 1, _decoded_index(cap, fps, index + 1))
+    return True
+
+
+def merge_spans(spans, max_gap=0):
+    """
+    Sort frame spans and merge the ones that overlap or are at most `max_gap` apart.
+
+    Returns:
+        List of (first, last) spans in source order
+    """
+    merged = []
+    for first, last in sorted(spans):
+        if merged and first <= merged[-1][1] + max_gap:
+            merged[-1][1] = max(merged[-1][1], last)
+        else:
+            merged.append([first, last])
+    return [tuple(span) for span in merged]
+
+
+def extract_clips(
+    source_path,
+    ranges,
+    output_paths,
+    audio_path=None,
+    seek_threshold=DEFAULT_SEEK_THRESHOLD,
+    encoder_options=None,
+):
+    """
+    Cut several clips from a source in one forward pass.
+
+    The source is opened once and the requested ranges are visited in time
+    order: short gaps are skipped with grab(), long ones with a single
+    forward seek that is checked against the decoded timestamps (see
+    seek_to_frame), so clips start on the frame their range asks for.
+    Every decoded frame is handed to the encoder of each clip whose range
+    contains it, so overlapping highlights share decoded frames. Each
+    clip's encoder is started at its first frame and finished at its last,
+    so only the clips in flight hold an encoder process.
+
+    Args:
+        source_path: Source video
+        ranges: List of (start, stop) in seconds, one per clip, in any order
+        output_paths: Output file per range
+        audio_path: Optional audio file with the source's timeline (e.g. the
+            WAV extracted for transcription) muxed into each clip, so the
+            source is not read again for its audio
+        seek_threshold: Gaps longer than this (seconds) are seeked over
+        encoder_options: libx264 settings for FfmpegWriter
+
+    Returns:
+        List with the number of frames written per clip
+    """
+    cap = cv2.VideoCapture(source_path, cv2.CAP_FFMPEG)
+    if not cap.isOpened():
+        raise IOError(f"Could not open {source_path}")
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+
+    spans = []
+    for start, stop in ranges:
+        first, last = frame_span(start, stop, fps)
+        spans.append((first, min(last, total_frames) if total_frames > 0 else last))
+    merged = merge_spans(spans, max_gap=int(seek_threshold * fps))
+    print(
+        f"Single-pass decode: {len(spans)} clip(s) in {len(merged)} range(s), "
+        f"{sum(last - first for first, last in merged) / fps:.0f}s of source"
+    )
+
+    writers = [None] * len(spans)
+    written = [0] * len(spans)
+    frame = np.empty((height, width, 3), dtype=np.uint8)
+    position = 0
+    ended = False
+    try:
+        for first, last in merged:
+            if ended:
+                break
+            if first > position:
+                if not seek_to_frame(cap, first, fps):
+                    break
+                position = first
+            for frame_index in range(first, last):
+                active = [i for i, (a, b) in enumerate(spans) if a <= frame_index < b]
+                if not active:
+                    # Gap inside a merged range: advance without converting
+                    if not cap.grab():
+                        ended = True
+                        break
+                    position += 1
+                    continue
+                ret, frame = cap.read(frame)
+                if not ret:
+                    ended = True
+                    break
+                position += 1
+                for i in active:
+                    if writers[i] is None:
+                        writers[i] = FfmpegWriter(
+                            output_paths[i],
+                            fps,
+                            (width, height),
+                            audio_path=audio_path,
+                            audio_start=spans[i][0] / fps,
+                            **(encoder_options or INTERMEDIATE_ENCODER),
+                        )
+                    writers[i].write(frame)
+                    written[i] += 1
+                    if frame_index + 1 == spans[i][1]:
+                        writers[i].release()
+                        writers[i] = None
+                        print(f"✓ Clip {i + 1} extracted -> {output_paths[i]}")
+    except BaseException:
+        # Keep the decode error rather than an encoder's broken pipe
+        for writer in writers:
+            if writer is not None:
+                writer.abort()
+        raise
+    finally:
+        cap.release()
+    for i, writer in enumerate(writers):
+        if writer is not None:
+            writer.release()
+            print(f"✓ Clip {i + 1} extracted (source ended early) -> {output_paths[i]}")
+    return written
@@ -1,137 +1,219 @@
 import cv2
 import numpy as np
-import webrtcvad
-import wave
-import contextlib
-from pydub import AudioSegment
 import os
+import time
+from Components.FaceDetectors import get_face_detector, get_analysis_detector
+from Components.FfmpegWriter import FfmpegWriter
+from Components.Profiling import frame_timer
+from Components.VoiceActivity import compute_vad_timeline
+from Components.TrackStore import TrackStore
+from Components.SceneDetection import iter_analysis_frames, source_hash, cache_path
 
-# Update paths to the model files
-prototxt_path = "models/deploy.prototxt"
-model_path = "models/res10_300x300_ssd_iter_140000_fp16.caffemodel"
-temp_audio_path = "temp_audio.wav"
 
-# Load DNN model
-net = cv2.dnn.readNetFromCaffe(prototxt_path, model_path)
+def detect_faces_and_speakers(input_video_path, output_video_path=None, track_path=None):
+    """
+    Detect faces frame by frame and flag the active speaker.
 
-# Initialize VAD
-vad = webrtcvad.Vad(2)  # Aggressiveness mode from 0 to 3
+    Args:
+        input_video_path: Video to analyse
+        output_video_path: Optional annotated debug video (not written when None)
+        track_path: Optional .npy path to save the tracks to
 
-def voice_activity_detection(audio_frame, sample_rate=16000):
-    return vad.is_speech(audio_frame, sample_rate)
+    Returns:
+        TrackStore with one row per detected face
+    """
+    tracks = TrackStore()
 
-def extract_audio_from_video(video_path, audio_path):
-    audio = AudioSegment.from_file(video_path)
-    audio = audio.set_frame_rate(16000).set_channels(1)
-    audio.export(audio_path, format="wav")
-
-def process_audio_frame(audio_data, sample_rate=16000, frame_duration_ms=30):
-    n = int(sample_rate * frame_duration_ms / 1000) * 2  # 2 bytes per sample
-    offset = 0
-    while offset + n <= len(audio_data):
-        frame = audio_data[offset:offset + n]
-        offset += n
-        yield frame
-
-global Frames
-Frames = [] # [x,y,w,h]
-
-def detect_faces_and_speakers(input_video_path, output_video_path):
-    # Return Frams:
-    global Frames
-    # Extract audio from the video
-    extract_audio_from_video(input_video_path, temp_audio_path)
-
-    # Read the extracted audio
-    with contextlib.closing(wave.open(temp_audio_path, 'rb')) as wf:
-        sample_rate = wf.getframerate()
-        audio_data = wf.readframes(wf.getnframes())
+    # Speech activity for the whole audio track, streamed from the video
+    # through ffmpeg and looked up per video frame
+    vad_timeline = compute_vad_timeline(input_video_path)
 
     cap = cv2.VideoCapture(input_video_path)
-    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-    out = cv2.VideoWriter(output_video_path, fourcc, 30.0, (int(cap.get(3)), int(cap.get(4))))
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    out = None
+    if output_video_path:
+        out = FfmpegWriter(output_video_path, fps, (int(cap.get(3)), int(cap.get(4))), preset="veryfast")
+
+    # ResNet-SSD through OpenCV DNN, loaded once per process
+    detector = get_face_detector("dnn", confidence=0.3)
 
-    frame_duration_ms = 30  # 30ms frames
-    audio_generator = process_audio_frame(audio_data, sample_rate, frame_duration_ms)
+    # Decode every frame into the same preallocated buffer
+    frame = np.empty((int(cap.get(4)), int(cap.get(3)), 3), dtype=np.uint8)
 
+    timer = frame_timer("speaker-tracking")
+    frame_index = 0
     while cap.isOpened():
-        ret, frame = cap.read()
+        ret, frame = cap.read(frame)
         if not ret:
             break
+        started = time.perf_counter()
 
-        h, w = frame.shape[:2]
-        blob = cv2.dnn.blobFromImage(cv2.resize(frame, (300, 300)), 1.0, (300, 300), (104.0, 177.0, 123.0))
-        net.setInput(blob)
-        detections = net.forward()
+        faces = detector.detect(frame)
 
-        audio_frame = next(audio_generator, None)
-        if audio_frame is None:
-            break
-        is_speaking_audio = voice_activity_detection(audio_frame, sample_rate)
+        # Presentation time of this frame, so audio and video stay aligned at any fps
+        frame_time = frame_index / fps
+        is_speaking_audio = vad_timeline.is_speech_at(frame_time)
         MaxDif = 0
-        Add = []
-        face_found = False
-        for i in range(detections.shape[2]):
-            confidence = detections[0, 0, i, 2]
-            if confidence > 0.3:  # Confidence threshold
-                box = detections[0, 0, i, 3:7] * np.array([w, h, w, h])
-                (x, y, x1, y1) = box.astype("int")
-                face_width = x1 - x
-                face_height = y1 - y
-
-                # Draw bounding box
-                cv2.rectangle(frame, (x, y), (x1, y1), (0, 255, 0), 2)
-
-                # Assuming lips are approximately at the bottom third of the face
-                lip_distance = abs((y + 2 * face_height // 3) - (y1))
-                Add.append([[x, y, x1, y1], lip_distance])
-
-                MaxDif = max(lip_distance, MaxDif)
-                face_found = True
-        for i in range(detections.shape[2]):
-            confidence = detections[0, 0, i, 2]
-            if confidence > 0.3:  # Confidence threshold
-                box = detections[0, 0, i, 3:7] * np.array([w, h, w, h])
-                (x, y, x1, y1) = box.astype("int")
-                face_width = x1 - x
-                face_height = y1 - y
-
-                # Draw bounding box
-                cv2.rectangle(frame, (x, y), (x1, y1), (0, 255, 0), 2)
-
-                # Assuming lips are approximately at the bottom third of the face
-                lip_distance = abs((y + 2 * face_height // 3) - (y1))
-                print(lip_distance)
-
-                # Combine visual and audio cues
-                if lip_distance >= MaxDif and is_speaking_audio:  # Adjust the threshold as needed
-                    cv2.putText(frame, "Active Speaker", (x, y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
-                if lip_distance >= MaxDif:
-                    break
-
-        if face_found:
-            Frames.append([x, y, x1, y1])
+        speaker_index = None
+        for i, face in enumerate(faces):
+            x, y, face_width, face_height = face[:4].astype(int)
+            x1, y1 = x + face_width, y + face_height
+
+            # Draw bounding box
+            cv2.rectangle(frame, (x, y), (x1, y1), (0, 255, 0), 2)
+
+            # Assuming lips are approximately at the bottom third of the face
+            lip_distance = abs((y + 2 * face_height // 3) - (y1))
+            if lip_distance > MaxDif:
+                MaxDif = lip_distance
+                speaker_index = i
+
+        # Combine visual and audio cues
+        if speaker_index is not None and is_speaking_audio:
+            x, y = faces[speaker_index][:2].astype(int)
+            cv2.putText(frame, "Active Speaker", (x, y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
         else:
-            # If no face detected, append previous frame's values or None
-            if len(Frames) > 0:
-                Frames.append(Frames[-1])
-            else:
-                Frames.append(None)
+            speaker_index = None
+
+        tracks.add_detections(frame_index, frame_time, faces, speaker_index)
+        frame_index += 1
+        if timer is not None:
+            timer.add(time.perf_counter() - started)
 
-        out.write(frame)
+        if out is not None:
+            out.write(frame)
         # cv2.imshow('Frame', frame)
         # if cv2.waitKey(1) & 0xFF == ord('q'):
         #     break
 
     cap.release()
-    out.release()
+    if out is not None:
+        out.release()
     cv2.destroyAllWindows()
-    os.remove(temp_audio_path)
 
+    if track_path:
+        tracks.save(track_path)
+    print(f"✓ Tracked {len(tracks)} face detections ({tracks.nbytes / 1024:.0f} KB)")
+    return tracks
+
+
+def mouth_motion(prev_gray, gray, box):
+    """
+    Mean absolute change in the mouth region of a face between two frames.
+
+    The mouth is taken as the central 60% of the bottom third of the face box.
+    """
+    x, y, w, h = box[:4]
+    x0 = int(max(0, x + 0.2 * w))
+    x1 = int(min(gray.shape[1], x + 0.8 * w))
+    y0 = int(max(0, y + 2 * h / 3))
+    y1 = int(min(gray.shape[0], y + h))
+    if x1 <= x0 or y1 <= y0:
+        return 0.0
+    return float(cv2.absdiff(prev_gray[y0:y1, x0:x1], gray[y0:y1, x0:x1]).mean())
+
+
+def analyze_speakers(
+    video_path,
+    detector_backend="dnn",
+    stride=5,
+    analysis_width=480,
+    min_mouth_motion=1.5,
+    batch_size=16,
+):
+    """
+    Track faces and the active speaker at a frame stride on downscaled frames.
+
+    Faces are detected on every `stride`-th frame only, in batches. A face is
+    the active speaker when the VAD reports speech at that time and its mouth
+    region moves the most since the previous frame; with a single face, speech
+    alone is enough. Results are cached in .cache/speakers by source hash.
+
+    Args:
+        video_path: Clip to analyse (its audio track drives the VAD)
+        detector_backend: Face detector backend (see FaceDetectors.py)
+        stride: Run the detector on every Nth frame
+        analysis_width: Width frames are decoded at for detection
+        min_mouth_motion: Mouth change (grey levels) below which a face counts as silent
+        batch_size: Sampled frames per detector call
+
+    Returns:
+        TrackStore in source pixel coordinates, times relative to the clip start
+    """
+    key = f"{source_hash(video_path)}_{detector_backend}_{stride}_{analysis_width}"
+    path = cache_path("speakers", key, ".npy")
+    if os.path.exists(path):
+        try:
+            tracks = TrackStore.load(path)
+            print(f"Loaded cached speaker tracks ({len(tracks)} detections)")
+            return tracks
+        except Exception as e:
+            print(f"Warning: Could not load cached speaker tracks: {e}")
+
+    vad_timeline = compute_vad_timeline(video_path)
+
+    cap = cv2.VideoCapture(video_path)
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    cap.release()
+
+    print(f"Tracking active speaker (every {stride} frame(s), {detector_backend})...")
+    tracks = TrackStore()
+    detector = None
+    scale = 1.0
+    pending = []  # (frame_index, prev_gray, gray, frame) waiting for detection
+    prev_gray = None
+    frame_index = 0
+    # Per sampled frame: its share of the batched detection when profiling
+    timer = frame_timer("speaker-analysis")
+
+    def flush():
+        started = time.perf_counter()
+        frames = [item[3] for item in pending]
+        for (index, before, gray, _), faces in zip(pending, detector.detect_batch(frames)):
+            speaker_index = None
+            if len(faces) and vad_timeline.is_speech_at(index / fps):
+                if len(faces) == 1:
+                    speaker_index = 0
+                else:
+                    motion = [mouth_motion(before, gray, face) for face in faces]
+                    if max(motion) >= min_mouth_motion:
+                        speaker_index = int(np.argmax(motion))
+            source_faces = faces.copy()
+            source_faces[:, :4] *= scale
+            tracks.add_detections(index, index / fps, source_faces, speaker_index)
+        if timer is not None:
+            per_frame = (time.perf_counter() - started) / len(pending)
+            for _ in pending:
+                timer.add(per_frame)
+        pending.clear()
+
+    for chunk in iter_analysis_frames(video_path, analysis_width):
+        if detector is None:
+            scale = width / chunk.shape[2]
+            detector = get_analysis_detector(detector_backend, scale)
+        for frame in chunk:
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            if frame_index % stride == 0:
+                before = gray if prev_gray is None else prev_gray
+                pending.append((frame_index, before, gray, frame))
+                if len(pending) == batch_size:
+                    flush()
+            prev_gray = gray
+            frame_index += 1
+    if pending:
+        flush()
+
+    tracks.save(path)
+    speaking = len(tracks.speakers())
+    print(
+        f"✓ Speaker tracking: {len(tracks)} detections, {speaking} with an active "
+        f"speaker ({tracks.nbytes / 1024:.0f} KB)"
+    )
+    return tracks
 
 
 if __name__ == "__main__":
-    detect_faces_and_speakers()
-    print(Frames)
-    print(len(Frames))
-    print(Frames[1:5])
+    tracks = detect_faces_and_speakers("Out.mp4", "DecOut.mp4")
+    print(tracks.records[:5])
+    print(tracks.dominant_speaker_per_second())
@@ -1,8 +1,13 @@
 import cv2
 import numpy as np
+from Components.FaceDetectors import get_face_detector
+from Components.FfmpegWriter import FfmpegWriter
 #Face Detection function
-def detect_faces(video_file):
-    face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+def detect_faces(video_file, detector_backend="haar"):
+    if detector_backend == "haar":
+        detector = get_face_detector("haar", min_neighbors=5)
+    else:
+        detector = get_face_detector(detector_backend)
 
     # Load the video
     cap = cv2.VideoCapture(video_file)
@@ -13,8 +18,7 @@ def detect_faces(video_file):
     while len(faces) < 5:
         ret, frame = cap.read()
         if ret:
-            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            detected_faces = face_cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5, minSize=(30, 30))
+            detected_faces = detector.detect(frame)[:, :4].astype(int)
 
             # Iterate through the detected faces
             for face in detected_faces:
@@ -51,8 +55,7 @@ def crop_video(faces, input_file, output_file):
             target_width = int(target_height * VERTICAL_RATIO)
 
             # Create a VideoWriter object to save the output video
-            fourcc = cv2.VideoWriter_fourcc(*"mp4v")
-            output_video = cv2.VideoWriter(output_file, fourcc, 30.0, (target_width, target_height))
+            output_video = FfmpegWriter(output_file, 30.0, (target_width, target_height))
 
             # Loop through each frame of the input video
             while True:
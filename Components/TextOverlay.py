@@ -1,32 +1,61 @@
-from moviepy.editor import *
-from Transcription import transcribeAudio
-import re
-import math
+import bisect
+import cv2
+import numpy as np
+from Components.CaptionRenderer import rasterize_text
+from Components.CaptionCompositor import CaptionSprite
+from Components.FfmpegWriter import FfmpegWriter
+from Components.TranscriptIndex import as_transcript_index
 
 
 class EnhancedTextOverlay:
+    """
+    Streaming text overlay engine.
+
+    Each transcript segment is rendered once into a sprite, and its fade or
+    slide animation is precomputed as per-frame opacity and offset arrays.
+    apply(frame, t) then only looks up the active segments and blends their
+    sprites into the frame, so any frame loop can draw the overlays and
+    animations cost no more than static text.
+    """
+
     def __init__(self, video_path="Final.mp4", output_path="test.mp4"):
         self.video_path = video_path
         self.output_path = output_path
-        self.video = VideoFileClip(video_path)
+        # Video properties are read on first use (see _probe)
+        self.width = None
+        self.height = None
+        self.fps = None
+        self.duration = None
+        self.overlays = []
+        self._starts = []
 
         # Styling configuration
         self.config = {
-            "font": "DejaVu-Sans-Bold",
+            "font": None,  # Font file; None uses CaptionRenderer's bold sans
             "fontsize": 12,
             "color": "white",
-            "bg_color": (0, 0, 0, 0.1),  # RGB tuple for black
-            "bg_opacity": 0.7,
             "stroke_color": "black",
             "stroke_width": 1,
             "position": ("center", "bottom"),
-            # 'margin_bottom': 80,
-            "max_width": int(self.video.w * 0.8),
+            "margin_bottom": 80,
+            "max_width": None,  # Defaults to 80% of the video width
             "line_height": 1.2,
-            # 'fade_duration': 0.1,
+            "fade_duration": 0.1,
+            "slide_distance": 30,  # Pixels the text rises during a slide-in
             "animation_style": "fade",  # 'fade', 'slide', 'none'
         }
 
+    def _probe(self, fps=None):
+        """Read the video's size and frame rate (once)."""
+        if self.width is not None:
+            return
+        cap = cv2.VideoCapture(self.video_path)
+        self.width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self.fps = cap.get(cv2.CAP_PROP_FPS) or fps or 30.0
+        self.duration = cap.get(cv2.CAP_PROP_FRAME_COUNT) / self.fps
+        cap.release()
+
     def split_long_text(self, text, max_chars=35):
         """Split long text into multiple lines for better readability"""
         if len(text) <= max_chars:
@@ -49,8 +78,32 @@ class EnhancedTextOverlay:
 
         return lines
 
-    def create_text_clip(self, text, start_time, end_time, style_override=None):
-        """Create a styled text clip with background and animations"""
+    def animation_ramps(self, duration, config):
+        """
+        Per-frame opacity and vertical offset of a segment's animation.
+
+        Returns:
+            (opacity, offset_y) - float32 and int32 arrays with one entry per frame
+        """
+        frames = max(1, int(round(duration * self.fps)))
+        t = np.arange(frames, dtype=np.float32) / self.fps
+        opacity = np.ones(frames, dtype=np.float32)
+        offset_y = np.zeros(frames, dtype=np.int32)
+
+        style = config["animation_style"]
+        fade_dur = min(config.get("fade_duration", 0), duration / 2)
+        if style in ("fade", "slide") and fade_dur > 0:
+            opacity = np.clip(np.minimum(t, duration - t) / fade_dur, 0.0, 1.0)
+            opacity = opacity.astype(np.float32)
+        if style == "slide" and fade_dur > 0:
+            # Ease-out rise into place over the fade-in
+            progress = np.clip(t / fade_dur, 0.0, 1.0)
+            eased = 1.0 - (1.0 - progress) ** 2
+            offset_y = np.round(config["slide_distance"] * (1.0 - eased)).astype(np.int32)
+        return opacity, offset_y
+
+    def create_text_overlay(self, text, start_time, end_time, style_override=None):
+        """Render one segment and precompute its animation"""
         # Apply style overrides
         config = self.config.copy()
         if style_override:
@@ -63,43 +116,50 @@ class EnhancedTextOverlay:
         duration = end_time - start_time
 
         try:
-            # Create main text clip with simpler approach
-            txt_clip = TextClip(
-                txt=text_content,
-                fontsize=config["fontsize"],
-                font=config["font"],
-                color=config["color"],
-                method="caption",
-                size=(config["max_width"], None),
-                align="center",
+            max_width = config["max_width"] or int(self.width * 0.8)
+            bitmap = rasterize_text(
+                text_content,
+                config["fontsize"],
+                config["color"],
+                max_width,
+                stroke_color=config["stroke_color"],
+                stroke_width=config["stroke_width"],
+                line_spacing=config["line_height"],
+                font_path=config["font"],
             )
 
-            # Set timing and position
-            txt_clip = txt_clip.set_start(start_time).set_duration(duration)
-
             # Set position
             if config["position"] == ("center", "bottom"):
-                y_pos = self.video.h - config["margin_bottom"] - txt_clip.h
-                txt_clip = txt_clip.set_position(("center", y_pos))
+                x = (self.width - bitmap.shape[1]) // 2
+                y = self.height - config["margin_bottom"] - bitmap.shape[0]
             else:
-                txt_clip = txt_clip.set_position(config["position"])
+                x, y = config["position"]
 
-            # Add fade animation
-            if config["animation_style"] == "fade" and config["fade_duration"] > 0:
-                fade_dur = min(config["fade_duration"], duration / 2)
-                txt_clip = txt_clip.fadein(fade_dur).fadeout(fade_dur)
-
-            return txt_clip
+            opacity, offset_y = self.animation_ramps(duration, config)
+            return {
+                "start": start_time,
+                "end": end_time,
+                "sprite": CaptionSprite(bitmap, x, y),
+                "opacity": opacity,
+                "offset_y": offset_y,
+            }
 
         except Exception as e:
-            print(f"Error creating text clip for '{text}': {e}")
+            print(f"Error creating text overlay for '{text}': {e}")
             return None
 
-    def process_transcriptions(self, transcriptions):
-        """Process all transcription segments and create text clips"""
-        text_clips = []
+    def process_transcriptions(self, transcriptions, video_start_time=0):
+        """Prepare overlays for the transcription segments that fall inside this video"""
+        self._probe()
+        overlays = []
+
+        # Only the segments overlapping the video, re-based to its start
+        index = as_transcript_index(transcriptions)
+        segments = index.segments_between(
+            video_start_time, video_start_time + self.duration
+        )
 
-        for i, (text, start, end) in enumerate(transcriptions):
+        for i, (text, start, end, _) in enumerate(segments):
             # Skip very short segments
             if end - start < 0.5:
                 continue
@@ -115,15 +175,44 @@ class EnhancedTextOverlay:
             else:
                 style_override["color"] = "yellow"
 
-            # Create text clip
-            clip = self.create_text_clip(text, start, end, style_override)
-            if clip:
-                text_clips.append(clip)
+            overlay = self.create_text_overlay(text, start, end, style_override)
+            if overlay:
+                overlays.append(overlay)
+
+        overlays.sort(key=lambda overlay: overlay["start"])
+        self.overlays = overlays
+        self._starts = [overlay["start"] for overlay in overlays]
+        return overlays
+
+    def apply(self, frame, t):
+        """
+        Draw the overlays active at time `t` (seconds) onto a BGR frame in place.
+
+        Returns:
+            The same frame
+        """
+        last = bisect.bisect_right(self._starts, t)
+        # Segments may overlap slightly, so also check the one before
+        for overlay in self.overlays[max(0, last - 2) : last]:
+            if t >= overlay["end"]:
+                continue
+            k = min(int((t - overlay["start"]) * self.fps), len(overlay["opacity"]) - 1)
+            overlay["sprite"].blend(
+                frame, opacity=overlay["opacity"][k], dy=overlay["offset_y"][k]
+            )
+        return frame
 
-        return text_clips
+    def create_enhanced_video(self, transcriptions=None, fps=30, video_start_time=0):
+        """Create the final video with enhanced text overlays
 
-    def create_enhanced_video(self, transcriptions=None, fps=30):
-        """Create the final video with enhanced text overlays"""
+        Frames are decoded, overlaid and streamed into the encoder one at a
+        time; the source audio is muxed in by the same ffmpeg process.
+
+        Args:
+            transcriptions: TranscriptIndex or list of [text, start, end] in source time
+            fps: Frame rate to assume if the video doesn't report one
+            video_start_time: Start of this video in the transcript's timeline
+        """
         print("Creating enhanced video with dynamic text overlays...")
 
         # Require transcriptions to be provided (no automatic transcription)
@@ -136,44 +225,41 @@ class EnhancedTextOverlay:
             )
             return
 
+        self._probe(fps)
         if not transcriptions:
             print("No transcriptions found. Creating video without text overlay.")
-            self.video.write_videofile(self.output_path, fps=fps)
-            return
-
-        print(f"Processing {len(transcriptions)} transcript segments...")
-
-        # Create all text clips
-        text_clips = self.process_transcriptions(transcriptions)
-
-        if not text_clips:
-            print("No valid text clips created. Creating video without text overlay.")
-            self.video.write_videofile(self.output_path, fps=fps)
-            return
-
-        print(f"Created {len(text_clips)} text overlay clips")
-
-        # Composite all clips together
-        all_clips = [self.video] + text_clips
-        final_video = CompositeVideoClip(all_clips)
+        else:
+            print(f"Processing {len(transcriptions)} transcript segments...")
+            self.process_transcriptions(transcriptions, video_start_time)
+            print(f"Prepared {len(self.overlays)} text overlays")
 
-        # Write the final video
         print(f"Writing final video to {self.output_path}...")
-        final_video.write_videofile(
+        cap = cv2.VideoCapture(self.video_path)
+        out = FfmpegWriter(
             self.output_path,
-            fps=fps,
-            codec="libx264",
-            audio_codec="aac",
-            temp_audiofile="temp-audio.m4a",
-            remove_temp=True,
+            self.fps,
+            (self.width, self.height),
+            audio_path=self.video_path,
         )
+        frame = np.empty((self.height, self.width, 3), dtype=np.uint8)
+        frame_index = 0
+        try:
+            while True:
+                ret, frame = cap.read(frame)
+                if not ret:
+                    break
+                out.write(self.apply(frame, frame_index / self.fps))
+                frame_index += 1
+        except BaseException:
+            # Keep the frame loop's error rather than the encoder's broken pipe
+            out.abort()
+            raise
+        finally:
+            cap.release()
+        out.release()
 
         print("Enhanced video creation completed!")
 
-        # Clean up
-        final_video.close()
-        self.video.close()
-
 
 def main():
     """Main function to run the enhanced text overlay"""
@@ -206,7 +292,7 @@ def main():
     )
 
     # Create the enhanced video
-    overlay.create_enhanced_video()
+    overlay.create_enhanced_video(transcriptions=sample_transcriptions)
 
 
 if __name__ == "__main__":
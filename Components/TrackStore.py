@@ -0,0 +1,161 @@
+import numpy as np
+from Components.FaceDetectors import box_iou
+
+# One row per detected face per analysed frame. box is [x, y, w, h] in source
+# pixels; speaker marks the face judged to be talking in that frame.
+TRACK_DTYPE = np.dtype(
+    [
+        ("frame", np.int32),
+        ("time", np.float32),
+        ("box", np.float32, (4,)),
+        ("conf", np.float32),
+        ("speaker", np.bool_),
+        ("track_id", np.int32),
+    ]
+)
+
+
+class TrackStore:
+    """
+    Face tracks of a video in one structured NumPy array.
+
+    Rows are appended in time order into a buffer that doubles when full,
+    so appends are amortized O(1) and a full-length video takes a few
+    hundred kilobytes instead of a Python list per frame. Stores can be
+    saved to .npy and loaded back memory-mapped.
+    """
+
+    def __init__(self, capacity=1024, records=None):
+        if records is None:
+            self._data = np.zeros(capacity, dtype=TRACK_DTYPE)
+            self._size = 0
+        else:
+            self._data = records
+            self._size = len(records)
+        self._next_track_id = int(self.records["track_id"].max()) + 1 if self._size else 0
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def records(self):
+        """View of the stored rows (no copy)."""
+        return self._data[: self._size]
+
+    @property
+    def nbytes(self):
+        return self.records.nbytes
+
+    def _reserve(self, count):
+        needed = self._size + count
+        if needed <= len(self._data):
+            return
+        capacity = max(needed, 2 * len(self._data), 16)
+        data = np.zeros(capacity, dtype=TRACK_DTYPE)
+        data[: self._size] = self._data[: self._size]
+        self._data = data
+
+    def append(self, frame, time, box, conf=1.0, speaker=False, track_id=-1):
+        """Append a single face row."""
+        self._reserve(1)
+        self._data[self._size] = (frame, time, box, conf, speaker, track_id)
+        self._size += 1
+
+    def extend(self, rows):
+        """Append an array of TRACK_DTYPE rows."""
+        self._reserve(len(rows))
+        self._data[self._size : self._size + len(rows)] = rows
+        self._size += len(rows)
+
+    def add_detections(self, frame, time, boxes, speaker_index=None, iou_threshold=0.3):
+        """
+        Append every face detected in one frame and link them to existing tracks.
+
+        Each box takes the track id of the best-overlapping box from the
+        previously stored frame (greedy, IoU >= `iou_threshold`); unmatched
+        boxes start new tracks.
+
+        Args:
+            frame: Frame index
+            time: Frame timestamp in seconds
+            boxes: (K, 5) array of [x, y, w, h, score] from a FaceDetector
+            speaker_index: Row of `boxes` that is the active speaker, or None
+
+        Returns:
+            Array with the track id assigned to each box
+        """
+        boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 5)
+        track_ids = np.full(len(boxes), -1, dtype=np.int32)
+        previous = self._last_frame_rows()
+        if len(boxes) and len(previous):
+            iou = box_iou(boxes, previous["box"])
+            for _ in range(min(len(boxes), len(previous))):
+                i, j = np.unravel_index(np.argmax(iou), iou.shape)
+                if iou[i, j] < iou_threshold:
+                    break
+                track_ids[i] = previous["track_id"][j]
+                iou[i, :] = -1
+                iou[:, j] = -1
+        for i in np.flatnonzero(track_ids < 0):
+            track_ids[i] = self._next_track_id
+            self._next_track_id += 1
+
+        rows = np.zeros(len(boxes), dtype=TRACK_DTYPE)
+        rows["frame"] = frame
+        rows["time"] = time
+        rows["box"] = boxes[:, :4]
+        rows["conf"] = boxes[:, 4]
+        rows["track_id"] = track_ids
+        if speaker_index is not None:
+            rows["speaker"][speaker_index] = True
+        self.extend(rows)
+        return track_ids
+
+    def _last_frame_rows(self):
+        if self._size == 0:
+            return self.records
+        frames = self.records["frame"]
+        start = np.searchsorted(frames, frames[-1], side="left")
+        return self.records[start:]
+
+    def between(self, t0, t1):
+        """Rows with t0 <= time < t1."""
+        times = self.records["time"]
+        lo = np.searchsorted(times, t0, side="left")
+        hi = np.searchsorted(times, t1, side="left")
+        return self.records[lo:hi]
+
+    def speakers(self):
+        """Rows flagged as the active speaker."""
+        return self.records[self.records["speaker"]]
+
+    def dominant_speaker_per_second(self):
+        """
+        Track that was the active speaker for the most frames in each second.
+
+        Returns:
+            (seconds, track_ids) - int arrays, one entry per second that has speech
+        """
+        rows = self.speakers()
+        if len(rows) == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int32)
+        seconds = np.floor(rows["time"]).astype(np.int64)
+        pairs, counts = np.unique(
+            np.stack([seconds, rows["track_id"].astype(np.int64)], axis=1),
+            axis=0,
+            return_counts=True,
+        )
+        # Sort by second, then by count so the last row of each second wins
+        order = np.lexsort((counts, pairs[:, 0]))
+        pairs = pairs[order]
+        last = np.append(pairs[1:, 0] != pairs[:-1, 0], True)
+        return pairs[last, 0], pairs[last, 1].astype(np.int32)
+
+    def save(self, path):
+        np.save(path, self.records)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """Load a saved store; with `mmap` the rows stay on disk until touched."""
+        records = np.load(path, mmap_mode="r" if mmap else None)
+        return cls(records=records)
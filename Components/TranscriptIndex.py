@@ -0,0 +1,84 @@
+import bisect
+from itertools import accumulate
+
+
+class TranscriptIndex:
+    """
+    Transcript segments indexed by time for fast range queries.
+
+    Segments are sorted by start time. Alongside the start times the index
+    keeps the running maximum of end times, so the first segment that can
+    still overlap a query is found by bisection even when segments overlap
+    or arrive out of order. A query costs O(log n + k) for k matches instead
+    of a scan over the whole transcript.
+
+    Iterating the index yields the segments as [text, start, end, words]
+    lists, so it can be passed wherever a transcriptions list was used.
+    `words` holds per-word (start, end) timings, or is empty when the
+    transcript only has segment timings.
+    """
+
+    def __init__(self, transcriptions):
+        """
+        Args:
+            transcriptions: List of [text, start, end] or [text, start, end, words]
+                from transcribeAudio
+        """
+        self.segments = sorted(
+            (
+                [
+                    text,
+                    float(start),
+                    float(end),
+                    [(float(a), float(b)) for a, b in (words[0] if words else [])],
+                ]
+                for text, start, end, *words in transcriptions
+            ),
+            key=lambda segment: segment[1],
+        )
+        self.starts = [segment[1] for segment in self.segments]
+        self.max_ends = list(accumulate((segment[2] for segment in self.segments), max))
+
+    def __len__(self):
+        return len(self.segments)
+
+    def __iter__(self):
+        return iter(self.segments)
+
+    def overlapping(self, t0, t1):
+        """Segments with end > t0 and start < t1, in start order (source timings)."""
+        lo = bisect.bisect_right(self.max_ends, t0)
+        hi = bisect.bisect_left(self.starts, t1)
+        return [segment for segment in self.segments[lo:hi] if segment[2] > t0]
+
+    def segments_between(self, t0, t1):
+        """
+        Segments overlapping [t0, t1), clipped to it and re-based to t0.
+
+        Word timings are clipped the same way but all kept, so they still
+        line up with the words of the text.
+
+        Returns:
+            List of [text, start, end, words] with 0 <= start < end <= t1 - t0
+        """
+        duration = t1 - t0
+
+        def clip(t):
+            return min(duration, max(0.0, t - t0))
+
+        return [
+            [
+                text.strip(),
+                clip(start),
+                clip(end),
+                [(clip(word_start), clip(word_end)) for word_start, word_end in words],
+            ]
+            for text, start, end, words in self.overlapping(t0, t1)
+        ]
+
+
+def as_transcript_index(transcriptions):
+    """Return `transcriptions` as a TranscriptIndex, building one only if needed."""
+    if isinstance(transcriptions, TranscriptIndex):
+        return transcriptions
+    return TranscriptIndex(transcriptions)
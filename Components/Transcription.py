@@ -1,17 +1,26 @@
 from faster_whisper import WhisperModel
 import torch
+from Components.Resources import stage_threads
 
 def transcribeAudio(audio_path):
     try:
         print("Transcribing audio...")
         Device = "cuda" if torch.cuda.is_available() else "cpu"
         print(Device)
-        model = WhisperModel("base.en", device="cuda" if torch.cuda.is_available() else "cpu")
+        model = WhisperModel(
+            "base.en",
+            device="cuda" if torch.cuda.is_available() else "cpu",
+            cpu_threads=stage_threads("transcribe"),
+        )
         print("Model loaded")
-        segments, info = model.transcribe(audio=audio_path, beam_size=5, language="en", max_new_tokens=128, condition_on_previous_text=False)
+        segments, info = model.transcribe(audio=audio_path, beam_size=5, language="en", max_new_tokens=128, condition_on_previous_text=False, word_timestamps=True)
         segments = list(segments)
         # print(segments)
-        extracted_texts = [[segment.text, segment.start, segment.end] for segment in segments]
+        # Per-word (start, end) timings drive karaoke captions
+        extracted_texts = [
+            [segment.text, segment.start, segment.end, [(word.start, word.end) for word in segment.words or []]]
+            for segment in segments
+        ]
         print(f"✓ Transcription complete: {len(extracted_texts)} segments extracted")
         return extracted_texts
     except Exception as e:
@@ -24,6 +33,6 @@ if __name__ == "__main__":
     # print("Done")
     TransText = ""
 
-    for text, start, end in transcriptions:
+    for text, start, end, _ in transcriptions:
         TransText += (f"{start} - {end}: {text}")
     print(TransText)
\ No newline at end of file
@@ -0,0 +1,275 @@
+import contextlib
+import subprocess
+import tempfile
+import wave
+import numpy as np
+import webrtcvad
+from Components.FfmpegWriter import get_ffmpeg_binary
+
+# webrtcvad accepts 10, 20 or 30 ms frames of 16-bit mono PCM
+VAD_FRAME_MS = 30
+VAD_SAMPLE_RATE = 16000
+VAD_SAMPLE_RATES = (8000, 16000, 32000, 48000)
+
+
+class PcmStream:
+    """
+    16-bit mono PCM from a media file, read in fixed-size blocks.
+
+    WAV files that webrtcvad can use directly are read with the `wave`
+    module; anything else (video files, stereo or other rates) is decoded
+    and resampled by ffmpeg into a pipe. Either way only one block of
+    samples is in memory at a time, however long the input.
+
+    Args:
+        path: Audio or video file
+        sample_rate: Rate to resample to when decoding through ffmpeg
+        block_seconds: Duration of each yielded block
+
+    Raises:
+        RuntimeError: While iterating, if ffmpeg can't decode the file (e.g.
+            it has no audio track), instead of yielding no samples
+    """
+
+    def __init__(self, path, sample_rate=VAD_SAMPLE_RATE, block_seconds=10.0):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.block_seconds = block_seconds
+        self._wave = None
+        try:
+            wf = wave.open(path, "rb")
+        except (wave.Error, EOFError):
+            wf = None
+        if wf is not None:
+            if (
+                wf.getnchannels() == 1
+                and wf.getsampwidth() == 2
+                and wf.getframerate() in VAD_SAMPLE_RATES
+            ):
+                self._wave = wf
+                self.sample_rate = wf.getframerate()
+            else:
+                wf.close()
+
+    def _ffmpeg_blocks(self, block_samples):
+        cmd = [
+            get_ffmpeg_binary(),
+            "-loglevel",
+            "error",
+            "-i",
+            self.path,
+            "-vn",
+            "-f",
+            "s16le",
+            "-ac",
+            "1",
+            "-ar",
+            str(self.sample_rate),
+            "-",
+        ]
+        # stderr goes to a file so a chatty decoder can't fill a pipe and stall
+        with tempfile.TemporaryFile() as errors:
+            process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=errors)
+            finished = False
+            try:
+                while True:
+                    data = process.stdout.read(block_samples * 2)
+                    if len(data) < 2:
+                        break
+                    yield np.frombuffer(data[: len(data) // 2 * 2], dtype=np.int16)
+                finished = True
+            finally:
+                process.stdout.close()
+                if not finished:
+                    # The consumer stopped early
+                    process.kill()
+                returncode = process.wait()
+            if returncode != 0:
+                errors.seek(0)
+                message = errors.read().decode("utf-8", "replace").strip()
+                raise RuntimeError(
+                    f"ffmpeg could not decode audio from {self.path} "
+                    f"(exit code {returncode}): {message}"
+                )
+
+    def _wave_blocks(self, block_samples):
+        with contextlib.closing(self._wave):
+            while True:
+                data = self._wave.readframes(block_samples)
+                if len(data) < 2:
+                    break
+                yield np.frombuffer(data, dtype=np.int16)
+
+    def __iter__(self):
+        block_samples = max(1, int(self.sample_rate * self.block_seconds))
+        if self._wave is not None:
+            return self._wave_blocks(block_samples)
+        return self._ffmpeg_blocks(block_samples)
+
+
+class VadTimeline:
+    """
+    Speech activity over a whole audio track, one entry per VAD frame.
+
+    `speech` is the smoothed boolean decision and `probability` the
+    smoothed score it was thresholded from. Lookups by timestamp are O(1),
+    so frame loops can ask "is someone speaking at t?" for every video frame
+    whatever the frame rate.
+    """
+
+    def __init__(self, probability, frame_duration, threshold=0.5):
+        self.probability = probability.astype(np.float32)
+        self.speech = self.probability >= threshold
+        self.frame_duration = float(frame_duration)
+        # Prefix sums make speech_ratio() O(1) for any range
+        self._speech_cumsum = np.concatenate([[0], np.cumsum(self.speech)])
+
+    @property
+    def duration(self):
+        return len(self.speech) * self.frame_duration
+
+    def index_at(self, t):
+        index = int(t / self.frame_duration)
+        return min(max(index, 0), len(self.speech) - 1)
+
+    def is_speech_at(self, t):
+        """Speech decision at time t (seconds); False past the end of the audio."""
+        if len(self.speech) == 0 or t < 0 or t >= self.duration:
+            return False
+        return bool(self.speech[self.index_at(t)])
+
+    def probability_at(self, t):
+        if len(self.probability) == 0 or t < 0 or t >= self.duration:
+            return 0.0
+        return float(self.probability[self.index_at(t)])
+
+    def speech_at(self, times):
+        """Vectorized is_speech_at() for an array of timestamps."""
+        times = np.asarray(times, dtype=np.float64)
+        indices = (times / self.frame_duration).astype(np.int64)
+        valid = (indices >= 0) & (indices < len(self.speech))
+        result = np.zeros(times.shape, dtype=bool)
+        result[valid] = self.speech[indices[valid]]
+        return result
+
+    def speech_ratio(self, t0, t1):
+        """Fraction of [t0, t1) that contains speech."""
+        lo = min(max(int(t0 / self.frame_duration), 0), len(self.speech))
+        hi = min(max(int(np.ceil(t1 / self.frame_duration)), lo), len(self.speech))
+        if hi == lo:
+            return 0.0
+        return float(self._speech_cumsum[hi] - self._speech_cumsum[lo]) / (hi - lo)
+
+    def save(self, path):
+        np.savez_compressed(
+            path, probability=self.probability, frame_duration=self.frame_duration
+        )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data["probability"], float(data["frame_duration"]))
+
+
+def _energy_score(levels):
+    """Per-frame loudness mapped to 0-1 between the track's noise floor and speech level."""
+    floor, peak = np.percentile(levels, [10, 90])
+    if peak - floor < 1e-3:
+        return np.zeros(len(levels), dtype=np.float32)
+    return np.clip((levels - floor) / (peak - floor), 0.0, 1.0).astype(np.float32)
+
+
+def vad_probabilities(
+    samples,
+    sample_rate=VAD_SAMPLE_RATE,
+    aggressiveness=2,
+    frame_ms=VAD_FRAME_MS,
+    vad=None,
+):
+    """
+    Raw webrtcvad decisions and loudness for consecutive frames of int16 samples.
+
+    Returns:
+        (decisions, levels) - float32 arrays with one value per complete frame;
+        levels are RMS loudness in dBFS
+    """
+    frame_length = int(sample_rate * frame_ms / 1000)
+    count = len(samples) // frame_length
+    frames = samples[: count * frame_length].reshape(count, frame_length)
+    if vad is None:
+        vad = webrtcvad.Vad(aggressiveness)
+    decisions = np.fromiter(
+        (vad.is_speech(frame.tobytes(), sample_rate) for frame in frames),
+        dtype=np.float32,
+        count=count,
+    )
+    rms = np.sqrt(np.mean(frames.astype(np.float32) ** 2, axis=1) + 1e-9)
+    levels = 20 * np.log10(rms / 32768.0)
+    return decisions, levels.astype(np.float32)
+
+
+def smooth_probabilities(decisions, levels, frame_ms, energy_weight, smoothing_ms):
+    """Blend VAD decisions with loudness and smooth them with a moving average."""
+    probability = decisions
+    if energy_weight > 0 and len(levels):
+        probability = (1 - energy_weight) * decisions + energy_weight * _energy_score(
+            levels
+        )
+    window = max(1, int(round(smoothing_ms / frame_ms)))
+    if window > 1 and len(probability) >= window:
+        kernel = np.ones(window, dtype=np.float32) / window
+        probability = np.convolve(probability, kernel, mode="same")
+    return probability.astype(np.float32)
+
+
+def compute_vad_timeline(
+    audio_path,
+    aggressiveness=2,
+    frame_ms=VAD_FRAME_MS,
+    smoothing_ms=300,
+    energy_weight=0.3,
+    block_seconds=10.0,
+):
+    """
+    Run voice activity detection over a whole audio track up front.
+
+    Audio is streamed in blocks of `block_seconds` (see PcmStream), so memory
+    stays bounded by the block size; only the per-frame scores (one float
+    per 30 ms) are kept for the whole track.
+
+    Args:
+        audio_path: Audio or video file (16-bit mono WAVs are read directly)
+        aggressiveness: webrtcvad aggressiveness (0-3)
+        frame_ms: VAD frame length (10, 20 or 30 ms)
+        smoothing_ms: Moving-average window over the per-frame score (0 disables)
+        energy_weight: Weight of frame loudness in the score (0 = VAD only)
+        block_seconds: Audio decoded per block
+
+    Returns:
+        VadTimeline
+
+    Raises:
+        RuntimeError: If the audio can't be decoded
+    """
+    stream = PcmStream(audio_path, block_seconds=block_seconds)
+    vad = webrtcvad.Vad(aggressiveness)
+    frame_length = int(stream.sample_rate * frame_ms / 1000)
+    decisions = []
+    levels = []
+    remainder = np.zeros(0, dtype=np.int16)
+    for block in stream:
+        # Samples that didn't fill a whole VAD frame carry over to the next block
+        samples = np.concatenate([remainder, block]) if len(remainder) else block
+        block_decisions, block_levels = vad_probabilities(
+            samples, stream.sample_rate, aggressiveness, frame_ms, vad=vad
+        )
+        decisions.append(block_decisions)
+        levels.append(block_levels)
+        remainder = samples[len(block_decisions) * frame_length :]
+
+    decisions = np.concatenate(decisions) if decisions else np.zeros(0, np.float32)
+    levels = np.concatenate(levels) if levels else np.zeros(0, np.float32)
+    probability = smooth_probabilities(
+        decisions, levels, frame_ms, energy_weight, smoothing_ms
+    )
+    return VadTimeline(probability, frame_ms / 1000)
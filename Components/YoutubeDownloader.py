@@ -1,59 +1,135 @@
 import os
+import sys
 from pytubefix import YouTube
 import ffmpeg
+from Components.FfmpegWriter import get_ffmpeg_binary
+from Components.RangedDownload import download_files, DEFAULT_CONNECTIONS
+
+# Output height the stream selection aims for (shorts are cropped at source height)
+DEFAULT_TARGET_HEIGHT = 1080
 
 def get_video_size(stream):
 
     return stream.filesize / (1024 * 1024)
 
-def download_youtube_video(url):
+def stream_path(stream, prefix):
+    """Where a stream is saved inside the videos folder."""
+    return os.path.join('videos', prefix + stream.default_filename)
+
+def stream_height(stream):
+    """Vertical resolution of a video stream in pixels (0 if unknown)."""
+    resolution = (stream.resolution or "").rstrip("p")
+    return int(resolution) if resolution.isdigit() else 0
+
+def select_video_stream(video_streams, target_height=DEFAULT_TARGET_HEIGHT):
+    """
+    Pick the video stream to download for a given output height.
+
+    Shorts are cropped to 9:16 at the source height, so anything taller than
+    the output is downscaled away. The policy takes the lowest resolution at
+    or above `target_height` (or the highest available if none is that tall),
+    preferring MP4/H.264 streams, which merge into MP4 without re-encoding.
+    """
+    streams = list(video_streams)
+    tall_enough = [stream for stream in streams if stream_height(stream) >= target_height]
+    if tall_enough:
+        height = min(stream_height(stream) for stream in tall_enough)
+    else:
+        height = max(stream_height(stream) for stream in streams)
+    candidates = [stream for stream in streams if stream_height(stream) == height]
+    return min(
+        candidates,
+        key=lambda stream: (
+            stream.mime_type != "video/mp4",
+            not (stream.video_codec or "").startswith("avc1"),
+            stream.is_progressive,
+        ),
+    )
+
+def select_audio_stream(streams):
+    """Best audio-only stream, preferring AAC in MP4 (stream-copies into MP4)."""
+    audio_streams = streams.filter(only_audio=True)
+    return (
+        audio_streams.filter(mime_type="audio/mp4").order_by('abr').desc().first()
+        or audio_streams.order_by('abr').desc().first()
+    )
+
+def merge_streams(video_file, audio_file, output_file):
+    """
+    Mux separate video and audio streams into one MP4.
+
+    The streams are copied into the new container without re-encoding, which
+    takes seconds even for long 4K sources. If the codecs can't be stored in
+    MP4 as they are, they are re-encoded to H.264/AAC instead.
+    """
+    video = ffmpeg.input(video_file)
+    audio = ffmpeg.input(audio_file)
+    try:
+        print("Merging video and audio (stream copy)...")
+        merged = ffmpeg.output(video, audio, output_file, c='copy', movflags='+faststart')
+        ffmpeg.run(merged, cmd=get_ffmpeg_binary(), overwrite_output=True, quiet=True)
+    except ffmpeg.Error as e:
+        error = e.stderr.decode(errors="replace").strip().splitlines()
+        print(f"⚠ Stream copy failed ({error[-1] if error else e}), re-encoding instead...")
+        merged = ffmpeg.output(video, audio, output_file, vcodec='libx264', acodec='aac')
+        ffmpeg.run(merged, cmd=get_ffmpeg_binary(), overwrite_output=True)
+
+def download_youtube_video(
+    url,
+    connections=DEFAULT_CONNECTIONS,
+    max_bandwidth=None,
+    target_height=DEFAULT_TARGET_HEIGHT,
+    interactive=None,
+):
+    """
+    Download a YouTube video at a resolution suited to the output.
+
+    Adaptive video and audio streams are fetched at the same time, each over
+    `connections` parallel range requests; interrupted downloads resume from
+    their .part manifest on the next run.
+
+    Args:
+        url: YouTube video URL
+        connections: Parallel range requests per stream
+        max_bandwidth: Optional combined download cap in bytes per second
+        target_height: Output height the resolution policy aims for
+        interactive: Ask the user to confirm the resolution; defaults to
+            asking only when stdin is a terminal
+
+    Returns:
+        Path of the downloaded video, or None on error
+    """
     try:
         yt = YouTube(url)
 
         video_streams = yt.streams.filter(type="video").order_by('resolution').desc()
-        audio_stream = yt.streams.filter(only_audio=True).first()
+        audio_stream = select_audio_stream(yt.streams)
+        default_stream = select_video_stream(video_streams, target_height)
+        default_index = list(video_streams).index(default_stream)
 
         # Show available streams
         print("\nAvailable video streams:")
-        for i, stream in enumerate(video_streams[:5]):  # Show top 5 options
+        for i, stream in enumerate(video_streams):
             size = get_video_size(stream)
             stream_type = "Progressive" if stream.is_progressive else "Adaptive"
-            print(f"  {i}. Resolution: {stream.resolution}, Size: {size:.2f} MB, Type: {stream_type}")
-        
-        # Interactive selection with timeout
-        import select
-        import sys
-        
-        print("\nSelect resolution number (0-4) or wait 5s for auto-select...")
-        print("Auto-selecting highest quality in 5 seconds...")
-        
-        selected_stream = None
-        try:
-            ready, _, _ = select.select([sys.stdin], [], [], 5)
-            if ready:
-                user_input = sys.stdin.readline().strip()
-                if user_input.isdigit():
-                    choice = int(user_input)
-                    if 0 <= choice < len(video_streams):
-                        selected_stream = video_streams[choice]
-                        print(f"✓ User selected: {selected_stream.resolution}")
-                    else:
-                        print("Invalid choice, using highest quality")
-                        selected_stream = video_streams[0]
-                else:
-                    print("Invalid input, using highest quality")
-                    selected_stream = video_streams[0]
-            else:
-                print("\nTimeout - auto-selecting highest quality")
-                selected_stream = video_streams[0]
-        except:
-            print("\nAuto-selecting highest quality (timeout not available on this platform)")
-            selected_stream = video_streams[0]
-        
-        # Confirm selection
-        if selected_stream is None:
-            selected_stream = video_streams[0]
-        
+            marker = "  <- default" if i == default_index else ""
+            print(f"  {i}. Resolution: {stream.resolution}, Size: {size:.2f} MB, Type: {stream_type}{marker}")
+
+        selected_stream = default_stream
+        if interactive is None:
+            interactive = sys.stdin.isatty()
+        if interactive:
+            user_input = input(
+                f"\nSelect resolution number (0-{len(video_streams) - 1}) or press Enter for the default: "
+            ).strip()
+            if user_input.isdigit() and 0 <= int(user_input) < len(video_streams):
+                selected_stream = video_streams[int(user_input)]
+                print(f"✓ User selected: {selected_stream.resolution}")
+            elif user_input:
+                print(f"Invalid choice, using {default_stream.resolution}")
+        else:
+            print(f"\nAuto-selected {default_stream.resolution} for {target_height}p output")
+
         size = get_video_size(selected_stream)
         stream_type = "Progressive" if selected_stream.is_progressive else "Adaptive"
         print(f"\nFinal selection: {selected_stream.resolution}, Size: {size:.2f} MB, Type: {stream_type}")
@@ -61,19 +137,25 @@ def download_youtube_video(url):
         if not os.path.exists('videos'):
             os.makedirs('videos')
 
-        print(f"Downloading video: {yt.title}")
-        video_file = selected_stream.download(output_path='videos', filename_prefix="video_")
+        jobs = [(selected_stream.url, stream_path(selected_stream, "video_"), selected_stream.filesize)]
+        if not selected_stream.is_progressive:
+            jobs.append((audio_stream.url, stream_path(audio_stream, "audio_"), audio_stream.filesize))
+
+        print(f"Downloading {'video and audio' if len(jobs) > 1 else 'video'}: {yt.title}")
+        try:
+            files = download_files(jobs, connections=connections, max_bandwidth=max_bandwidth)
+        except Exception as e:
+            print(f"⚠ Ranged download failed ({e}), falling back to a single connection")
+            files = [selected_stream.download(output_path='videos', filename_prefix="video_")]
+            if not selected_stream.is_progressive:
+                files.append(audio_stream.download(output_path='videos', filename_prefix="audio_"))
+        video_file = files[0]
 
         if not selected_stream.is_progressive:
-            print("Downloading audio...")
-            audio_file = audio_stream.download(output_path='videos', filename_prefix="audio_")
+            audio_file = files[1]
 
-            print("Merging video and audio...")
             output_file = os.path.join('videos', f"{yt.title}.mp4")
-            stream = ffmpeg.input(video_file)
-            audio = ffmpeg.input(audio_file)
-            stream = ffmpeg.output(stream, audio, output_file, vcodec='libx264', acodec='aac', strict='experimental')
-            ffmpeg.run(stream, overwrite_output=True)
+            merge_streams(video_file, audio_file, output_file)
 
             os.remove(video_file)
             os.remove(audio_file)
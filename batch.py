@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Batch runner: generate shorts for many videos at once.
+
+Inputs are a directory of videos, a glob pattern, or a manifest (.txt with
+one path/URL per line, or .json with a list of paths/URLs or of
+{"input": ..., "args": [...]} objects). Every video runs `main.py
+--auto-approve` as its own process. Enough jobs run at once to keep each
+stage busy; the jobs share the machine through the stage slots in
+Components/Resources.py, so downloads, transcription and rendering each stay
+within their core budget. A failed video doesn't stop the batch.
+
+Logs, a live status.json and the final summary.json go to
+batch_runs/<timestamp>/.
+
+Usage:
+    python batch.py INPUT [--jobs=N] [main.py options, e.g. --shorts=3 --draft]
+"""
+import glob
+import json
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from Components.Resources import available_cores, stage_slots, thread_budget
+
+VIDEO_EXTENSIONS = (".mp4", ".webm", ".avi", ".mov", ".mkv")
+
+
+def collect_inputs(source):
+    """
+    Expand a directory, glob or manifest into a list of (input, extra_args).
+    """
+    if os.path.isdir(source):
+        names = sorted(
+            name
+            for name in os.listdir(source)
+            if name.lower().endswith(VIDEO_EXTENSIONS)
+            and not name.startswith(("video_", "audio_"))
+        )
+        return [(os.path.join(source, name), []) for name in names]
+    if source.endswith(".json") and os.path.isfile(source):
+        with open(source, "r", encoding="utf-8") as f:
+            entries = json.load(f)
+        return [
+            (entry, []) if isinstance(entry, str) else (entry["input"], entry.get("args", []))
+            for entry in entries
+        ]
+    if source.endswith(".txt") and os.path.isfile(source):
+        with open(source, "r", encoding="utf-8") as f:
+            lines = [line.strip() for line in f]
+        return [(line, []) for line in lines if line and not line.startswith("#")]
+    if os.path.isfile(source) or source.startswith(("http://", "https://")):
+        return [(source, [])]
+    return [(path, []) for path in sorted(glob.glob(source))]
+
+
+def job_name(video_input):
+    name = os.path.splitext(os.path.basename(video_input.rstrip("/")))[0] or video_input
+    return re.sub(r"[^\w.-]+", "_", name)[:60]
+
+
+class BatchRun:
+    """Runs the jobs and keeps per-video status for the summary."""
+
+    def __init__(self, inputs, main_args, jobs, run_dir):
+        self.inputs = inputs
+        self.main_args = main_args
+        self.jobs = jobs
+        self.run_dir = run_dir
+        self.log_dir = os.path.join(run_dir, "logs")
+        os.makedirs(self.log_dir, exist_ok=True)
+        self.results = [
+            {"input": video_input, "status": "pending"} for video_input, _ in inputs
+        ]
+        self.lock = threading.Lock()
+
+    def _write_status(self, filename="status.json", extra=None):
+        with self.lock:
+            data = {"results": self.results}
+            data.update(extra or {})
+            temp_path = os.path.join(self.run_dir, filename + ".tmp")
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=2)
+            os.replace(temp_path, os.path.join(self.run_dir, filename))
+
+    def run_one(self, index):
+        video_input, extra_args = self.inputs[index]
+        label = f"[{index + 1:>{len(str(len(self.inputs)))}}/{len(self.inputs)}]"
+        log_path = os.path.join(self.log_dir, f"{index + 1:04d}_{job_name(video_input)}.log")
+        result = self.results[index]
+        result.update(status="running", log=log_path)
+        self._write_status()
+        print(f"{label} ▶ {video_input}")
+
+        started = time.time()
+        cmd = [sys.executable, "main.py", video_input, "--auto-approve"]
+        cmd += self.main_args + list(extra_args)
+        try:
+            # Tell the job how many others share the machine, for its thread budget
+            env = dict(os.environ, SHORTS_CONCURRENT_JOBS=str(self.jobs))
+            with open(log_path, "w", encoding="utf-8") as log:
+                process = subprocess.run(
+                    cmd, stdin=subprocess.DEVNULL, stdout=log, stderr=subprocess.STDOUT, env=env
+                )
+            returncode = process.returncode
+        except Exception as e:
+            returncode = None
+            with open(log_path, "a", encoding="utf-8") as log:
+                log.write(f"\nbatch: could not run job: {e}\n")
+        elapsed = time.time() - started
+
+        with open(log_path, "r", encoding="utf-8", errors="replace") as log:
+            output = log.read()
+        shorts = re.findall(r"^  • (.+)$", output, flags=re.MULTILINE)
+        ok = returncode == 0 and len(shorts) > 0
+        result.update(
+            status="done" if ok else "failed",
+            returncode=returncode,
+            seconds=round(elapsed, 1),
+            shorts=shorts,
+        )
+        if ok:
+            print(f"{label} ✓ {video_input} - {len(shorts)} short(s) in {elapsed:.0f}s")
+        else:
+            print(f"{label} ✗ {video_input} - failed (exit {returncode}) in {elapsed:.0f}s, see {log_path}")
+        self._write_status()
+        return ok
+
+    def run(self):
+        started = time.time()
+        with ThreadPoolExecutor(max_workers=self.jobs) as pool:
+            list(pool.map(self.run_one, range(len(self.inputs))))
+        elapsed = time.time() - started
+
+        done = [r for r in self.results if r["status"] == "done"]
+        failed = [r for r in self.results if r["status"] == "failed"]
+        summary = {
+            "videos": len(self.results),
+            "succeeded": len(done),
+            "failed": len(failed),
+            "shorts": sum(len(r["shorts"]) for r in done),
+            "seconds": round(elapsed, 1),
+        }
+        self._write_status("summary.json", {"summary": summary})
+        return summary, failed
+
+
+def main():
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    options = [a for a in sys.argv[1:] if a.startswith("--")]
+    if not args:
+        print(__doc__)
+        sys.exit(1)
+
+    jobs = None
+    main_args = []
+    for option in options:
+        if option.startswith("--jobs="):
+            jobs = max(1, int(option.split("=", 1)[1]))
+        else:
+            main_args.append(option)
+
+    inputs = collect_inputs(args[0])
+    if not inputs:
+        print(f"No videos found for {args[0]}")
+        sys.exit(1)
+
+    # One job per stage slot keeps every stage busy; jobs waiting for a
+    # slot hold no CPU
+    cores = available_cores()
+    slots = stage_slots(cores)
+    if jobs is None:
+        jobs = sum(slots.values())
+    jobs = min(jobs, len(inputs))
+
+    run_dir = os.path.join("batch_runs", time.strftime("%Y%m%d-%H%M%S"))
+    if "--profile" in main_args:
+        # Keep every job's profiles with the rest of the run
+        main_args[main_args.index("--profile")] = f"--profile={os.path.join(run_dir, 'profiles')}"
+    print(f"{'='*60}")
+    print(f"BATCH: {len(inputs)} video(s), {jobs} concurrent job(s) on {cores} cores")
+    print("Stage slots: " + ", ".join(f"{stage}={count}" for stage, count in slots.items()))
+    budget = thread_budget(cores, jobs)
+    print("Threads per job: " + ", ".join(f"{stage}={count}" for stage, count in budget.items()))
+    print(f"Run directory: {run_dir}")
+    print(f"{'='*60}\n")
+
+    batch = BatchRun(inputs, main_args, jobs, run_dir)
+    summary, failed = batch.run()
+
+    print(f"\n{'='*60}")
+    print(
+        f"BATCH DONE: {summary['succeeded']}/{summary['videos']} video(s) succeeded, "
+        f"{summary['shorts']} short(s) in {summary['seconds'] / 60:.1f} min"
+    )
+    for result in failed:
+        print(f"  ✗ {result['input']} (log: {result['log']})")
+    print(f"Summary: {os.path.join(run_dir, 'summary.json')}")
+    print(f"{'='*60}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
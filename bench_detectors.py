@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Face detector comparison bench.
+
+Runs every requested backend over the same frames and reports throughput
+and how well each backend agrees with the first (reference) backend.
+
+Usage:
+    python bench_detectors.py VIDEO [--frames=200] [--batch=8] [--backends=haar,dnn]
+
+The onnx and onnx-int8 backends can be added to --backends when an ONNX
+export of the SSD is present at FaceDetectors.ONNX_MODEL_PATH.
+"""
+import sys
+import time
+import cv2
+import numpy as np
+from Components.FaceDetectors import get_face_detector, box_iou, CLI_BACKENDS
+
+
+def read_frames(video_path, max_frames):
+    cap = cv2.VideoCapture(video_path)
+    frames = []
+    while len(frames) < max_frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+
+def run_backend(detector, frames, batch_size):
+    # Warm up so model loading and first-call allocation are not timed
+    detector.detect_batch(frames[:batch_size])
+    results = []
+    start = time.perf_counter()
+    for i in range(0, len(frames), batch_size):
+        results.extend(detector.detect_batch(frames[i : i + batch_size]))
+    elapsed = time.perf_counter() - start
+    return results, elapsed
+
+
+def agreement(reference, results, iou_threshold=0.5):
+    """Fraction of reference faces matched by a box with IoU >= threshold."""
+    matched = 0
+    total = 0
+    for ref_boxes, boxes in zip(reference, results):
+        total += len(ref_boxes)
+        if len(ref_boxes) and len(boxes):
+            matched += int(np.sum(box_iou(ref_boxes, boxes).max(axis=1) >= iou_threshold))
+    return matched / total if total else 1.0
+
+
+def main():
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    options = dict(
+        a[2:].split("=", 1) for a in sys.argv[1:] if a.startswith("--") and "=" in a
+    )
+    if not args:
+        print(__doc__)
+        sys.exit(1)
+
+    num_frames = int(options.get("frames", 200))
+    batch_size = int(options.get("batch", 8))
+    backends = options.get("backends", ",".join(CLI_BACKENDS)).split(",")
+
+    frames = read_frames(args[0], num_frames)
+    if not frames:
+        print(f"Could not read frames from {args[0]}")
+        sys.exit(1)
+    print(f"Benchmarking on {len(frames)} frames (batch size {batch_size})\n")
+
+    reference = None
+    print(f"{'backend':<12}{'frames/s':>10}{'faces/s':>10}{'faces':>8}{'agreement':>11}")
+    for backend in backends:
+        try:
+            detector = get_face_detector(backend)
+        except Exception as e:
+            print(f"{backend:<12}  skipped: {e}")
+            continue
+        results, elapsed = run_backend(detector, frames, batch_size)
+        faces = sum(len(r) for r in results)
+        if reference is None:
+            reference = results
+        score = agreement(reference, results)
+        print(
+            f"{backend:<12}{len(frames) / elapsed:>10.1f}{faces / elapsed:>10.1f}"
+            f"{faces:>8}{score:>10.0%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -4,8 +4,29 @@ from Components.Transcription import transcribeAudio
 from Components.LanguageTasks import GetHighlight, GetMultipleHighlights
 from Components.FaceCrop import crop_to_vertical, combine_videos
 from Components.Subtitles import add_subtitles_to_video
+from Components.AssSubtitles import (
+    ass_filter_available,
+    ass_video_filter,
+    burn_subtitles,
+    write_ass_subtitles,
+)
+from Components.TranscriptIndex import TranscriptIndex
+from Components.CaptionCompositor import CaptionCompositor
+from Components.SourceAnalysis import analyze_source
+from Components.FaceDetectors import CLI_BACKENDS
+from Components.PartialIngest import PartialSource
+from Components.Renditions import render_renditions, parse_renditions
+from Components.SourceDecoder import extract_clips
+from Components.Resources import stage_slot, apply_thread_budget
+from Components.Profiling import start_profiling, profile_stage, PROFILES_FOLDER
+from Components.RenderManifest import (
+    RenderManifest,
+    DRAFTS_FOLDER,
+    plan_from_json,
+)
 import sys
 import os
+import json
 import uuid
 import re
 
@@ -13,6 +34,10 @@ import re
 session_id = str(uuid.uuid4())[:8]
 print(f"Session ID: {session_id}")
 
+# One thread budget for OpenCV, Whisper, x264 and ONNX Runtime, sized for
+# the number of concurrent jobs, so parallel sessions don't oversubscribe
+apply_thread_budget()
+
 # Check for auto-approve flag (for batch processing)
 auto_approve = "--auto-approve" in sys.argv
 if auto_approve:
@@ -22,7 +47,35 @@ if auto_approve:
 num_shorts = 1  # Default to 1 short
 manual_timeframes = None  # For manual time specification
 subtitle_style = "green_box"  # Default subtitle style
+subtitle_backend = "moviepy"  # "moviepy", "ass" (libass in ffmpeg) or "inline" (crop loop)
+karaoke = "--karaoke" in sys.argv  # Word-by-word highlighting (inline backend)
+if karaoke:
+    sys.argv.remove("--karaoke")
 zoom_mode = "auto"  # Default zoom mode
+detector_backend = "haar"  # Default face detector backend
+active_speaker = "--active-speaker" in sys.argv  # Follow whoever is talking
+if active_speaker:
+    sys.argv.remove("--active-speaker")
+speaker_stride = 5  # Speaker face detection on every Nth frame
+partial_ingest = "--partial-ingest" in sys.argv  # Audio first, then only the needed video
+if partial_ingest:
+    sys.argv.remove("--partial-ingest")
+single_pass = "--single-pass" in sys.argv  # Cut every clip in one pass over the source
+if single_pass:
+    sys.argv.remove("--single-pass")
+draft_mode = "--draft" in sys.argv  # Fast low-resolution preview renders
+if draft_mode:
+    sys.argv.remove("--draft")
+profile_dir = None  # Per-stage profiles and frame timings are written here
+if "--profile" in sys.argv:
+    profile_dir = os.path.join(PROFILES_FOLDER, session_id)
+    sys.argv.remove("--profile")
+promote_path = None  # Draft manifest to render at full quality
+promote_numbers = None  # Short numbers to promote (default: all)
+renditions = None  # Rendition ladder entries to encode (None = single final output)
+download_connections = 4  # Parallel range requests per downloaded stream
+max_bandwidth = None  # Download cap in bytes per second (None = unlimited)
+target_height = 1080  # Output height the download resolution is picked for
 
 for i, arg in enumerate(sys.argv[:]):
     if arg.startswith("--shorts="):
@@ -44,6 +97,12 @@ for i, arg in enumerate(sys.argv[:]):
             sys.argv.remove(arg)
         except:
             print("Invalid --subtitle-style value")
+    elif arg.startswith("--subtitle-backend="):
+        subtitle_backend = arg.split("=")[1]
+        if subtitle_backend not in ["moviepy", "ass", "inline"]:
+            print(f"Invalid --subtitle-backend value '{subtitle_backend}', using 'moviepy'")
+            subtitle_backend = "moviepy"
+        sys.argv.remove(arg)
     elif arg.startswith("--zoom="):
         try:
             zoom_mode = arg.split("=")[1]
@@ -54,9 +113,95 @@ for i, arg in enumerate(sys.argv[:]):
                 sys.argv.remove(arg)
         except:
             print("Invalid --zoom value")
+    elif arg.startswith("--detector="):
+        detector_backend = arg.split("=")[1]
+        if detector_backend not in CLI_BACKENDS:
+            print(f"Invalid --detector value '{detector_backend}', using 'haar'")
+            detector_backend = "haar"
+        sys.argv.remove(arg)
+    elif arg.startswith("--speaker-stride="):
+        try:
+            speaker_stride = max(1, int(arg.split("=")[1]))
+        except ValueError:
+            print("Invalid --speaker-stride value, using default (5)")
+        sys.argv.remove(arg)
+    elif arg.startswith("--connections="):
+        try:
+            download_connections = max(1, int(arg.split("=")[1]))
+        except ValueError:
+            print("Invalid --connections value, using default (4)")
+        sys.argv.remove(arg)
+    elif arg.startswith("--target-height="):
+        try:
+            target_height = max(1, int(arg.split("=")[1].rstrip("p")))
+        except ValueError:
+            print("Invalid --target-height value, using default (1080)")
+        sys.argv.remove(arg)
+    elif arg.startswith("--renditions="):
+        renditions = parse_renditions(arg.split("=", 1)[1]) or None
+        sys.argv.remove(arg)
+    elif arg.startswith("--promote="):
+        promote_path = arg.split("=", 1)[1]
+        sys.argv.remove(arg)
+    elif arg.startswith("--approve="):
+        try:
+            promote_numbers = [int(n) for n in arg.split("=")[1].split(",") if n.strip()]
+        except ValueError:
+            print("Invalid --approve value, promoting every draft")
+        sys.argv.remove(arg)
+    elif arg.startswith("--max-bandwidth="):
+        # Megabytes per second, shared by all download connections
+        try:
+            max_bandwidth = float(arg.split("=")[1]) * 1024 * 1024
+        except ValueError:
+            print("Invalid --max-bandwidth value, downloading without a limit")
+        sys.argv.remove(arg)
+    elif arg.startswith("--profile="):
+        profile_dir = os.path.join(arg.split("=", 1)[1], session_id)
+        sys.argv.remove(arg)
+
+if profile_dir:
+    start_profiling(profile_dir)
+
+# Promoting a draft replays its source, settings and crop decisions
+promote_manifest = None
+if promote_path:
+    try:
+        promote_manifest = RenderManifest.load(promote_path)
+    except Exception as e:
+        print(f"ERROR: Could not read draft manifest {promote_path}: {e}")
+        sys.exit(1)
+    draft_mode = False
+    settings = promote_manifest.data["settings"]
+    subtitle_style = settings["subtitle_style"]
+    subtitle_backend = settings["subtitle_backend"]
+    karaoke = settings["karaoke"]
+    zoom_mode = settings["zoom_mode"]
+    detector_backend = settings["detector_backend"]
+    # Drafts don't track speakers; the final render does it if asked for
+    active_speaker = active_speaker or settings.get("active_speaker", False)
+    speaker_stride = settings.get("speaker_stride", speaker_stride)
+    partial_ingest = promote_manifest.data["partial_ingest"]
+    print(f"Promoting drafts from {promote_path}")
+
+if karaoke and subtitle_backend != "inline":
+    print("Karaoke captions are drawn in the crop loop, using the inline subtitle backend")
+    subtitle_backend = "inline"
+
+if subtitle_backend == "ass" and not ass_filter_available():
+    print("⚠ ffmpeg was built without libass, using the moviepy subtitle backend")
+    subtitle_backend = "moviepy"
 
 # Check if URL/file was provided as command-line argument
-if len(sys.argv) > 1:
+if promote_manifest:
+    source = promote_manifest.data["source"]
+    # Reuse the downloaded source if it's still there
+    if source and os.path.isfile(source) and not partial_ingest:
+        url_or_file = source
+    else:
+        url_or_file = promote_manifest.data["input"]
+    print(f"Using draft source: {url_or_file}")
+elif len(sys.argv) > 1:
     url_or_file = sys.argv[1]
     print(f"Using input from command line: {url_or_file}")
 else:
@@ -185,6 +330,7 @@ else:
 
 # Check if input is a local file
 video_title = None
+partial_source = None
 if os.path.isfile(url_or_file):
     print(f"Using local video file: {url_or_file}")
     Vid = url_or_file
@@ -192,13 +338,39 @@ if os.path.isfile(url_or_file):
     video_title = os.path.splitext(os.path.basename(url_or_file))[0]
 else:
     # Assume it's a YouTube URL
-    print(f"Downloading from YouTube: {url_or_file}")
-    Vid = download_youtube_video(url_or_file)
-    if Vid:
-        Vid = Vid.replace(".webm", ".mp4")
-        print(f"Downloaded video and audio files successfully! at {Vid}")
-        # Extract title from downloaded file path
-        video_title = os.path.splitext(os.path.basename(Vid))[0]
+    if partial_ingest:
+        # Only the audio now; video ranges are fetched per highlight
+        print(f"Partial ingest from YouTube: {url_or_file}")
+        try:
+            partial_source = PartialSource(
+                url_or_file,
+                connections=download_connections,
+                max_bandwidth=max_bandwidth,
+                target_height=target_height,
+            )
+            with stage_slot("download"), profile_stage("download"):
+                partial_source.fetch_audio()
+            video_title = partial_source.title
+            Vid = partial_source.audio_path
+        except Exception as e:
+            print(f"⚠ Partial ingest unavailable ({e}), downloading the full video")
+            partial_source = None
+    if partial_source is None:
+        print(f"Downloading from YouTube: {url_or_file}")
+        with stage_slot("download"), profile_stage("download"):
+            Vid = download_youtube_video(
+                url_or_file,
+                connections=download_connections,
+                max_bandwidth=max_bandwidth,
+                target_height=target_height,
+            )
+        if Vid:
+            Vid = Vid.replace(".webm", ".mp4")
+            print(f"Downloaded video and audio files successfully! at {Vid}")
+            # Extract title from downloaded file path
+            video_title = os.path.splitext(os.path.basename(Vid))[0]
+if promote_manifest and promote_manifest.data.get("title"):
+    video_title = promote_manifest.data["title"]
 
 
 # Parse manual timeframes from string
@@ -249,11 +421,17 @@ if Vid:
     temp_cropped = f"temp_cropped_{session_id}.mp4"
     temp_subtitled = f"temp_subtitled_{session_id}.mp4"
 
-    Audio = extractAudio(Vid, audio_file)
+    with profile_stage("audio"):
+        if partial_source:
+            Audio = partial_source.extract_audio(audio_file)
+        else:
+            Audio = extractAudio(Vid, audio_file)
     if Audio:
         # Check if transcription already exists
         clean_title = clean_filename(video_title) if video_title else "output"
         transcription_file = f"transcriptions/{clean_title}_transcription.txt"
+        # Per-word timings, one list per line of the transcription file
+        words_file = f"transcriptions/{clean_title}_words.json"
 
         # Create transcriptions directory if it doesn't exist
         os.makedirs("transcriptions", exist_ok=True)
@@ -275,6 +453,12 @@ if Vid:
                             start = float(start_str)
                             end = float(end_str)
                             transcriptions.append([text, start, end])
+                if os.path.exists(words_file):
+                    with open(words_file, "r", encoding="utf-8") as f:
+                        words = json.load(f)
+                    if len(words) == len(transcriptions):
+                        for segment, segment_words in zip(transcriptions, words):
+                            segment.append(segment_words)
                 print(f"✓ Loaded {len(transcriptions)} segments from cache\n")
             except Exception as e:
                 print(f"Warning: Could not load cached transcription: {e}")
@@ -283,14 +467,17 @@ if Vid:
         # If no cached transcription, create new one
         if transcriptions is None:
             print("Generating new transcription...")
-            transcriptions = transcribeAudio(Audio)
+            with stage_slot("transcribe"), profile_stage("transcribe"):
+                transcriptions = transcribeAudio(Audio)
 
             # Save transcription to file
             if len(transcriptions) > 0:
                 try:
                     with open(transcription_file, "w", encoding="utf-8") as f:
-                        for text, start, end in transcriptions:
+                        for text, start, end, _ in transcriptions:
                             f.write(f"{start} - {end}: {text}\n")
+                    with open(words_file, "w", encoding="utf-8") as f:
+                        json.dump([words for *_, words in transcriptions], f)
                     print(f"✓ Transcription saved to: {transcription_file}\n")
                 except Exception as e:
                     print(f"Warning: Could not save transcription: {e}")
@@ -301,11 +488,27 @@ if Vid:
             print(f"{'='*60}\n")
             TransText = ""
 
-            for text, start, end in transcriptions:
+            # Interval index so each short finds its captions without a full scan
+            transcript_index = TranscriptIndex(transcriptions)
+
+            for text, start, end, *_ in transcriptions:
                 TransText += f"{start} - {end}: {text}\n"
 
-            # Determine highlights: manual or AI-selected
-            if manual_timeframes:
+            # Determine highlights: from the promoted drafts, manual or AI-selected
+            short_numbers = None
+            render_plans = {}
+            if promote_manifest:
+                promoted = promote_manifest.select(promote_numbers)
+                if not promoted:
+                    print("ERROR: No matching drafts to promote")
+                    sys.exit(1)
+                highlights = [(short["start"], short["stop"]) for short in promoted]
+                short_numbers = [short["number"] for short in promoted]
+                render_plans = {
+                    short["number"]: plan_from_json(short["plan"]) for short in promoted
+                }
+                print(f"Promoting draft(s) {', '.join(map(str, short_numbers))}")
+            elif manual_timeframes:
                 print(f"\nUsing manually specified timeframes...")
                 highlights = parse_timeframes(manual_timeframes)
                 if highlights is None:
@@ -323,7 +526,8 @@ if Vid:
             else:
                 print(f"Analyzing transcription to find {num_shorts} highlight(s)...")
                 # Get highlights based on number requested
-                highlights = GetMultipleHighlights(TransText, num_shorts)
+                with profile_stage("select"):
+                    highlights = GetMultipleHighlights(TransText, num_shorts)
 
                 # Check if GetMultipleHighlights failed
                 if highlights is None or len(highlights) == 0:
@@ -349,9 +553,72 @@ if Vid:
             output_folder = "output_shorts"
             os.makedirs(output_folder, exist_ok=True)
 
+            if short_numbers is None:
+                short_numbers = list(range(1, len(highlights) + 1))
+
+            draft_manifest = None
+            if draft_mode:
+                clean_title = clean_filename(video_title) if video_title else "output"
+                draft_manifest = RenderManifest(
+                    os.path.join(DRAFTS_FOLDER, f"{clean_title}_{session_id}.json"),
+                    {
+                        "input": url_or_file,
+                        "source": None if partial_source else Vid,
+                        "title": video_title,
+                        "partial_ingest": partial_source is not None,
+                        "settings": {
+                            "subtitle_style": subtitle_style,
+                            "subtitle_backend": subtitle_backend,
+                            "karaoke": karaoke,
+                            "zoom_mode": zoom_mode,
+                            "detector_backend": detector_backend,
+                            "active_speaker": active_speaker,
+                            "speaker_stride": speaker_stride,
+                        },
+                        "shorts": [],
+                    },
+                )
+                os.makedirs(DRAFTS_FOLDER, exist_ok=True)
+
+            # Analyse the whole source once; every short slices its range from it
+            # (with partial ingest there is no whole source, each clip is analysed;
+            # promoted drafts already carry their crop plans)
+            source_analysis = None
+            if partial_source is None and promote_manifest is None:
+                try:
+                    # Decode plus detection: as CPU-heavy as a render, so it
+                    # takes a render slot and runs on the render thread budget
+                    with stage_slot("render"), profile_stage("analyze"):
+                        source_analysis = analyze_source(
+                            Vid, detector_backend=detector_backend
+                        )
+                except Exception as e:
+                    print(f"Warning: Source analysis failed, analysing each clip: {e}")
+
+            # Cut all clips in one forward pass instead of reopening the source per short
+            single_pass_clips = {}
+            if single_pass and partial_source is None:
+                valid = [
+                    (idx, start, stop)
+                    for idx, (start, stop) in zip(short_numbers, highlights)
+                    if 0 < start < stop
+                ]
+                clip_paths = {idx: f"temp_clip_{session_id}_{idx}.mp4" for idx, _, _ in valid}
+                try:
+                    with stage_slot("render"), profile_stage("cut"):
+                        extract_clips(
+                            Vid,
+                            [(start, stop) for _, start, stop in valid],
+                            [clip_paths[idx] for idx, _, _ in valid],
+                            audio_path=Audio,
+                        )
+                    single_pass_clips = clip_paths
+                except Exception as e:
+                    print(f"⚠ Single-pass decode failed, cutting clips one by one: {e}")
+
             # Process each highlight to create shorts
             created_shorts = []
-            for idx, (start, stop) in enumerate(highlights, 1):
+            for idx, (start, stop) in zip(short_numbers, highlights):
                 print(f"\n{'='*60}")
                 print(f"PROCESSING SHORT {idx}/{len(highlights)}")
                 print(f"Time: {start}s - {stop}s ({stop-start}s duration)")
@@ -367,21 +634,106 @@ if Vid:
                 temp_cropped = f"temp_cropped_{session_id}_{idx}.mp4"
                 temp_subtitled = f"temp_subtitled_{session_id}_{idx}.mp4"
 
+                # Each short holds a render slot, shared with other running jobs
+                render_slot = stage_slot("render").acquire()
                 try:
-                    print(f"Step 1/4: Extracting clip from original video...")
-                    crop_video(Vid, temp_clip, start, stop)
+                    print(f"Step 1/{2 if draft_mode else 4}: Extracting clip from original video...")
+                    if idx in single_pass_clips:
+                        print("Clip was extracted in the single-pass decode")
+                    elif partial_source:
+                        with profile_stage("cut"):
+                            partial_source.cut(
+                                temp_clip,
+                                start,
+                                stop,
+                                preset="ultrafast" if draft_mode else "medium",
+                            )
+                    else:
+                        with profile_stage("cut"):
+                            crop_video(
+                                Vid,
+                                temp_clip,
+                                start,
+                                stop,
+                                preset="ultrafast" if draft_mode else "medium",
+                            )
+
+                    captions = None
+                    if subtitle_backend == "inline" or draft_mode:
+                        captions = CaptionCompositor.from_transcript(
+                            transcript_index,
+                            start,
+                            stop,
+                            style=subtitle_style,
+                            karaoke=karaoke,
+                        )
+
+                    if draft_mode:
+                        # Crop, captions and audio in one fast pass
+                        draft_output = os.path.join(
+                            DRAFTS_FOLDER, f"{clean_title}_{session_id}_draft_{idx}.mp4"
+                        )
+                        print(f"Step 2/2: Rendering draft...")
+                        with profile_stage("crop"):
+                            plan = crop_to_vertical(
+                                temp_clip,
+                                draft_output,
+                                zoom_mode=zoom_mode,
+                                detector_backend=detector_backend,
+                                analysis=source_analysis,
+                                clip_start=start,
+                                audio_path=temp_clip,
+                                captions=captions,
+                                draft=True,
+                            )
+                        draft_manifest.add_short(idx, start, stop, draft_output, plan)
+                        draft_manifest.save()
+                        created_shorts.append(draft_output)
+                        print(f"\n✓ DRAFT {idx} COMPLETE: {draft_output}\n")
+                        os.remove(temp_clip)
+                        continue
 
                     print(f"Step 2/4: Cropping to vertical format (9:16)...")
-                    crop_to_vertical(temp_clip, temp_cropped, zoom_mode=zoom_mode)
-
-                    print(f"Step 3/4: Adding subtitles to video...")
-                    add_subtitles_to_video(
-                        temp_cropped,
-                        temp_subtitled,
-                        transcriptions,
-                        video_start_time=start,
-                        style=subtitle_style,
-                    )
+                    with profile_stage("crop"):
+                        crop_to_vertical(
+                            temp_clip,
+                            temp_cropped,
+                            zoom_mode=zoom_mode,
+                            detector_backend=detector_backend,
+                            analysis=source_analysis,
+                            clip_start=start,
+                            active_speaker=active_speaker,
+                            speaker_stride=speaker_stride,
+                            captions=captions,
+                            plan=render_plans.get(idx),
+                        )
+
+                    ass_path = None
+                    if captions is not None:
+                        print(f"Step 3/4: Subtitles were drawn during cropping")
+                        temp_subtitled = temp_cropped
+                    elif subtitle_backend == "ass":
+                        # The script is burned in by the final mux's encode
+                        print(f"Step 3/4: Writing subtitles for libass...")
+                        with profile_stage("subtitles"):
+                            ass_path = write_ass_subtitles(
+                                temp_cropped,
+                                f"temp_subtitles_{session_id}_{idx}.ass",
+                                transcript_index,
+                                video_start_time=start,
+                                style=subtitle_style,
+                            )
+                        temp_subtitled = temp_cropped
+                    else:
+                        print(f"Step 3/4: Adding subtitles to video...")
+                        with profile_stage("subtitles"):
+                            add_subtitles_to_video(
+                                temp_cropped,
+                                temp_subtitled,
+                                transcript_index,
+                                video_start_time=start,
+                                style=subtitle_style,
+                            )
 
                     # Generate final output filename
                     clean_title = (
@@ -396,23 +748,43 @@ if Vid:
                             output_folder, f"{clean_title}_{session_id}_short.mp4"
                         )
 
-                    print(f"Step 4/4: Adding audio to final video...")
-                    combine_videos(temp_clip, temp_subtitled, final_output)
-
-                    created_shorts.append(final_output)
+                    if renditions:
+                        print(f"Step 4/4: Adding audio and encoding renditions...")
+                        with profile_stage("mux"):
+                            entries = render_renditions(
+                                temp_clip,
+                                temp_subtitled,
+                                final_output,
+                                renditions,
+                                video_filter=ass_video_filter(ass_path) if ass_path else None,
+                            )
+                        outputs = [rendition["path"] for rendition in entries]
+                    else:
+                        print(f"Step 4/4: Adding audio to final video...")
+                        with profile_stage("mux"):
+                            if ass_path:
+                                burn_subtitles(
+                                    temp_subtitled, final_output, ass_path, audio_path=temp_clip
+                                )
+                            else:
+                                combine_videos(temp_clip, temp_subtitled, final_output)
+                        outputs = [final_output]
+                    created_shorts.extend(outputs)
 
                     print(f"\n{'='*60}")
-                    print(f"✓ SHORT {idx} COMPLETE: {final_output}")
+                    print(f"✓ SHORT {idx} COMPLETE: {', '.join(outputs)}")
                     print(f"{'='*60}\n")
 
                     # Clean up temporary files for this short
-                    for temp_file in [temp_clip, temp_cropped, temp_subtitled]:
-                        if os.path.exists(temp_file):
+                    for temp_file in [temp_clip, temp_cropped, temp_subtitled, ass_path]:
+                        if temp_file and os.path.exists(temp_file):
                             os.remove(temp_file)
 
                 except Exception as e:
                     print(f"\n⚠ ERROR creating short {idx}: {e}")
                     continue
+                finally:
+                    render_slot.release()
 
             # Final summary
             print(f"\n{'='*60}")
@@ -422,11 +794,19 @@ if Vid:
             for short in created_shorts:
                 print(f"  • {short}")
             print(f"{'='*60}\n")
+            if draft_manifest is not None:
+                print(f"Draft manifest: {draft_manifest.path}")
+                print("Render approved drafts at full quality with:")
+                print(f"  ./run.sh --promote={draft_manifest.path} [--approve=1,2]\n")
+            if partial_source:
+                partial_source.report()
 
             # Clean up audio file
             try:
                 if os.path.exists(audio_file):
                     os.remove(audio_file)
+                if partial_source:
+                    partial_source.cleanup()
                 print(f"Cleaned up session files for {session_id}")
             except Exception as e:
                 print(f"Warning: Could not clean up some files: {e}")
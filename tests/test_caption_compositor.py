@@ -0,0 +1,25 @@
+import numpy as np
+from Components.CaptionCompositor import CaptionCompositor, CaptionSprite
+from Components.CaptionRenderer import render_karaoke_caption
+
+TEXT = "the quick brown fox jumps over the lazy dog"
+
+
+def test_karaoke_frame_matches_pasted_word():
+    frame = np.random.default_rng(0).integers(0, 256, (1280, 720, 3), dtype=np.uint8)
+    base, highlighted, boxes = render_karaoke_caption(TEXT, "bold_yellow", 720, 1280)
+    compositor = CaptionCompositor([[TEXT, 0.0, 9.0]], style="bold_yellow", karaoke=True)
+    starts = [0.5 + i for i in range(len(boxes))]
+    compositor.segments[0].append([(start, start + 1) for start in starts])
+
+    for word, (x0, y0, x1, y1) in enumerate(boxes):
+        actual = frame.copy()
+        compositor.apply(actual, starts[word])
+
+        # The base caption with the word's box pasted from the highlighted one
+        bitmap = base.copy()
+        x0, y0 = max(x0, 0), max(y0, 0)
+        bitmap[y0:y1, x0:x1] = highlighted[y0:y1, x0:x1]
+        expected = frame.copy()
+        CaptionSprite(bitmap, *compositor._position(bitmap)).blend(expected)
+        assert np.array_equal(actual, expected)
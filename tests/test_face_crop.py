@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+from Components.FaceCrop import ShotCropper, plan_crop
+
+
+def _motion_shot(start, end):
+    return {
+        "start": start,
+        "end": end,
+        "use_motion_tracking": True,
+        "zoom_scale": 1.0,
+        "x_start": 0,
+    }
+
+
+def test_draft_motion_updates_with_odd_shot_start(monkeypatch):
+    # Draft render: every 2nd source frame, motion update every 15 rendered frames
+    frame_step = 2
+    shot_plan = [_motion_shot(0, 7), _motion_shot(7, 200)]
+    cropper = ShotCropper(shot_plan, 640, 360, update_interval=15, output_scale=0.5)
+
+    updates = []
+    monkeypatch.setattr(
+        "Components.FaceCrop.VerticalCropper._update_motion",
+        lambda self, frame: updates.append(cropper.shot_index),
+    )
+    frame = np.zeros((360, 640, 3), dtype=np.uint8)
+    for frame_index in range(0, 200, frame_step):
+        cropper(frame, frame_index)
+
+    # Shot 2 starts at frame 7 but is first rendered at frame 8, then gets
+    # an update every 15 rendered frames: 8, 38, ..., 188
+    assert updates.count(0) == 1
+    assert updates.count(1) == 7
+
+
+@pytest.mark.parametrize("output_scale", [1.0, 0.5])
+def test_face_near_edge_is_full_height_crop(output_scale):
+    # A face close to the right edge, which used to zoom out and letterbox
+    plan = plan_crop([1200] * 5, [200] * 5, 1280, 720)
+    assert plan["zoom_scale"] == 1.0
+    assert plan["x_start"] == 1280 - 405
+
+    plan.update(start=0, end=10)
+    cropper = ShotCropper([plan], 1280, 720, update_interval=30, output_scale=output_scale)
+    frame = np.full((720, 1280, 3), 255, dtype=np.uint8)
+    frame[:, :100] = 0
+    out = cropper(frame, 0)
+    assert out.shape == (int(720 * output_scale), int(405 * output_scale), 3)
+    assert out.min() == 255
+
+
+def test_fit_letterboxes_face_shots():
+    plan = plan_crop([640] * 5, [200] * 5, 1280, 720, zoom_mode="fit")
+    plan.update(start=0, end=10)
+    cropper = ShotCropper([plan], 1280, 720, update_interval=30)
+    out = cropper(np.full((720, 1280, 3), 255, dtype=np.uint8), 0)
+    assert out[0].max() == 0
+    assert out[360].min() == 255
@@ -0,0 +1,112 @@
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from Components import RangedDownload as rd
+
+DATA = bytes(range(256)) * 400  # 102400 bytes
+CHUNK = 16 * 1024
+
+
+class RangeHandler(BaseHTTPRequestHandler):
+    """Serves DATA, honouring single byte ranges unless the server disables them."""
+
+    def do_GET(self):
+        server = self.server
+        header = self.headers.get("Range")
+        with server.lock:
+            server.requests.append(header)
+        if header and server.ranges:
+            start, end = header.split("=", 1)[1].split("-")
+            start, end = int(start), min(int(end), len(DATA) - 1)
+            body = DATA[start : end + 1]
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{len(DATA)}")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            with server.lock:
+                truncate = start in server.truncate_once
+                server.truncate_once.discard(start)
+            # A dropped connection partway through the body
+            self.wfile.write(body[: len(body) // 2] if truncate else body)
+            return
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(DATA)))
+        self.end_headers()
+        self.wfile.write(DATA)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), RangeHandler)
+    httpd.ranges = True
+    httpd.truncate_once = set()
+    httpd.requests = []
+    httpd.lock = threading.Lock()
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _url(server):
+    return f"http://127.0.0.1:{server.server_address[1]}/file.bin"
+
+
+def test_parallel_ranges(server, tmp_path):
+    path = str(tmp_path / "file.bin")
+    rd.download_file(_url(server), path, connections=3, chunk_size=CHUNK)
+    with open(path, "rb") as f:
+        assert f.read() == DATA
+    assert not os.path.exists(path + ".part")
+    assert not os.path.exists(path + ".part.json")
+
+
+def test_resume_fetches_only_missing_chunks(server, tmp_path):
+    path = str(tmp_path / "file.bin")
+    chunk_count = (len(DATA) + CHUNK - 1) // CHUNK
+    done = [0, 2, 3]
+    # State left behind by an interrupted download
+    with open(path + ".part", "wb") as f:
+        f.truncate(len(DATA))
+        for index in done:
+            f.seek(index * CHUNK)
+            f.write(DATA[index * CHUNK : (index + 1) * CHUNK])
+    with open(path + ".part.json", "w") as f:
+        json.dump({"size": len(DATA), "chunk_size": CHUNK, "offset": 0, "done": done}, f)
+
+    rd.RangedDownload(_url(server), path, size=len(DATA), chunk_size=CHUNK).run()
+
+    with open(path, "rb") as f:
+        assert f.read() == DATA
+    fetched = sorted(int(r.split("=")[1].split("-")[0]) // CHUNK for r in server.requests)
+    assert fetched == [index for index in range(chunk_count) if index not in done]
+
+
+def test_retry_rolls_back_progress(server, tmp_path, monkeypatch):
+    monkeypatch.setattr(rd.time, "sleep", lambda seconds: None)
+    # Small reads, so progress is reported before the connection drops
+    monkeypatch.setattr(rd, "READ_SIZE", 1024)
+    server.truncate_once.add(CHUNK)
+    path = str(tmp_path / "file.bin")
+    download = rd.RangedDownload(_url(server), path, size=len(DATA), chunk_size=CHUNK)
+    download.run()
+
+    with open(path, "rb") as f:
+        assert f.read() == DATA
+    assert download._received == len(DATA)
+
+
+def test_fallback_without_range_support(server, tmp_path):
+    server.ranges = False
+    path = str(tmp_path / "file.bin")
+    rd.download_file(_url(server), path, connections=4, chunk_size=CHUNK)
+    with open(path, "rb") as f:
+        assert f.read() == DATA
+    # Only the probe and the single full request
+    assert len(server.requests) == 2
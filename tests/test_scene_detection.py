@@ -0,0 +1,41 @@
+import subprocess
+import pytest
+from Components.SceneDetection import get_ffmpeg_binary, refine_cut
+
+FPS = 30
+CUT_FRAME = 37
+
+
+@pytest.fixture
+def cut_video(tmp_path):
+    """A flat red shot cut hard into a test pattern at CUT_FRAME."""
+    path = str(tmp_path / "cut.mp4")
+    subprocess.run(
+        [
+            get_ffmpeg_binary(),
+            "-loglevel",
+            "error",
+            "-f",
+            "lavfi",
+            "-i",
+            f"color=c=red:s=320x180:r={FPS}:d={CUT_FRAME / FPS}",
+            "-f",
+            "lavfi",
+            "-i",
+            f"testsrc=s=320x180:r={FPS}:d=1",
+            "-filter_complex",
+            "[0:v][1:v]concat=n=2:v=1[v]",
+            "-map",
+            "[v]",
+            "-pix_fmt",
+            "yuv420p",
+            path,
+        ],
+        check=True,
+    )
+    return path
+
+
+def test_refine_cut_finds_exact_frame(cut_video):
+    # Samples at 2 per second straddle the cut at 1.0s and 1.5s
+    assert refine_cut(cut_video, 1.0, 1.5, FPS) == CUT_FRAME
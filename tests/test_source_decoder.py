@@ -0,0 +1,116 @@
+import subprocess
+import cv2
+import numpy as np
+import pytest
+from Components.SceneDetection import get_ffmpeg_binary
+from Components.SourceDecoder import extract_clips, seek_to_frame
+
+FPS = 30
+FRAMES = 300
+SIZE = (64, 64)
+
+
+def _encode_index(index):
+    """Solid frame whose blue and green levels spell out `index`."""
+    frame = np.zeros((SIZE[1], SIZE[0], 3), dtype=np.uint8)
+    frame[..., 0] = (index % 32) * 8
+    frame[..., 1] = (index // 32) * 16
+    return frame
+
+
+def _decode_index(frame):
+    blue, green = frame[..., 0].mean(), frame[..., 1].mean()
+    return int(round(green / 16)) * 32 + int(round(blue / 8))
+
+
+@pytest.fixture(scope="module")
+def indexed_video(tmp_path_factory):
+    """Ten seconds with one keyframe every 5 s, each frame showing its index."""
+    path = str(tmp_path_factory.mktemp("decoder") / "indexed.mp4")
+    cmd = [
+        get_ffmpeg_binary(),
+        "-loglevel",
+        "error",
+        "-f",
+        "rawvideo",
+        "-pix_fmt",
+        "bgr24",
+        "-s",
+        f"{SIZE[0]}x{SIZE[1]}",
+        "-r",
+        str(FPS),
+        "-i",
+        "-",
+        "-c:v",
+        "libx264",
+        "-g",
+        "150",
+        "-qp",
+        "0",
+        "-pix_fmt",
+        "yuv444p",
+        path,
+    ]
+    frames = b"".join(_encode_index(i).tobytes() for i in range(FRAMES))
+    subprocess.run(cmd, input=frames, check=True)
+    return path
+
+
+class DriftingCapture:
+    """Capture whose frame seeks land `drift` frames away from the request."""
+
+    def __init__(self, drift):
+        self.drift = drift
+        self.index = -1
+        self.seeks = []
+
+    def set(self, prop, value):
+        assert prop == cv2.CAP_PROP_POS_FRAMES
+        self.seeks.append(value)
+        self.index = max(0, value + self.drift) - 1
+
+    def grab(self):
+        if self.index + 1 >= FRAMES:
+            return False
+        self.index += 1
+        return True
+
+    def get(self, prop):
+        assert prop == cv2.CAP_PROP_POS_MSEC
+        return self.index * 1000 / FPS
+
+
+@pytest.mark.parametrize("drift", [-40, -3, 0, 5, 45])
+def test_seek_to_frame_corrects_drift(drift):
+    cap = DriftingCapture(drift)
+    assert seek_to_frame(cap, 200, FPS)
+    # The next grab is the target
+    assert cap.index == 199
+    if drift > 30:
+        assert len(cap.seeks) > 1
+
+
+@pytest.mark.parametrize("target", [1, 97, 150, 151, 263])
+def test_seek_to_frame(indexed_video, target):
+    cap = cv2.VideoCapture(indexed_video, cv2.CAP_FFMPEG)
+    try:
+        assert seek_to_frame(cap, target, FPS)
+        ret, frame = cap.read()
+        assert ret
+        assert _decode_index(frame) == target
+    finally:
+        cap.release()
+
+
+def test_extract_clips_starts_on_range_frame(indexed_video, tmp_path):
+    outputs = [str(tmp_path / "a.mp4"), str(tmp_path / "b.mp4")]
+    written = extract_clips(
+        indexed_video, [(7.0, 8.0), (2.0, 3.0)], outputs, seek_threshold=1.0
+    )
+    assert written == [FPS, FPS]
+    for path, first in zip(outputs, [7 * FPS, 2 * FPS]):
+        cap = cv2.VideoCapture(path)
+        ret, frame = cap.read()
+        cap.release()
+        assert ret
+        assert _decode_index(frame) == first
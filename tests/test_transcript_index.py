@@ -0,0 +1,28 @@
+from Components.CaptionCompositor import CaptionCompositor, estimate_word_timings
+from Components.TranscriptIndex import TranscriptIndex
+
+TRANSCRIPT = [
+    ["one two three", 9.0, 12.0, [(9.0, 9.5), (10.0, 11.0), (11.5, 12.0)]],
+    ["four five", 12.0, 14.0, [(12.0, 12.25), (13.0, 14.0)]],
+    ["no words here", 20.0, 22.0],
+]
+
+
+def test_segments_between_rebases_word_timings():
+    index = TranscriptIndex(TRANSCRIPT)
+    segments = index.segments_between(10.0, 13.5)
+    assert segments == [
+        ["one two three", 0.0, 2.0, [(0.0, 0.0), (0.0, 1.0), (1.5, 2.0)]],
+        ["four five", 2.0, 3.5, [(2.0, 2.25), (3.0, 3.5)]],
+    ]
+    assert index.segments_between(19.0, 23.0) == [["no words here", 1.0, 3.0, []]]
+
+
+def test_karaoke_uses_word_timestamps():
+    compositor = CaptionCompositor.from_transcript(
+        TRANSCRIPT, 9.0, 23.0, karaoke=True
+    )
+    assert compositor._word_starts(0) == [0.0, 1.0, 2.5]
+    # Segments without word timestamps fall back to the length estimate
+    estimated = estimate_word_timings("no words here", 11.0, 13.0)
+    assert compositor._word_starts(2) == [start for start, _ in estimated]